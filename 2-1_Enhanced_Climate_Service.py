@@ -1,32 +1,70 @@
 # Add to app.py
-from pvlib import solarposition, irradiance
 from windpowerlib import ModelChain, WindTurbine
 import psychrolib
 import requests
 import numpy as np
 
+import comfort
+from epw_catalog import EPWCatalog
+from solar_engine import METHOD_VERSION as SOLAR_METHOD_VERSION, clear_sky_summary
+from wind_engine import WindStatistics
+
 
 class AdvancedClimateService:
-    def __init__(self):
+    def __init__(self, weather_dir=None, max_distance_km=250, climate_cache=None):
         psychrolib.SetUnitSystem(psychrolib.SI)
+        # Optional climate_cache.ClimateCache persisting clear-sky summaries in climate_data
+        self.climate_cache = climate_cache
+        if weather_dir:
+            self.wind_statistics = WindStatistics(EPWCatalog(weather_dir), max_distance_km=max_distance_km)
+        else:
+            self.wind_statistics = None
 
-    def get_solar_data(self, lat, lng, year=2023):
-        """Calculate detailed solar radiation data"""
-        # Solar position throughout the year
-        times = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
-        solar_pos = solarposition.get_solarposition(times, lat, lng)
+    def get_solar_data(self, lat, lng, year=2023, altitude=0, linke_turbidity=3.0):
+        """Calculate detailed solar radiation data from hourly clear-sky irradiance"""
+        return self.get_solar_data_batch([(lat, lng)], year, altitude, linke_turbidity)[0]
 
-        # Clear sky radiation
-        clearsky = clearsky.ineichen(times, lat, lng)
+    def get_solar_data_batch(self, sites, year=2023, altitude=0, linke_turbidity=3.0):
+        """get_solar_data for many (lat, lng) sites in one vectorized pass"""
+        lats, lngs = np.asarray(sites, dtype=float).reshape(-1, 2).T
+        # Per-site altitudes or turbidities would not line up with the cells the cache leaves to compute
+        if self.climate_cache is not None and np.ndim(altitude) == 0 and np.ndim(linke_turbidity) == 0:
+            return self.climate_cache.get_many(
+                f'clear_sky_{year}_{altitude}_{linke_turbidity}', SOLAR_METHOD_VERSION, lats, lngs,
+                lambda lats, lngs: self.compute_solar_data(lats, lngs, year, altitude, linke_turbidity)
+            )
+        return self.compute_solar_data(lats, lngs, year, altitude, linke_turbidity)
 
-        return {
-            'annual_irradiation': clearsky['ghi'].sum(),
-            'peak_sun_hours': clearsky['ghi'].sum() / 1000,
-            'seasonal_variation': self.calculate_seasonal_variation(clearsky['ghi'])
-        }
+    def compute_solar_data(self, lats, lngs, year, altitude, linke_turbidity):
+        """Uncached get_solar_data_batch for coordinate columns"""
+        summary = clear_sky_summary(lats, lngs, year, altitude, linke_turbidity)
+
+        monthly = summary['monthly_ghi']
+        seasonal_variation = (monthly.max(axis=1) - monthly.min(axis=1)) / monthly.mean(axis=1)
+        return [
+            {
+                'annual_irradiation': round(float(summary['annual_ghi'][i]), 1),  # kWh/m2
+                'peak_sun_hours': round(float(summary['peak_sun_hours'][i]), 2),
+                'seasonal_variation': round(float(seasonal_variation[i]), 3),
+                'monthly_irradiation': [round(float(value), 1) for value in monthly[i]]
+            }
+            for i in range(len(lats))
+        ]
+
+    def get_wind_data(self, lat, lng, sectors=16):
+        """Calculate wind energy potential, from the nearest local EPW station when one is in range"""
+        if self.wind_statistics is not None:
+            summary = self.wind_statistics.site_summary(lat, lng, sectors)
+            if summary is not None:
+                return {
+                    'avg_wind_speed': summary['mean_speed'],
+                    'wind_power_density': summary['power_density'],
+                    'prevailing_direction': summary['prevailing_direction'],
+                    'weibull_k': summary['weibull_k'],
+                    'weibull_c': summary['weibull_c'],
+                    'wind_rose': summary['rose']
+                }
 
-    def get_wind_data(self, lat, lng):
-        """Calculate wind energy potential"""
         # NASA POWER wind data
         wind_data = self.fetch_nasa_wind_data(lat, lng)
 
@@ -37,17 +75,28 @@ class AdvancedClimateService:
         }
 
     def calculate_comfort_indices(self, temp, humidity, wind_speed):
-        """Calculate thermal comfort indices"""
-        # Heat Index
-        heat_index = psychrolib.GetHeatIndex(temp, humidity)
+        """Calculate thermal comfort indices for a reading or whole hourly series (wind in m/s)"""
+        temp, humidity, wind_speed = comfort.as_float_arrays(temp, humidity, wind_speed)
+        utci = comfort.utci(temp, humidity, wind_speed)
+        categories = np.asarray(comfort.UTCI_CATEGORIES)[comfort.utci_category(utci)]
 
-        # Wind Chill
-        wind_chill = 13.12 + 0.6215 * temp - 11.37 * (wind_speed ** 0.16) + 0.3965 * temp * (wind_speed ** 0.16)
+        indices = {
+            'heat_index': comfort.heat_index(temp, humidity),
+            'wind_chill': comfort.wind_chill(temp, wind_speed),
+            'humidex': comfort.humidex(temp, humidity),
+            'utci': utci,
+            'comfort_category': categories
+        }
+        if utci.ndim == 0:
+            return {name: value.item() for name, value in indices.items()}
+        return indices
 
+    def calculate_comfort_hours(self, temperature, humidity, wind_speed, met=1.2, clo=0.5):
+        """Annual hours in each UTCI stress and PMV category for hourly series (or sites x hours grids)"""
+        results = comfort.hourly_comfort(temperature, humidity, wind_speed, met=met, clo=clo)
         return {
-            'heat_index': heat_index,
-            'wind_chill': wind_chill,
-            'comfort_category': self.categorize_comfort(heat_index, wind_chill)
+            'utci_hours': {name: np.asarray(counts).tolist() for name, counts in results['utci_hours'].items()},
+            'pmv_hours': {name: np.asarray(counts).tolist() for name, counts in results['pmv_hours'].items()}
         }
 
 
@@ -1,33 +1,37 @@
+import numpy as np
 from pyEplus import PyEplus
 import CoolProp.CoolProp as CP
 
+import rc_simulator
+import thermal_mass
+from model_builder import ModelBuilder
+from simulation_cache import ResultCache, SimulationRunner
+
+# Part of every cached result's key, bump when simulation results would change
+SIMULATION_VERSION = 'energyplus-1'
+
+
+def simulation_worker():
+    """SimulationRunner worker factory: one EnergyPlus engine per worker process"""
+    return BuildingPhysicsEngine().simulate_energy_performance
+
 
 class BuildingPhysicsEngine:
-    def __init__(self):
+    def __init__(self, cache_dir='simulation_cache', max_cache_bytes=256 * 1024 * 1024,
+                 workers=None, max_pending=64, timeout=600.0):
         self.energyplus = PyEplus()
         self.setup_base_models()
+        # Materials and constructions are shared by every model this engine builds
+        self.model_builder = ModelBuilder()
+        self.runner_options = {
+            'cache_dir': cache_dir, 'max_cache_bytes': max_cache_bytes,
+            'workers': workers, 'max_pending': max_pending, 'timeout': timeout
+        }
+        self.runner = None
 
     def create_building_model(self, params):
         """Create EnergyPlus building model"""
-        building_dict = {
-            'Building': {
-                'Name': 'OptimizedBuilding',
-                'North_Axis': params['orientation'],
-                'Terrain': 'Urban',
-                'Solar_Distribution': 'FullExteriorWithReflections'
-            },
-            'Zone': {
-                'Name': 'ThermalZone1',
-                'Volume': params['volume'],
-                'Floor_Area': params['floor_area']
-            },
-            'BuildingSurface:Detailed': self.create_surfaces(params),
-            'Window': self.create_windows(params),
-            'Material': self.create_materials(params),
-            'Construction': self.create_constructions(params)
-        }
-
-        return building_dict
+        return self.model_builder.build(params).to_dict()
 
     def simulate_energy_performance(self, building_model, weather_data):
         """Run EnergyPlus simulation"""
@@ -41,15 +45,57 @@ class BuildingPhysicsEngine:
             'thermal_comfort': self.analyze_thermal_comfort(results)
         }
 
+    def get_runner(self):
+        """Cached, pooled EnergyPlus runs, started on first use"""
+        if self.runner is None:
+            options = self.runner_options
+            self.runner = SimulationRunner(
+                simulation_worker,
+                ResultCache(options['cache_dir'], options['max_cache_bytes']),
+                version=SIMULATION_VERSION,
+                workers=options['workers'],
+                max_pending=options['max_pending'],
+                timeout=options['timeout']
+            )
+        return self.runner
+
+    def simulate_many(self, params_list, weather_file):
+        """simulate_energy_performance for many designs, each distinct model run at most once
+
+        Results are keyed by the canonical model and the weather file's content, so designs
+        seen before (by any generation or user sharing the cache directory) are not re-run.
+        """
+        models = [self.create_building_model(params) for params in params_list]
+        return self.get_runner().map(models, weather_file)
+
+    def simulate_sweep(self, grid, weather_file, base_params=None):
+        """simulate_many over every combination of grid values, models derived incrementally"""
+        models = [model.to_dict() for model in self.model_builder.sweep(grid, base_params)]
+        return self.get_runner().map(models, weather_file)
+
+    def simulate_reduced_order(self, designs, weather_data, gain_schedule=None):
+        """Annual loads of many designs with the in-process 5R1C model instead of EnergyPlus
+
+        designs is a list of parameter dicts or a dict of columns (see rc_simulator.DEFAULT_DESIGN);
+        weather_data is an EPW path or a dict with 'temperature' and 'facade_irradiance'.
+        """
+        if isinstance(weather_data, str):
+            weather_data = rc_simulator.weather_from_epw(weather_data)
+        results = rc_simulator.simulate(designs, weather_data, gain_schedule)
+
+        return {
+            'annual_heating': results['heating_demand'],
+            'annual_cooling': results['cooling_demand'],
+            'heating_intensity': results['heating_intensity'],
+            'cooling_intensity': results['cooling_intensity'],
+            'peak_heating_load': results['peak_heating_load'],
+            'peak_cooling_load': results['peak_cooling_load']
+        }
+
     def calculate_thermal_mass_effect(self, materials, climate_data):
         """Calculate thermal mass impact on energy performance"""
-        thermal_mass_capacity = sum([
-            mat['density'] * mat['specific_heat'] * mat['thickness']
-            for mat in materials
-        ])
-
-        # Simplified thermal mass benefit calculation
-        diurnal_temp_range = np.std(climate_data['hourly_temperature'][:24])
-        mass_benefit = min(0.15, thermal_mass_capacity / 1000 * diurnal_temp_range / 10)
+        return float(self.calculate_thermal_mass_effects([materials], climate_data)['mean_benefit'][0])
 
-        return mass_benefit
\ No newline at end of file
+    def calculate_thermal_mass_effects(self, designs_materials, climate_data, max_depth=None):
+        """Thermal mass benefit of many designs' material layers for every day of the year"""
+        return thermal_mass.mass_benefit_summary(designs_materials, climate_data['hourly_temperature'], max_depth)
@@ -1,42 +1,119 @@
 from radiance import RadianceScene
 
+import daylight_metrics
+import window_search
+from daylight_coefficients import DaylightCoefficients
+
 
 class DaylightingAnalysis:
-    def __init__(self):
+    def __init__(self, cache_dir='daylight_cache', coefficient_backend=None, direct_backend=None):
         self.radiance = RadianceScene()
+        # Coefficient matrices per geometry and sky matrices per weather file, cached on disk
+        self.daylight = DaylightCoefficients(cache_dir, backend=coefficient_backend, direct_backend=direct_backend)
+
+    def annual_illuminance(self, building_geometry, location):
+        """Hourly illuminance at every sensor, (sensors x hours) in lux
+
+        With a 'weather_file' in location this comes from the cached daylight coefficient
+        and sky matrices (building_geometry then being a room dict, see
+        daylight_coefficients.ROOM_DEFAULTS) as blocks of sensor rows, never the whole
+        matrix at once; otherwise from a full annual Radiance run.
+        """
+        weather_file = location.get('weather_file')
+        if weather_file is not None:
+            return self.daylight.iter_illuminance(building_geometry, weather_file, location.get('albedo', 0.2))
 
-    def calculate_daylight_autonomy(self, building_geometry, location):
-        """Calculate daylight autonomy and useful daylight illuminance"""
         # Set up Radiance scene
         scene = self.radiance.create_scene(building_geometry)
 
         # Run annual daylight simulation
-        illuminance_results = self.radiance.run_annual_simulation(
+        return self.radiance.run_annual_simulation(
             scene, location['lat'], location['lng']
         )
 
-        # Calculate metrics
-        daylight_autonomy = self.calculate_DA(illuminance_results, threshold=300)
-        useful_daylight_illuminance = self.calculate_UDI(illuminance_results)
+    def annual_direct_illuminance(self, building_geometry, location):
+        """Hourly direct-sun illuminance in the blocks of annual_illuminance, None without a 'weather_file'
+
+        The sun-only sky matrix times the direct coefficients, no sky, ground or
+        reflected light: what annual sunlight exposure counts.
+        """
+        weather_file = location.get('weather_file')
+        if weather_file is None:
+            return None
+        return self.daylight.iter_direct_illuminance(building_geometry, weather_file)
+
+    def calculate_daylight_autonomy(self, building_geometry, location, occupancy=None):
+        """Calculate daylight autonomy, useful daylight illuminance and annual sunlight exposure
+
+        annual_sunlight_exposure is None when no direct-sun illuminance is available
+        (the Radiance path).
+        """
+        illuminance_results = self.annual_illuminance(building_geometry, location)
+        direct = self.annual_direct_illuminance(building_geometry, location)
+
+        # Calculate metrics, all in one pass over the illuminance
+        if occupancy is None:
+            occupancy = daylight_metrics.occupancy_schedule()
+        metrics = daylight_metrics.annual_metrics(illuminance_results, occupancy, direct=direct, da_threshold=300)
 
         return {
-            'daylight_autonomy': daylight_autonomy,
-            'useful_daylight_illuminance': useful_daylight_illuminance,
-            'annual_sunlight_exposure': self.calculate_ASE(illuminance_results)
+            'daylight_autonomy': metrics['mean_daylight_autonomy'],
+            'spatial_daylight_autonomy': metrics['spatial_daylight_autonomy'],
+            'useful_daylight_illuminance': metrics['useful_daylight_illuminance']['useful'],
+            'annual_sunlight_exposure': metrics['annual_sunlight_exposure'] if direct is not None else None,
+            'per_sensor': metrics['per_sensor']
         }
 
-    def optimize_window_placement(self, facade_geometry, orientation):
-        """Optimize window placement for daylighting"""
-        # Generate window placement options
-        window_options = self.generate_window_layouts(facade_geometry)
+    def calculate_DA(self, illuminance_results, threshold=300, occupancy=None):
+        """Mean daylight autonomy over the sensors"""
+        return daylight_metrics.annual_metrics(illuminance_results, occupancy, da_threshold=threshold)['mean_daylight_autonomy']
+
+    def calculate_UDI(self, illuminance_results, udi_range=(100, 2000), occupancy=None):
+        """Mean share of occupied hours with useful daylight illuminance"""
+        metrics = daylight_metrics.annual_metrics(illuminance_results, occupancy, udi_range=udi_range)
+        return metrics['useful_daylight_illuminance']['useful']
 
-        best_layout = None
-        best_score = 0
+    def calculate_ASE(self, illuminance_results, direct, occupancy=None):
+        """Share of sensors above 1000 lux of direct sun for more than 250 occupied hours
 
-        for layout in window_options:
-            da_score = self.calculate_daylight_performance(layout, orientation)
-            if da_score > best_score:
-                best_score = da_score
-                best_layout = layout
+        direct is the direct-sun illuminance, e.g. annual_direct_illuminance; total
+        illuminance would count sky and reflected light too.
+        """
+        if direct is None:
+            raise ValueError('Annual sunlight exposure needs the direct-sun illuminance')
+        return daylight_metrics.annual_metrics(illuminance_results, occupancy, direct=direct)['annual_sunlight_exposure']
 
-        return best_layout, best_score
\ No newline at end of file
+    def generate_window_layouts(self, facade_geometry):
+        """Candidate window layouts for a room dict's facade, see window_search.generate_layouts"""
+        return window_search.generate_layouts(facade_geometry)
+
+    def calculate_daylight_performance(self, layout, facade_geometry, location, occupancy=None):
+        """Score of one window layout: spatial daylight autonomy less annual sunlight exposure"""
+        metrics = self.calculate_daylight_autonomy(dict(facade_geometry, windows=layout), location, occupancy)
+        return window_search.daylight_score(metrics)
+
+    def optimize_window_placement(self, facade_geometry, orientation, location, top_k=5, workers=None,
+                                  max_evaluations=None):
+        """Optimize window placement for daylighting
+
+        Returns the top_k layouts ranked by score and the search stats, including how many
+        full evaluations the pruning avoided.
+        """
+        room = dict(facade_geometry, orientation=orientation)
+        # Generate window placement options
+        window_options = self.generate_window_layouts(room)
+        occupancy = daylight_metrics.occupancy_schedule()
+
+        def evaluate(layout):
+            return self.calculate_daylight_performance(layout, room, location, occupancy)
+
+        # Duplicate, mirrored, dominated and gloomy layouts are never fully evaluated
+        result = window_search.search_layouts(window_options, evaluate, room, top_k=top_k, workers=workers,
+                                              max_evaluations=max_evaluations)
+        ranked = result['ranked']
+        return {
+            'best_layout': ranked[0]['layout'] if ranked else None,
+            'best_score': ranked[0]['score'] if ranked else 0,
+            'top_k': ranked,
+            'stats': result['stats']
+        }
@@ -1,44 +1,36 @@
+import math
+
 import rhinoinside
 
 rhinoinside.load()
 import Rhino.Geometry as rg
 from compas.geometry import Box, Plane, Point, Vector
 
+import design_sampler
+
 
 class ParametricBuildingGenerator:
     def __init__(self):
         self.building_templates = self.load_building_templates()
 
-    def generate_building_variants(self, site_params, design_constraints):
-        """Generate multiple building design variants"""
-        variants = []
-
-        # Base building parameters
-        base_params = {
-            'length': [20, 30, 40],
-            'width': [15, 20, 25],
-            'height': [3, 6, 9, 12],
-            'orientation': range(0, 360, 15),
-            'window_wall_ratio': np.arange(0.1, 0.6, 0.1)
-        }
+    def generate_building_variants(self, site_params, design_constraints, sampling='full_factorial', count=100,
+                                   seed=None):
+        """Generate building design variants, lazily
+
+        Feasible parameter combinations come from a design_sampler.DesignSpace
+        ('full_factorial', 'latin_hypercube' or 'sobol'); geometry is built only for the
+        variants the caller consumes, at most count of them (None for all).
+        """
+        # Base building parameters, filtered by the site constraints in one vectorized pass
+        space = design_sampler.DesignSpace(design_sampler.DEFAULT_PARAMETERS, site_params)
+
+        for params in space.sample(sampling, count, seed):
+            params['wwr'] = params.pop('window_wall_ratio')
+            yield self.create_building_geometry(params)
 
-        # Generate combinations
-        for length in base_params['length']:
-            for width in base_params['width']:
-                for height in base_params['height']:
-                    for orientation in base_params['orientation']:
-                        for wwr in base_params['window_wall_ratio']:
-                            if self.meets_constraints(length, width, height, site_params):
-                                variant = self.create_building_geometry({
-                                    'length': length,
-                                    'width': width,
-                                    'height': height,
-                                    'orientation': orientation,
-                                    'wwr': wwr
-                                })
-                                variants.append(variant)
-
-        return variants[:100]  # Limit to top 100 variants
+    def meets_constraints(self, length, width, height, site_params):
+        """Whether designs fit the site, element-wise over array arguments"""
+        return design_sampler.meets_constraints(length, width, height, site_params)
 
     def create_building_geometry(self, params):
         """Create 3D building geometry"""
@@ -19,4 +19,6 @@ COPY . .
 
 EXPOSE 5000
 
-CMD ["gunicorn", "--bind", "0.0.0.0:5000", "app:app"]
\ No newline at end of file
+CMD ["gunicorn", "--bind", "0.0.0.0:5000", "app:app"]
+# Async serving mode (asgi.py): one event loop plus a process pool for CPU-bound routes
+# CMD ["uvicorn", "asgi:app", "--host", "0.0.0.0", "--port", "5000"]
\ No newline at end of file
@@ -1,7 +1,9 @@
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
+from prometheus_client import REGISTRY, Counter, Histogram, Gauge, generate_latest
 import logging
 from datetime import datetime
 
+import latency_metrics
+
 
 class ApplicationMonitoring:
     def __init__(self):
@@ -21,6 +23,10 @@ class ApplicationMonitoring:
             'Number of active design sessions'
         )
 
+        # Per-stage optimization and per-route request latency recorded by app.py
+        # (building_optimization_stage_seconds, http_request_duration_seconds)
+        REGISTRY.register(latency_metrics.PrometheusCollector(latency_metrics.REGISTRY))
+
         # Setup logging
         logging.basicConfig(
             level=logging.INFO,
@@ -40,6 +46,14 @@ class ApplicationMonitoring:
         self.logger.info(f"Optimization completed: {lat}, {lng}, {building_type}, "
                          f"Duration: {duration}s, Success: {success}")
 
+    def stage_latency_summary(self):
+        """Mean seconds per optimization stage, for logs and dashboards"""
+        return {
+            stage: total / count
+            for (stage,), (_, count, total) in latency_metrics.STAGE_LATENCY.snapshot().items()
+            if count
+        }
+
     def track_user_behavior(self, user_id, action, parameters):
         """Track user interactions for analytics"""
         event = {
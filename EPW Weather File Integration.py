@@ -1,17 +1,28 @@
+from epw_catalog import EPWCatalog
+from epw_reader import read_epw
+
+
 def parse_epw_file(self, lat, lng):
     """Parse EnergyPlus Weather file for detailed hourly data"""
-    # Download EPW file for location
-    epw_url = self.find_nearest_epw(lat, lng)
+    # Nearest local EPW file for location
+    epw_path = self.find_nearest_epw(lat, lng)
 
-    if epw_url:
-        epw_data = self.download_and_parse_epw(epw_url)
+    if epw_path:
+        # Typed hourly columns, memory-mapped from the binary cache after the first parse
+        epw_data = read_epw(epw_path)
         return self.process_8760_data(epw_data)
 
     return None
 
 
+def find_nearest_epw(self, lat, lng):
+    """Nearest weather station's EPW file in the local catalog"""
+    # Built once per service: self.epw_catalog = EPWCatalog(os.environ.get('EPW_DIRECTORY', 'weather'))
+    return self.epw_catalog.find_nearest_epw(lat, lng)
+
+
 def process_8760_data(self, epw_data):
-    """Process 8760 hourly weather data"""
+    """Process 8760 hourly weather data, each value a NumPy column"""
     return {
         'temperature': epw_data['dry_bulb_temperature'],
         'humidity': epw_data['relative_humidity'],
@@ -1,27 +1,48 @@
 # Phase 1: Basic Building Design Web App
 # File: app.py
 
-from flask import Flask, render_template, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, render_template, jsonify, request, stream_with_context
 from flask_cors import CORS
 import numpy as np
-import pandas as pd
-from datetime import datetime
+import codecs
+import csv
 import json
-import sqlite3
+import os
+import threading
+from time import perf_counter_ns
 
-app = Flask(__name__)
-CORS(app)
+from latency_metrics import NULL_STAGE_TIMER, REGISTRY, REQUEST_LATENCY, STAGE_LATENCY, StageTimer
+from response_cache import ResponseCache
+from climate_cache import ClimateCache, migrate_climate_data
+from design_store import DATABASE_PATH, SPATIAL_TABLES, ConnectionPool, DesignWriter, create_spatial_index, nearest_rows
+
+api = Blueprint('api', __name__)
 
 
 class BuildingDesignService:
-    def __init__(self):
+    def __init__(self, climate_grid_path=None, interpolate_climate=False, database_path=DATABASE_PATH,
+                 instrument=True, weather_dir=None, weather_max_distance_km=None, climate_cache_precision=0.01):
+        # Per-stage latency histograms of optimize_building_design, served on /metrics
+        self.stage_timer = StageTimer(STAGE_LATENCY) if instrument else NULL_STAGE_TIMER
+        self.db_pool = ConnectionPool(database_path)
         self.setup_database()
+        # Station and wind summaries persisted in climate_data, per grid cell of climate_cache_precision degrees
+        self.climate_cache = ClimateCache(self.db_pool, precision=climate_cache_precision)
+        self.climate_cache.writer.register_shutdown_hook()
+        self.design_writer = DesignWriter(self.db_pool)
+        self.design_writer.register_shutdown_hook()
         self.load_climate_zones()
         self.load_building_standards()
+        self.load_climate_grid(climate_grid_path, interpolate_climate)
+        self.load_weather_statistics(weather_dir, weather_max_distance_km)
 
     def setup_database(self):
         """Initialize database for storing designs and analysis results"""
-        conn = sqlite3.connect('building_designs.db')
+        with self.db_pool.connection() as conn:
+            self.create_tables(conn)
+
+    def create_tables(self, conn):
+        """Create the climate and design tables if they do not exist"""
         cursor = conn.cursor()
 
         # Climate data table
@@ -38,6 +59,8 @@ class BuildingDesignService:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        # Source, method version and payload columns of the climate cache tier
+        migrate_climate_data(conn)
 
         # Building designs table
         cursor.execute('''
@@ -54,8 +77,30 @@ class BuildingDesignService:
             )
         ''')
 
+        # R*Tree spatial indexes for nearest-neighbour queries on lat/lng
+        for table in SPATIAL_TABLES:
+            create_spatial_index(conn, table)
+
         conn.commit()
-        conn.close()
+
+    def record_designs(self, rows, max_backlog=None):
+        """Queue (lat, lng, building_type, result) rows for write-behind persistence
+
+        With max_backlog, first wait until the writer has at most that many rows
+        pending, so bulk callers are throttled to the database instead of piling up rows.
+        """
+        if max_backlog is not None:
+            self.design_writer.wait_for_backlog(max_backlog)
+        return self.design_writer.submit(rows)
+
+    def find_nearby_designs(self, lat, lng, k=10):
+        """k stored designs closest to a site, nearest first"""
+        with self.db_pool.connection() as conn:
+            designs = nearest_rows(conn, 'building_designs', lat, lng, k)
+
+        for design in designs:
+            design['design_parameters'] = json.loads(design['design_parameters'] or 'null')
+        return designs
 
     def load_climate_zones(self):
         """Load climate zone classifications"""
@@ -87,12 +132,90 @@ class BuildingDesignService:
             }
         }
 
-    def analyze_climate(self, lat, lng):
-        """Analyze climate conditions for the given location"""
-        # Simplified climate analysis based on latitude
-        # In real implementation, use weather APIs
+    def load_climate_grid(self, path, interpolate=False):
+        """Attach the memory-mapped climate grid built by climate_grid.py, if any"""
+        if path:
+            # Only deployments with a prebuilt grid pay for loading the module
+            from climate_grid import ClimateGrid
+            self.climate_grid = ClimateGrid(path)
+        else:
+            self.climate_grid = None
+        self.interpolate_climate = interpolate
+
+    def load_weather_statistics(self, weather_dir, max_distance_km=None):
+        """Index a directory of EPW files for hourly degree days and wind roses, see climate_stats.py"""
+        if weather_dir:
+            from climate_stats import ClimateStatistics
+            from epw_catalog import EPWCatalog
+            from wind_engine import WindStatistics
+            catalog = EPWCatalog(weather_dir)
+            self.climate_statistics = ClimateStatistics(catalog, max_distance_km=max_distance_km)
+            self.wind_statistics = WindStatistics(catalog, max_distance_km=max_distance_km)
+        else:
+            self.climate_statistics = None
+            self.wind_statistics = None
+
+    def weather_station_climate(self, lat, lng, use_weather_data):
+        """Degree-day summary of the nearest weather station, or None to use the estimates"""
+        if use_weather_data is None:
+            use_weather_data = self.climate_statistics is not None
+        if not use_weather_data:
+            return None
+        if self.climate_statistics is None:
+            raise ValueError('No weather directory is configured for hourly climate statistics')
+        return self.climate_cache.get(
+            'epw_climate', self.climate_statistics.version(), lat, lng, self.climate_statistics.site_summary
+        )
+
+    def analyze_wind(self, lat, lng, sectors=16):
+        """Wind rose, Weibull fit and power density of the nearest weather station"""
+        if self.wind_statistics is None:
+            raise ValueError('No weather directory is configured for wind statistics')
+        summary = self.climate_cache.get(
+            f'epw_wind_{sectors}', self.wind_statistics.version(), lat, lng,
+            lambda lat, lng: self.wind_statistics.site_summary(lat, lng, sectors)
+        )
+        if summary is None:
+            raise ValueError(f'No weather station within {self.wind_statistics.max_distance_km} km of {lat}, {lng}')
+        return summary
+
+    def analyze_wind_batch(self, lats, lngs, sectors=16):
+        """analyze_wind for coordinate columns, None for sites without a station in range"""
+        if self.wind_statistics is None:
+            raise ValueError('No weather directory is configured for wind statistics')
+        return self.climate_cache.get_many(
+            f'epw_wind_{sectors}', self.wind_statistics.version(), lats, lngs,
+            lambda lats, lngs: self.wind_statistics.site_summaries(lats, lngs, sectors)
+        )
+
+    def analyze_climate(self, lat, lng, use_weather_data=None):
+        """Analyze climate conditions for the given location
+
+        use_weather_data takes temperature and degree days from the nearest EPW station's
+        hourly record; by default it is on whenever a weather directory is configured.
+        Sites with no station within range keep the estimates below.
+        """
+        station = self.weather_station_climate(lat, lng, use_weather_data)
+        if self.climate_grid is not None:
+            # O(1) indexed lookup in the precomputed grid
+            avg_temp, solar_potential, hdd, cdd = self.climate_grid.lookup_one(lat, lng, self.interpolate_climate)
+        else:
+            # Simplified climate analysis based on latitude
+            # In real implementation, use weather APIs
+
+            avg_temp = 20 - abs(lat) * 0.5  # Rough temperature estimation
+
+            # Calculate solar potential
+            solar_potential = max(0, 100 - abs(lat))  # Higher near equator
 
-        avg_temp = 20 - abs(lat) * 0.5  # Rough temperature estimation
+            # Estimate heating/cooling degree days
+            hdd = max(0, (18 - avg_temp) * 365) if avg_temp < 18 else 0
+            cdd = max(0, (avg_temp - 24) * 365) if avg_temp > 24 else 0
+
+        if station is not None:
+            avg_temp = station['avg_temperature']
+            hdd = station['heating_degree_days']
+            cdd = station['cooling_degree_days']
 
         # Determine climate zone
         climate_zone = 'temperate'
@@ -102,13 +225,6 @@ class BuildingDesignService:
                 climate_zone = zone
                 break
 
-        # Calculate solar potential
-        solar_potential = max(0, 100 - abs(lat))  # Higher near equator
-
-        # Estimate heating/cooling degree days
-        hdd = max(0, (18 - avg_temp) * 365) if avg_temp < 18 else 0
-        cdd = max(0, (avg_temp - 24) * 365) if avg_temp > 24 else 0
-
         return {
             'climate_zone': climate_zone,
             'avg_temperature': round(avg_temp, 1),
@@ -120,11 +236,32 @@ class BuildingDesignService:
 
     def optimize_building_design(self, lat, lng, building_type='residential'):
         """Generate optimized building design parameters"""
+        timer = self.stage_timer
+        started = timer.start()
         climate_data = self.analyze_climate(lat, lng)
-        base_standards = self.building_standards.get(building_type, self.building_standards['residential'])
+        started = timer.lap('climate_analysis', started)
 
         # Optimize based on climate strategy
-        strategy = climate_data['strategy']
+        base_standards = self.building_standards.get(building_type, self.building_standards['residential'])
+        optimized_design = self.apply_climate_strategy(climate_data['strategy'], base_standards)
+        started = timer.lap('strategy_selection', started)
+
+        # Calculate estimated energy performance
+        energy_performance = self.estimate_energy_consumption(climate_data, optimized_design)
+        started = timer.lap('energy_estimate', started)
+
+        recommendations = self.generate_recommendations(climate_data, optimized_design)
+        timer.lap('recommendations', started)
+
+        return {
+            'climate_analysis': climate_data,
+            'optimized_parameters': optimized_design,
+            'energy_performance': energy_performance,
+            'recommendations': recommendations
+        }
+
+    def apply_climate_strategy(self, strategy, base_standards):
+        """Adjust building standards for a climate strategy"""
         optimized_design = base_standards.copy()
 
         if strategy == 'minimize_solar_gain':
@@ -157,15 +294,7 @@ class BuildingDesignService:
                 'ventilation_strategy': 'mixed_mode'
             })
 
-        # Calculate estimated energy performance
-        energy_performance = self.estimate_energy_consumption(climate_data, optimized_design)
-
-        return {
-            'climate_analysis': climate_data,
-            'optimized_parameters': optimized_design,
-            'energy_performance': energy_performance,
-            'recommendations': self.generate_recommendations(climate_data, optimized_design)
-        }
+        return optimized_design
 
     def estimate_energy_consumption(self, climate_data, design_params):
         """Simplified energy consumption estimation"""
@@ -224,29 +353,490 @@ class BuildingDesignService:
 
         return recommendations
 
+    # Vectorized batch path. Must stay numerically identical to the scalar methods above.
+
+    def climate_zone_index(self, avg_temp):
+        """Vectorized climate zone lookup, returns positions in climate_zones"""
+        zone_names = list(self.climate_zones)
+        conditions = [
+            (avg_temp >= data['temp_range'][0]) & (avg_temp <= data['temp_range'][1])
+            for data in self.climate_zones.values()
+        ]
+        # First matching zone wins, same as the loop in analyze_climate
+        return np.select(conditions, np.arange(len(zone_names)), default=zone_names.index('temperate'))
+
+    def raw_climate_columns(self, lats, lngs):
+        """Unrounded climate attributes for coordinate columns, overlaid with weather station data if configured"""
+        columns = self.estimated_climate_columns(lats, lngs)
+        if self.climate_statistics is None:
+            return columns
+
+        # Through the climate cache like weather_station_climate, so batch and scalar results agree
+        summaries = self.climate_cache.get_many(
+            'epw_climate', self.climate_statistics.version(), lats, lngs,
+            self.climate_statistics.site_summaries
+        )
+        found = np.array([summary is not None for summary in summaries], dtype=bool)
+        return dict(columns, **{
+            name: np.where(found, [np.nan if summary is None else summary[name] for summary in summaries], columns[name])
+            for name in ('avg_temperature', 'heating_degree_days', 'cooling_degree_days')
+        })
+
+    def estimated_climate_columns(self, lats, lngs):
+        """Climate attributes from the grid if one is loaded, else from latitude"""
+        if self.climate_grid is not None:
+            return self.climate_grid.lookup(lats, lngs, self.interpolate_climate)
 
-# Initialize service
-building_service = BuildingDesignService()
+        avg_temp = 20 - np.abs(lats) * 0.5
+
+        with np.errstate(invalid='ignore', over='ignore'):
+            return {
+                'avg_temperature': avg_temp,
+                'solar_potential': 100 - np.abs(lats),
+                'heating_degree_days': np.where(avg_temp < 18, (18 - avg_temp) * 365, 0),
+                'cooling_degree_days': np.where(avg_temp > 24, (avg_temp - 24) * 365, 0)
+            }
+
+    def analyze_climate_batch(self, lats, lngs):
+        """Vectorized analyze_climate over coordinate columns (values left unrounded)"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        if lats.ndim != 1 or lats.shape != lngs.shape:
+            raise ValueError('lats and lngs must be lists of the same length')
+
+        raw = self.raw_climate_columns(lats, lngs)
+        avg_temp = raw['avg_temperature']
+        hdd = raw['heating_degree_days']
+        cdd = raw['cooling_degree_days']
+
+        # Rows the scalar path would reject (int() of NaN/inf degree days, out-of-grid coordinates)
+        valid = np.isfinite(avg_temp) & np.isfinite(hdd) & np.isfinite(cdd)
+
+        return {
+            'valid': valid,
+            'zone_index': self.climate_zone_index(avg_temp),
+            'avg_temperature': avg_temp,
+            'solar_potential': raw['solar_potential'],
+            'heating_degree_days': np.trunc(np.where(valid, hdd, 0)).astype(np.int64),
+            'cooling_degree_days': np.trunc(np.where(valid, cdd, 0)).astype(np.int64)
+        }
+
+    def estimate_energy_consumption_batch(self, hdd, cdd, window_wall_ratio):
+        """Vectorized estimate_energy_consumption over degree-day columns (values left unrounded)"""
+        heating_on = hdd > 2000
+        cooling_on = cdd > 500
+        heating_load = np.where(heating_on, hdd * 0.05, 0.0)
+        cooling_load = np.where(cooling_on, cdd * 0.08, 0.0)
+        wwr_impact = (window_wall_ratio - 0.3) * 50
+
+        return {
+            'heating_on': heating_on,
+            'cooling_on': cooling_on,
+            'heating_load': heating_load,
+            'cooling_load': cooling_load,
+            'total_annual': 100 + heating_load + cooling_load + wwr_impact
+        }
+
+    def design_template(self, climate_zone, building_type):
+        """Site-independent part of optimize_building_design for one climate zone and building type"""
+        strategy = self.climate_zones[climate_zone]['strategy']
+        base_standards = self.building_standards.get(building_type, self.building_standards['residential'])
+        optimized_design = self.apply_climate_strategy(strategy, base_standards)
+
+        try:
+            # Recommendations only depend on the zone and the design, not on the exact site
+            recommendations = self.generate_recommendations({'climate_zone': climate_zone}, optimized_design)
+        except KeyError as e:
+            # Strategies without a window_wall_ratio fail the same way in the scalar path
+            return {'error': str(e)}
+
+        return {
+            'strategy': strategy,
+            'optimized_parameters': optimized_design,
+            'recommendations': recommendations
+        }
+
+    def optimize_building_design_batch(self, lats, lngs, building_types='residential'):
+        """Vectorized optimize_building_design, returns one response envelope per site"""
+        climate = self.analyze_climate_batch(lats, lngs)
+        n_sites = len(climate['avg_temperature'])
+
+        if isinstance(building_types, str):
+            building_types = [building_types] * n_sites
+        elif len(building_types) != n_sites:
+            raise ValueError('building_types must be a string or a list matching the number of sites')
+
+        # Designs depend only on (building type, climate zone), so build each combination once
+        zone_names = list(self.climate_zones)
+        type_names, type_index = np.unique(np.asarray(building_types, dtype=str), return_inverse=True)
+        combo = type_index.reshape(-1) * len(zone_names) + climate['zone_index']
+        templates = {
+            int(key): self.design_template(zone_names[key % len(zone_names)], str(type_names[key // len(zone_names)]))
+            for key in np.unique(combo)
+        }
 
+        wwr_by_combo = np.full(len(type_names) * len(zone_names), np.nan)
+        for key, template in templates.items():
+            if 'error' not in template:
+                wwr_by_combo[key] = template['optimized_parameters']['window_wall_ratio']
+        energy = self.estimate_energy_consumption_batch(
+            climate['heating_degree_days'], climate['cooling_degree_days'], wwr_by_combo[combo]
+        )
+
+        results = []
+        columns = zip(
+            combo.tolist(), climate['valid'].tolist(), climate['zone_index'].tolist(),
+            climate['avg_temperature'].tolist(), climate['solar_potential'].tolist(),
+            climate['heating_degree_days'].tolist(), climate['cooling_degree_days'].tolist(),
+            energy['heating_on'].tolist(), energy['cooling_on'].tolist(),
+            energy['heating_load'].tolist(), energy['cooling_load'].tolist(),
+            energy['total_annual'].tolist()
+        )
+        for i, (key, valid, zone, avg_temp, solar, hdd, cdd,
+                heating_on, cooling_on, heating, cooling, total) in enumerate(columns):
+            if not valid:
+                # Non-finite inputs are rare, let the scalar path produce its exact error
+                results.append(self.optimize_building_design_envelope(lats[i], lngs[i], building_types[i]))
+                continue
+
+            template = templates[key]
+            if 'error' in template:
+                results.append({'success': False, 'error': template['error']})
+                continue
+
+            # Rounding stays in Python so results match round()/max() in the scalar path bit for bit
+            results.append({
+                'success': True,
+                'data': {
+                    'climate_analysis': {
+                        'climate_zone': zone_names[zone],
+                        'avg_temperature': round(avg_temp, 1),
+                        'solar_potential': round(solar, 1) if solar > 0 else 0,
+                        'heating_degree_days': hdd,
+                        'cooling_degree_days': cdd,
+                        'strategy': template['strategy']
+                    },
+                    'optimized_parameters': template['optimized_parameters'],
+                    'energy_performance': {
+                        'total_annual': round(total, 1) if total > 20 else 20,
+                        'heating_load': round(heating, 1) if heating_on else 0,
+                        'cooling_load': round(cooling, 1) if cooling_on else 0,
+                        'lighting_load': 25,
+                        'equipment_load': 30
+                    },
+                    'recommendations': template['recommendations']
+                }
+            })
 
-@app.route('/')
+        return results
+
+    def optimize_building_design_envelope(self, lat, lng, building_type='residential'):
+        """Scalar optimize_building_design wrapped in the API response envelope"""
+        try:
+            return {'success': True, 'data': self.optimize_building_design(float(lat), float(lng), building_type)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+
+def create_app(testing=False, config=None):
+    """Application factory, nothing touches SQLite until the first request needs the service"""
+    app = Flask(__name__)
+    app.config.from_mapping(
+        TESTING=testing,
+        DATABASE_PATH=os.environ.get('DATABASE_PATH', DATABASE_PATH),
+        CLIMATE_GRID_PATH=os.environ.get('CLIMATE_GRID_PATH'),
+        CLIMATE_GRID_INTERPOLATE=os.environ.get('CLIMATE_GRID_INTERPOLATE') == '1',
+        # Serialized responses of the deterministic analyze endpoints, keyed on snapped coordinates
+        RESPONSE_CACHE_SIZE=int(os.environ.get('RESPONSE_CACHE_SIZE', 4096)),
+        RESPONSE_CACHE_TTL=float(os.environ.get('RESPONSE_CACHE_TTL', 3600)),
+        RESPONSE_CACHE_PRECISION=float(os.environ.get('RESPONSE_CACHE_PRECISION', 0.001)),
+        # Sites per optimize_building_design_batch call on the streaming endpoint
+        STREAM_CHUNK_SIZE=int(os.environ.get('STREAM_CHUNK_SIZE', 2000)),
+        # Request and optimization stage latency histograms, served on /metrics
+        METRICS_ENABLED=os.environ.get('METRICS_ENABLED', '1') == '1',
+        # Directory of EPW files; analyze_climate then uses the nearest station's hourly degree days
+        WEATHER_DIR=os.environ.get('WEATHER_DIR'),
+        WEATHER_MAX_DISTANCE_KM=float(os.environ.get('WEATHER_MAX_DISTANCE_KM', 250)),
+        # Grid cell in degrees of the station and wind summaries persisted in climate_data
+        CLIMATE_CACHE_PRECISION=float(os.environ.get('CLIMATE_CACHE_PRECISION', 0.01))
+    )
+    if config:
+        app.config.update(config)
+
+    CORS(app)
+    app.extensions['response_cache'] = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_SIZE'],
+        ttl=app.config['RESPONSE_CACHE_TTL'],
+        precision=app.config['RESPONSE_CACHE_PRECISION']
+    )
+    if app.config['METRICS_ENABLED']:
+        app.wsgi_app = RequestTimer(app.wsgi_app)
+    app.register_blueprint(api)
+    return app
+
+
+class RequestTimer:
+    """WSGI middleware recording each request in REQUEST_LATENCY, labelled by route rather than raw path
+
+    Times the whole Flask dispatch up to start_response, i.e. the first byte for streamed
+    responses. Works from the environ alone, which is cheaper than request hooks going
+    through the request and g proxies.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        started = perf_counter_ns()
+
+        def timed_start_response(status, headers, exc_info=None):
+            flask_request = environ.get('werkzeug.request')
+            rule = flask_request.url_rule if flask_request is not None else None
+            endpoint = rule.rule if rule is not None else 'unmatched'
+            REQUEST_LATENCY.observe_ns((endpoint, environ['REQUEST_METHOD'], status[:3]), perf_counter_ns() - started)
+            return start_response(status, headers, exc_info)
+
+        return self.wsgi_app(environ, timed_start_response)
+
+
+_service_lock = threading.Lock()
+
+
+def get_building_service():
+    """The current app's BuildingDesignService, constructed on first use"""
+    extensions = current_app.extensions
+    service = extensions.get('building_service')
+    if service is None:
+        with _service_lock:
+            service = extensions.get('building_service')
+            if service is None:
+                service = BuildingDesignService(
+                    climate_grid_path=current_app.config['CLIMATE_GRID_PATH'],
+                    interpolate_climate=current_app.config['CLIMATE_GRID_INTERPOLATE'],
+                    database_path=current_app.config['DATABASE_PATH'],
+                    instrument=current_app.config['METRICS_ENABLED'],
+                    weather_dir=current_app.config['WEATHER_DIR'],
+                    weather_max_distance_km=current_app.config['WEATHER_MAX_DISTANCE_KM'],
+                    climate_cache_precision=current_app.config['CLIMATE_CACHE_PRECISION']
+                )
+                extensions['building_service'] = service
+    return service
+
+
+# Deterministic GET endpoints served through the response cache
+CACHED_ENDPOINTS = ('/api/analyze-site', '/api/climate-data')
+
+
+def response_cache_key(response_cache, path, args):
+    """Cache key and snapped lat/lng for a request to one of CACHED_ENDPOINTS"""
+    key, lat, lng = response_cache.quantize(float(args.get('lat')), float(args.get('lng')))
+    if path == '/api/analyze-site':
+        key = ('analyze-site', args.get('building_type', 'residential')) + key
+    else:
+        key = ('climate-data',) + key
+    return key, lat, lng
+
+
+def compact_json(payload):
+    """JSON text in the compact form jsonify uses outside debug mode"""
+    return current_app.json.dumps(payload, separators=(',', ':'))
+
+
+def cached_json_response(key, compute, timer=NULL_STAGE_TIMER):
+    """Serve compute()'s JSON payload from the response cache, answering If-None-Match with 304"""
+    response_cache = current_app.extensions['response_cache']
+    entry = response_cache.get(key)
+    if entry is None:
+        payload = compute()
+        started = timer.start()
+        # Same bytes jsonify would produce
+        entry = response_cache.put(key, (compact_json(payload) + '\n').encode())
+        timer.lap('serialization', started)
+
+    if request.if_none_match.contains(entry.etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry.body, mimetype='application/json')
+
+    response.set_etag(entry.etag)
+    # Let browsers keep the body but revalidate every time, which costs a 304 at most
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@api.route('/')
 def home():
     return render_template('building_optimizer.html')
 
 
-@app.route('/api/analyze-site')
+@api.route('/api/analyze-site')
 def analyze_site():
     """API endpoint for site analysis"""
+    try:
+        key, lat, lng = response_cache_key(current_app.extensions['response_cache'], request.path, request.args)
+        building_type = request.args.get('building_type', 'residential')
+        building_service = get_building_service()
+
+        def analyze():
+            analysis_result = building_service.optimize_building_design(lat, lng, building_type)
+            started = building_service.stage_timer.start()
+            building_service.record_designs([(lat, lng, building_type, analysis_result)])
+            building_service.stage_timer.lap('persistence', started)
+            return {
+                'success': True,
+                'data': analysis_result
+            }
+
+        return cached_json_response(key, analyze, building_service.stage_timer)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@api.route('/api/analyze-sites', methods=['POST'])
+def analyze_sites():
+    """API endpoint for batch site analysis
+
+    Expects a JSON body {"lats": [...], "lngs": [...], "building_types": [...]}.
+    building_types may also be a single string applied to every site. Each entry
+    of the returned list has the same shape as an /api/analyze-site response.
+    """
+    try:
+        payload = request.get_json(force=True)
+        building_types = payload.get('building_types', payload.get('building_type', 'residential'))
+
+        building_service = get_building_service()
+        results = building_service.optimize_building_design_batch(
+            payload['lats'], payload['lngs'], building_types
+        )
+
+        if isinstance(building_types, str):
+            building_types = [building_types] * len(results)
+        building_service.record_designs(
+            (float(lat), float(lng), building_type, result['data'])
+            for lat, lng, building_type, result in zip(payload['lats'], payload['lngs'], building_types, results)
+            if result['success']
+        )
+
+        return jsonify({
+            'success': True,
+            'data': results
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+def iter_site_rows(stream, content_type):
+    """Parse NDJSON or CSV site rows from a request body one line at a time
+
+    Yields (lat, lng, building_type) tuples, or an error message string for a row
+    that cannot be parsed so the caller can report it in place.
+    """
+    lines = codecs.iterdecode(stream, 'utf-8')
+
+    if 'csv' in (content_type or ''):
+        for row in csv.DictReader(lines):
+            try:
+                yield float(row['lat']), float(row['lng']), row.get('building_type') or 'residential'
+            except (KeyError, TypeError, ValueError) as e:
+                yield f"Invalid row: {e}"
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            yield float(row['lat']), float(row['lng']), row.get('building_type', 'residential')
+        except (KeyError, TypeError, ValueError) as e:
+            yield f"Invalid row: {e}"
+
+
+def stream_site_results(building_service, rows, chunk_size, start_index=0, first_chunk_size=100):
+    """Run parsed site rows through the batch optimizer chunk by chunk, yielding NDJSON lines"""
+    # A small first chunk gets results to the client quickly, later chunks amortize the batch overhead
+    size = min(first_chunk_size, chunk_size)
+    chunk = []
+    index = start_index
+
+    def flush(pending):
+        sites = [row for _, row in pending if not isinstance(row, str)]
+        results = iter(building_service.optimize_building_design_batch(
+            [site[0] for site in sites], [site[1] for site in sites], [site[2] for site in sites]
+        ))
+
+        output = []
+        records = []
+        for row_index, row in pending:
+            if isinstance(row, str):
+                envelope = {'success': False, 'error': row}
+            else:
+                envelope = next(results)
+                if envelope['success']:
+                    records.append((*row, envelope['data']))
+            output.append(compact_json({'row': row_index, **envelope}) + '\n')
+
+        # Backpressure from the writer keeps memory flat however long the input is
+        building_service.record_designs(records, max_backlog=2 * chunk_size)
+        return ''.join(output)
+
+    for row in rows:
+        chunk.append((index, row))
+        index += 1
+        if len(chunk) >= size:
+            yield flush(chunk)
+            chunk = []
+            size = chunk_size
+
+    if chunk:
+        yield flush(chunk)
+
+
+@api.route('/api/analyze-sites/stream', methods=['POST'])
+def analyze_sites_stream():
+    """API endpoint for streaming portfolio analysis
+
+    Reads site rows from the request body as NDJSON ({"lat": .., "lng": .., "building_type": ..}
+    per line) or, with a text/csv content type, CSV with a lat,lng[,building_type] header.
+    Results are streamed back as NDJSON, one /api/analyze-site style envelope plus its input
+    row number per line, as each chunk finishes. Memory stays bounded by the chunk size.
+    """
+    building_service = get_building_service()
+    rows = iter_site_rows(request.stream, request.content_type)
+    lines = stream_site_results(building_service, rows, current_app.config['STREAM_CHUNK_SIZE'])
+
+    return Response(
+        stream_with_context(lines),
+        mimetype='application/x-ndjson',
+        # Ask reverse proxies (nginx) to pass chunks through instead of buffering the response
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+
+@api.route('/api/designs/nearby')
+def nearby_designs():
+    """API endpoint for the k stored designs nearest to a site"""
     try:
         lat = float(request.args.get('lat'))
         lng = float(request.args.get('lng'))
-        building_type = request.args.get('building_type', 'residential')
+        k = int(request.args.get('k', 10))
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"Coordinates out of range: {lat}, {lng}")
+        if not 1 <= k <= 1000:
+            raise ValueError('k must be between 1 and 1000')
 
-        analysis_result = building_service.optimize_building_design(lat, lng, building_type)
+        designs = get_building_service().find_nearby_designs(lat, lng, k)
 
         return jsonify({
             'success': True,
-            'data': analysis_result
+            'data': designs
         })
 
     except Exception as e:
@@ -256,18 +846,83 @@ def analyze_site():
         }), 400
 
 
-@app.route('/api/climate-data')
+@api.route('/api/design-writer/metrics')
+def design_writer_metrics():
+    """Queue depth and throughput of the write-behind design persistence"""
+    return jsonify({
+        'success': True,
+        'data': get_building_service().design_writer.metrics()
+    })
+
+
+@api.route('/metrics')
+def metrics():
+    """Request and optimization stage latency histograms in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@api.route('/api/climate-data')
 def get_climate_data():
     """API endpoint for climate data"""
+    try:
+        key, lat, lng = response_cache_key(current_app.extensions['response_cache'], request.path, request.args)
+
+        def analyze():
+            return {
+                'success': True,
+                'data': get_building_service().analyze_climate(lat, lng)
+            }
+
+        return cached_json_response(key, analyze)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+
+@api.route('/api/wind-rose')
+def wind_rose():
+    """API endpoint for the wind rose and wind statistics of the nearest weather station"""
     try:
         lat = float(request.args.get('lat'))
         lng = float(request.args.get('lng'))
+        sectors = int(request.args.get('sectors', 16))
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"Coordinates out of range: {lat}, {lng}")
+        if not 4 <= sectors <= 72:
+            raise ValueError('sectors must be between 4 and 72')
+
+        return jsonify({
+            'success': True,
+            'data': get_building_service().analyze_wind(lat, lng, sectors)
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
 
-        climate_data = building_service.analyze_climate(lat, lng)
+
+@api.route('/api/wind-roses', methods=['POST'])
+def wind_roses():
+    """API endpoint for wind roses of many sites
+
+    Expects a JSON body {"lats": [...], "lngs": [...], "sectors": 16}. Entries are
+    null for sites with no weather station in range; sites served by the same
+    station share one cached summary.
+    """
+    try:
+        payload = request.get_json(force=True)
+        sectors = int(payload.get('sectors', 16))
+        if not 4 <= sectors <= 72:
+            raise ValueError('sectors must be between 4 and 72')
 
         return jsonify({
             'success': True,
-            'data': climate_data
+            'data': get_building_service().analyze_wind_batch(payload['lats'], payload['lngs'], sectors)
         })
 
     except Exception as e:
@@ -277,6 +932,10 @@ def get_climate_data():
         }), 400
 
 
+# Module-level app for `gunicorn app:app` and `python app.py`
+app = create_app()
+
+
 if __name__ == '__main__':
     print("Starting Building Design Optimizer...")
     print("Access at: http://localhost:5000")
@@ -0,0 +1,283 @@
+# Async serving mode
+# File: asgi.py
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# Serves the same routes and JSON contracts as the Flask app in app.py, but one event
+# loop owns every connection instead of each request pinning a sync worker:
+#   - response cache hits and If-None-Match revalidation are answered on the loop
+#   - CPU-bound routes (optimization, batch analysis) run the Flask views in a process
+#     pool, so long requests never block the loop or each other
+#   - I/O-bound routes (SQLite reads, static page, CORS preflight) run the Flask views
+#     in the loop's thread pool
+#   - the NDJSON/CSV stream endpoint reads the body and writes results incrementally
+#     on the loop, handing each chunk of rows to the process pool
+# Each pool worker owns its own BuildingDesignService and write-behind DesignWriter,
+# exactly like a gunicorn sync worker does. Workers hand their latency observations
+# back with every result, so /metrics (served in the main process) covers all of them.
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from urllib.parse import parse_qsl
+
+from time import perf_counter_ns
+
+from app import (
+    CACHED_ENDPOINTS, create_app, get_building_service, iter_site_rows,
+    response_cache_key, stream_site_results
+)
+from latency_metrics import REGISTRY, REQUEST_LATENCY
+
+# Routes whose work is database or file I/O rather than computation
+IO_BOUND_ROUTES = ('/', '/api/designs/nearby', '/metrics')
+STREAM_ROUTE = '/api/analyze-sites/stream'
+
+CORS_HEADER = (b'access-control-allow-origin', b'*')
+
+
+# Process pool side. Every worker builds its own Flask app once and answers requests
+# through the test client, so views, error envelopes and headers are the real ones.
+
+_worker_app = None
+
+
+def _init_worker(config):
+    """Build the worker's Flask app and flush its design writer when the pool shuts down"""
+    global _worker_app
+    _worker_app = create_app(config=config)
+    # Pool workers leave through os._exit, which skips atexit; multiprocessing finalizers still run
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    """Flush the worker's write-behind queues, if its service was ever constructed"""
+    service = _worker_app.extensions.get('building_service')
+    if service is not None:
+        service.design_writer.close()
+        service.climate_cache.close()
+
+
+def _dispatch(app, method, path, query_string, headers, body):
+    """Run one request through a Flask app, returns (status, headers, body)"""
+    response = app.test_client().open(
+        path, method=method, query_string=query_string, headers=headers, data=body
+    )
+    return response.status_code, list(response.headers.items()), response.get_data()
+
+
+def _dispatch_in_worker(method, path, query_string, headers, body):
+    """_dispatch against the pool worker's app, plus the latency observations it made"""
+    return _dispatch(_worker_app, method, path, query_string, headers, body), REGISTRY.drain()
+
+
+def _stream_chunk(content_type, header, lines, start_index):
+    """Analyze one chunk of raw NDJSON/CSV lines, returns the encoded results and latency observations"""
+    with _worker_app.app_context():
+        raw = [header + b'\n'] if header is not None else []
+        raw.extend(line + b'\n' for line in lines)
+        rows = iter_site_rows(raw, content_type)
+        output = stream_site_results(
+            get_building_service(), rows, len(lines), start_index=start_index, first_chunk_size=len(lines)
+        )
+        return ''.join(output).encode(), REGISTRY.drain()
+
+
+class AsyncBuildingApp:
+    def __init__(self, config=None, workers=None):
+        self.config = config or {}
+        self.workers = workers or int(os.environ.get('ASYNC_WORKERS', 0)) or os.cpu_count()
+        # Main-process app: configuration, the loop-side response cache and I/O-bound views
+        self.flask_app = create_app(config=self.config)
+        self.response_cache = self.flask_app.extensions['response_cache']
+        self.process_pool = None
+
+    def start(self):
+        """Start the process pool, forkserver keeps workers free of the loop's threads"""
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('forkserver'),
+                initializer=_init_worker,
+                initargs=(self.config,)
+            )
+
+    def shutdown(self):
+        """Stop the pool, workers flush their design writers on the way out"""
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=True)
+            self.process_pool = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.handle(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """ASGI lifespan protocol: own the process pool for the server's lifetime"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, receive, send):
+        """Route one HTTP request to the loop, the thread pool or the process pool"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        method = scope['method']
+        path = scope['path']
+        query_string = scope['query_string'].decode('latin-1')
+        headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']]
+
+        if method == 'POST' and path == STREAM_ROUTE:
+            await self.stream_sites(dict(headers).get('content-type', ''), receive, send)
+            return
+
+        if method == 'GET' and path in CACHED_ENDPOINTS:
+            try:
+                key, _, _ = response_cache_key(self.response_cache, path, dict(parse_qsl(query_string)))
+            except (TypeError, ValueError, OverflowError):
+                key = None  # Invalid coordinates, let the view produce its error response
+            if key is not None:
+                await self.cached_response(key, method, path, query_string, headers, send)
+                return
+
+        body = await self.read_body(receive)
+        if path in IO_BOUND_ROUTES or method == 'OPTIONS':
+            status, response_headers, response_body = await loop.run_in_executor(
+                None, _dispatch, self.flask_app, method, path, query_string, headers, body
+            )
+        else:
+            (status, response_headers, response_body), observations = await loop.run_in_executor(
+                self.process_pool, _dispatch_in_worker, method, path, query_string, headers, body
+            )
+            REGISTRY.merge(observations)
+        await self.send_response(send, status, response_headers, response_body)
+
+    async def cached_response(self, key, method, path, query_string, headers, send):
+        """Answer a cacheable GET from the loop-side cache, computing in the pool on a miss"""
+        started = perf_counter_ns()
+        entry = self.response_cache.get(key)
+        if entry is None:
+            # Conditional headers are applied here, the worker must always return the body
+            plain_headers = [(name, value) for name, value in headers if name.lower() != 'if-none-match']
+            (status, response_headers, body), observations = await asyncio.get_running_loop().run_in_executor(
+                self.process_pool, _dispatch_in_worker, method, path, query_string, plain_headers, b''
+            )
+            REGISTRY.merge(observations)
+            if status != 200:
+                await self.send_response(send, status, response_headers, body)
+                return
+            entry = self.response_cache.put(key, body)
+            started = None
+
+        if_none_match = dict(headers).get('if-none-match', '')
+        etag = f'"{entry.etag}"'
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+        response_headers = [
+            ('ETag', etag), ('Cache-Control', 'no-cache'), ('Access-Control-Allow-Origin', '*')
+        ]
+        if not_modified:
+            status, body = 304, b''
+        else:
+            response_headers.append(('Content-Type', 'application/json'))
+            status, body = 200, entry.body
+        # Misses were already observed by the worker's Flask app
+        if started is not None and self.flask_app.config['METRICS_ENABLED']:
+            REQUEST_LATENCY.observe_ns((path, method, str(status)), perf_counter_ns() - started)
+        await self.send_response(send, status, response_headers, body)
+
+    async def stream_sites(self, content_type, receive, send):
+        """Streaming portfolio analysis: read lines as they arrive, analyze chunks in the pool
+
+        CSV records are passed on whole, quoted fields spanning lines included, for the
+        csv module to parse.
+        """
+        loop = asyncio.get_running_loop()
+        chunk_size = self.flask_app.config['STREAM_CHUNK_SIZE']
+        is_csv = 'csv' in content_type
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson'), (b'x-accel-buffering', b'no'), CORS_HEADER]
+        })
+
+        buffer = b''
+        header = None
+        # A CSV record whose quoted field runs onto the next line, until its quotes balance
+        record = b''
+        pending = []
+        index = 0
+        # Same ramp as the sync endpoint: a small first chunk for a fast first result
+        size = min(100, chunk_size)
+        more_body = True
+
+        while more_body:
+            message = await receive()
+            more_body = message.get('more_body', False)
+            buffer += message.get('body', b'')
+            lines = buffer.split(b'\n')
+            buffer = lines.pop() if more_body else b''
+
+            for line in lines:
+                if is_csv:
+                    line = record + line
+                    # Doubled quotes escape a quote, so an odd count means a quoted newline;
+                    # an unterminated quote at the end of the body is left to the csv module
+                    if line.count(b'"') % 2 and more_body:
+                        record = line + b'\n'
+                        continue
+                    record = b''
+                line = line.rstrip(b'\r')
+                if not line.strip():
+                    continue
+                if is_csv and header is None:
+                    header = line
+                else:
+                    pending.append(line)
+
+            # Only whole chunks while reading, so memory stays bounded by the chunk size
+            while len(pending) >= size or (pending and not more_body):
+                batch, pending = pending[:size], pending[size:]
+                output, observations = await loop.run_in_executor(
+                    self.process_pool, _stream_chunk, content_type, header, batch, index
+                )
+                REGISTRY.merge(observations)
+                index += len(batch)
+                size = chunk_size
+                await send({'type': 'http.response.body', 'body': output, 'more_body': True})
+
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    @staticmethod
+    async def read_body(receive):
+        """Collect the full request body"""
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def send_response(send, status, headers, body):
+        """Send a complete response"""
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = AsyncBuildingApp()
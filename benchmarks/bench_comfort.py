@@ -0,0 +1,157 @@
+# Thermal comfort benchmark
+# File: benchmarks/bench_comfort.py
+#
+# One year of hourly weather per site through two paths:
+#   scalar   - one Python call per hour and index, the way calculate_comfort_indices
+#              was used (the same formulas with the math module, UTCI term by term and
+#              the ISO 7730 iteration per hour)
+#   vector   - comfort.hourly_comfort over the whole series, categories and hour counts included
+# Both paths are checked to agree before their timings are reported.
+#   python benchmarks/bench_comfort.py --sites 20
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import comfort  # noqa: E402
+
+UTCI_TERMS = [
+    (p, d, v, t) for p in range(7) for d in range(7 - p) for v in range(7 - p - d) for t in range(7 - p - d - v)
+]
+
+
+def synthetic_weather(sites, seed=0):
+    """(sites x 8760) temperature, humidity and wind with seasonal and diurnal cycles"""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(8760)
+    season = np.cos(2 * np.pi * (hours / 8760 - 0.55))
+    diurnal = np.cos(2 * np.pi * (hours % 24 - 15) / 24)
+    mean = rng.uniform(-5, 25, (sites, 1))
+    temperature = mean + 12 * season + 5 * diurnal + rng.normal(0, 1.5, (sites, 8760))
+    humidity = np.clip(70 - 20 * diurnal + rng.normal(0, 8, (sites, 8760)), 5, 100)
+    wind = np.abs(rng.normal(4, 2.5, (sites, 8760)))
+    return temperature, humidity, wind
+
+
+def heat_index_scalar(t, rh):
+    t = t * 1.8 + 32
+    hi = 0.5 * (t + 61 + (t - 68) * 1.2 + rh * 0.094)
+    if (hi + t) / 2 >= 80:
+        hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh - 6.83783e-3 * t * t
+              - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+        if rh < 13 and 80 <= t <= 112:
+            hi -= (13 - rh) / 4 * math.sqrt(max(17 - abs(t - 95), 0) / 17)
+        elif rh > 85 and 80 <= t <= 87:
+            hi += (rh - 85) / 10 * (87 - t) / 5
+    return (hi - 32) / 1.8
+
+
+def wind_chill_scalar(t, wind):
+    kmh = wind * 3.6
+    if t > 10 or kmh < 4.8:
+        return t
+    v = kmh ** 0.16
+    return 13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v
+
+
+def humidex_scalar(t, rh):
+    return t + 5 / 9 * (6.112 * 10 ** (7.5 * t / (237.7 + t)) * rh / 100 - 10)
+
+
+def utci_scalar(ta, rh, wind):
+    tk = ta + 273.15
+    es = 0.01 * math.exp(
+        -2836.5744 / tk ** 2 - 6028.076559 / tk + 19.54263612 - 0.02737830188 * tk + 1.6261698e-05 * tk ** 2
+        + 7.0229056e-10 * tk ** 3 - 1.8680009e-13 * tk ** 4 + 2.7150305 * math.log(tk)
+    )
+    pa = es * rh / 1000
+    va = min(max(wind, 0.5), 17.0)
+    total = ta
+    for coefficient, (p, d, v, t) in zip(comfort.UTCI_COEFFICIENTS, UTCI_TERMS):
+        total += coefficient * pa ** p * 0.0 ** d * va ** v * ta ** t  # shaded, Tmrt = Ta
+    return total
+
+
+def pmv_scalar(ta, rh, vel=0.1, met=1.2, clo=0.5):
+    """ISO 7730 Annex D, one point"""
+    pa = rh * 10 * math.exp(16.6536 - 4030.183 / (ta + 235))
+    icl = 0.155 * clo
+    m = met * 58.15
+    mw = m
+    fcl = 1 + 1.29 * icl if icl <= 0.078 else 1.05 + 0.645 * icl
+    hcf = 12.1 * math.sqrt(vel)
+    taa = tra = ta + 273
+    tcla = taa + (35.5 - ta) / (3.5 * icl + 0.1)
+    p1 = icl * fcl
+    p2, p3, p4 = p1 * 3.96, p1 * 100, p1 * taa
+    p5 = 308.7 - 0.028 * mw + p2 * (tra / 100) ** 4
+    xn, xf = tcla / 100, tcla / 50
+    hc = hcf
+    while abs(xn - xf) > 1.5e-4:
+        xf = (xf + xn) / 2
+        hc = max(hcf, 2.38 * abs(100 * xf - taa) ** 0.25)
+        xn = (p5 + p4 * hc - p2 * xf ** 4) / (100 + p3 * hc)
+    tcl = 100 * xn - 273
+    heat_loss = (3.05e-3 * (5733 - 6.99 * mw - pa) + (0.42 * (mw - 58.15) if mw > 58.15 else 0)
+                 + 1.7e-5 * m * (5867 - pa) + 0.0014 * m * (34 - ta)
+                 + 3.96 * fcl * (xn ** 4 - (tra / 100) ** 4) + fcl * hc * (tcl - ta))
+    pmv = (0.303 * math.exp(-0.036 * m) + 0.028) * (mw - heat_loss)
+    return pmv, 100 - 95 * math.exp(-0.03353 * pmv ** 4 - 0.2179 * pmv ** 2)
+
+
+def scalar_site(temperature, humidity, wind):
+    """Every index hour by hour, then the annual UTCI and PMV category counts"""
+    results = {name: [] for name in ('heat_index', 'wind_chill', 'humidex', 'utci', 'pmv', 'ppd')}
+    utci_hours = dict.fromkeys(comfort.UTCI_CATEGORIES, 0)
+    pmv_hours = dict.fromkeys(comfort.PMV_CATEGORIES, 0)
+    for t, rh, v in zip(temperature.tolist(), humidity.tolist(), wind.tolist()):
+        results['heat_index'].append(heat_index_scalar(t, rh))
+        results['wind_chill'].append(wind_chill_scalar(t, v))
+        results['humidex'].append(humidex_scalar(t, rh))
+        value = utci_scalar(t, rh, v)
+        results['utci'].append(value)
+        pmv, ppd = pmv_scalar(t, rh)
+        results['pmv'].append(pmv)
+        results['ppd'].append(ppd)
+        utci_hours[comfort.UTCI_CATEGORIES[sum(value > bound for bound in comfort.UTCI_THRESHOLDS)]] += 1
+        pmv_hours[comfort.PMV_CATEGORIES[sum(abs(pmv) > bound for bound in comfort.PMV_THRESHOLDS)]] += 1
+    return results, utci_hours, pmv_hours
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vectorized comfort indices against a per-hour loop')
+    parser.add_argument('--sites', type=int, default=20)
+    parser.add_argument('--scalar-sites', type=int, default=1)
+    args = parser.parse_args()
+
+    temperature, humidity, wind = synthetic_weather(args.sites)
+
+    start = time.perf_counter()
+    scalar = [scalar_site(temperature[i], humidity[i], wind[i]) for i in range(args.scalar_sites)]
+    scalar_seconds = (time.perf_counter() - start) / args.scalar_sites
+
+    start = time.perf_counter()
+    vector = comfort.hourly_comfort(temperature, humidity, wind)
+    vector_seconds = (time.perf_counter() - start) / args.sites
+
+    for i, (results, utci_hours, pmv_hours) in enumerate(scalar):
+        for name, values in results.items():
+            difference = np.abs(np.array(values) - vector[name][i]).max()
+            assert difference < 1e-6, f'{name} differs by {difference}'
+        assert utci_hours == {name: int(counts[i]) for name, counts in vector['utci_hours'].items()}
+        assert pmv_hours == {name: int(counts[i]) for name, counts in vector['pmv_hours'].items()}
+
+    print(f'scalar  {scalar_seconds * 1000:9.1f} ms per site-year  ({8760 / scalar_seconds:,.0f} hours/s)')
+    print(f'vector  {vector_seconds * 1000:9.1f} ms per site-year  ({8760 / vector_seconds:,.0f} hours/s, '
+          f'{args.sites} sites in one call)')
+    print(f'speedup {scalar_seconds / vector_seconds:.0f}x, results identical to 1e-6')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Daylight coefficient benchmark
+# File: benchmarks/bench_daylight.py
+#
+# Annual workplane illuminance for every (room geometry, climate) pair of a small study,
+# three ways:
+#   uncached  - coefficients and sky matrix computed for every pair, as a per-geometry
+#               annual simulation does
+#   cold      - DaylightCoefficients on an empty cache: each geometry traced once, each
+#               climate's sky built once, one matrix product per pair
+#   warm      - a new DaylightCoefficients on the same directory: matrices read from disk
+# All three must give the same illuminance.
+#   python benchmarks/bench_daylight.py --geometries 12 --climates 3
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_epw import write_synthetic_epw  # noqa: E402
+from daylight_coefficients import DaylightCoefficients, room_coefficients, sky_matrix_from_epw  # noqa: E402
+
+
+def climates(directory, count):
+    """count copies of the synthetic EPW file at different latitudes"""
+    base = os.path.join(directory, 'synthetic.epw')
+    write_synthetic_epw(base)
+    with open(base) as f:
+        records = f.read().split('\n', 1)[1]
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f'climate_{index}.epw')
+        with open(path, 'w') as f:
+            f.write(f'LOCATION,Climate {index},,XX,TMY,{index},{30 + 10 * index:.1f},-74.0,-5.0,10.0\n' + records)
+        paths.append(path)
+    return paths
+
+
+def geometries(count):
+    return [{'orientation': (index * 90.0) % 360, 'window_wall_ratio': 0.2 + 0.1 * (index // 4 % 4)}
+            for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cached daylight coefficient matrices')
+    parser.add_argument('--geometries', type=int, default=12)
+    parser.add_argument('--climates', type=int, default=3)
+    args = parser.parse_args()
+
+    rooms = geometries(args.geometries)
+    with tempfile.TemporaryDirectory() as scratch:
+        paths = climates(scratch, args.climates)
+        pairs = [(room, path) for room in rooms for path in paths]
+
+        start = time.perf_counter()
+        expected = [room_coefficients(room)[0] @ sky_matrix_from_epw(path) for room, path in pairs]
+        uncached = time.perf_counter() - start
+
+        cache_dir = os.path.join(scratch, 'daylight')
+        results = {}
+        for label in ('cold', 'warm'):
+            daylight = DaylightCoefficients(cache_dir)
+            start = time.perf_counter()
+            results[label] = [daylight.illuminance(room, path) for room, path in pairs]
+            results[label + '_seconds'] = time.perf_counter() - start
+            results[label + '_metrics'] = daylight.metrics()
+
+    for label in ('cold', 'warm'):
+        assert all(np.array_equal(actual, reference) for actual, reference in zip(results[label], expected)), \
+            f'{label} illuminance differs from the uncached computation'
+    sensors, hours = expected[0].shape
+    print(f'{len(pairs)} pairs, {sensors} sensors x {hours} hours each')
+    print(f'uncached {len(pairs) / uncached:8.1f} pairs/s  ({uncached:.2f} s)')
+    for label in ('cold', 'warm'):
+        metrics = results[label + '_metrics']
+        seconds = results[label + '_seconds']
+        print(f'{label:8} {len(pairs) / seconds:8.1f} pairs/s  ({seconds:.2f} s, {uncached / seconds:5.1f}x, '
+              f'{metrics["coefficients_computed"]} geometries traced, {metrics["skies_computed"]} skies built, '
+              f'{metrics["disk_hits"]} disk hits)')
+    print('illuminance identical')
+
+
+if __name__ == '__main__':
+    main()
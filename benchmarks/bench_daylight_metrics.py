@@ -0,0 +1,95 @@
+# Daylight metrics memory and throughput benchmark
+# File: benchmarks/bench_daylight_metrics.py
+#
+# DA, UDI and ASE over a fine sensor grid's annual illuminance, stored on disk as a
+# float32 .npy file (sensors x 8760), two ways:
+#   in-memory  - the whole matrix loaded as float64, occupied hours selected, then each
+#                metric computed with whole-matrix comparisons
+#   streaming  - daylight_metrics.annual_metrics over the memory-mapped file, one block
+#                of sensor rows at a time
+# Peak memory is traced with tracemalloc (NumPy reports its buffers to it); memory-mapped
+# pages are the OS page cache and not counted. Both paths must agree.
+#   python benchmarks/bench_daylight_metrics.py --sensors 4000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import daylight_metrics  # noqa: E402
+
+
+def write_illuminance(path, sensors, seed=0, block=1024):
+    """Synthetic annual illuminance falling off with distance from the window, written in blocks"""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(8760)
+    sun = np.maximum(0, -np.cos(2 * np.pi * hours / 24)) * (0.6 + 0.4 * np.cos(2 * np.pi * (hours / 8760 - 0.55)))
+    output = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(sensors, 8760))
+    for start in range(0, sensors, block):
+        rows = min(block, sensors - start)
+        depth = rng.uniform(0.5, 10, (rows, 1))
+        cloud = rng.uniform(0.3, 1.0, 8760)
+        output[start:start + rows] = 20000 * sun * cloud / depth ** 2 + rng.exponential(50, (rows, 8760)) * sun
+    output.flush()
+    del output
+
+
+def in_memory_metrics(path, occupancy):
+    illuminance = np.load(path).astype(np.float64)[:, occupancy]
+    hours = illuminance.shape[1]
+    da = (illuminance >= 300).sum(axis=1) / hours
+    useful = ((illuminance >= 100) & (illuminance <= 2000)).sum(axis=1) / hours
+    sunlit = (illuminance > 1000).sum(axis=1)
+    return {'sDA': (da >= 0.5).mean(), 'DA': da.mean(), 'UDI': useful.mean(), 'ASE': (sunlit > 250).mean()}
+
+
+def streaming_metrics(path, occupancy):
+    metrics = daylight_metrics.annual_metrics(np.load(path, mmap_mode='r'), occupancy)
+    return {'sDA': metrics['spatial_daylight_autonomy'], 'DA': metrics['mean_daylight_autonomy'],
+            'UDI': metrics['useful_daylight_illuminance']['useful'], 'ASE': metrics['annual_sunlight_exposure']}
+
+
+def measure(function, path, occupancy):
+    """(result, seconds, peak traced bytes), timed and traced in separate runs"""
+    start = time.perf_counter()
+    function(path, occupancy)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = function(path, occupancy)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark streaming daylight metrics')
+    parser.add_argument('--sensors', type=int, default=4000)
+    args = parser.parse_args()
+
+    occupancy = daylight_metrics.occupancy_schedule()
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'illuminance.npy')
+        write_illuminance(path, args.sensors)
+        size = os.path.getsize(path)
+        results = {label: measure(function, path, occupancy)
+                   for label, function in (('in-memory', in_memory_metrics), ('streaming', streaming_metrics))}
+
+    expected = results['in-memory'][0]
+    actual = results['streaming'][0]
+    assert all(abs(actual[name] - expected[name]) < 1e-12 for name in expected), 'streaming metrics differ'
+    print(f'{args.sensors} sensors x 8760 hours, {size / 2 ** 20:.0f} MiB float32 on disk, '
+          f'{int(occupancy.sum())} occupied hours')
+    for label, (_, seconds, peak) in results.items():
+        print(f'{label:10} {args.sensors * 8760 / seconds / 1e6:8.1f} M sensor-hours/s  ({seconds:.2f} s)  '
+              f'peak {peak / 2 ** 20:8.1f} MiB')
+    print('metrics identical: ' + ', '.join(f'{name} {value:.3f}' for name, value in actual.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Lazy design sampler benchmark
+# File: benchmarks/bench_design_sampler.py
+#
+# The generate_building_variants grid (3 x 3 x 4 x 24 x 5) on a constrained site, with
+# model_builder.ModelBuilder.build standing in for the Rhino geometry (not installable
+# here), two ways:
+#   eager  - nested loops, meets_constraints per combination, geometry for every feasible
+#            one, then variants[:100], as generate_building_variants did
+#   lazy   - design_sampler.DesignSpace.sample for full-factorial, Latin hypercube and
+#            Sobol, geometry only for the 100 variants consumed
+# The eager and full-factorial variants must match.
+#   python benchmarks/bench_design_sampler.py --count 100
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from design_sampler import DEFAULT_PARAMETERS, METHODS, DesignSpace, meets_constraints  # noqa: E402
+from model_builder import ModelBuilder  # noqa: E402
+
+SITE = {'max_area': 700, 'max_height': 9}
+
+
+def eager_variants(builder, count):
+    variants = []
+    for values in itertools.product(*DEFAULT_PARAMETERS.values()):
+        params = dict(zip(DEFAULT_PARAMETERS, values))
+        if meets_constraints(params['length'], params['width'], params['height'], SITE):
+            variants.append((params, builder.build(params)))
+    return variants[:count]
+
+
+def lazy_variants(builder, method, count):
+    return [(params, builder.build(params)) for params in DesignSpace(site_params=SITE).sample(method, count, seed=0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the lazy design sampler')
+    parser.add_argument('--count', type=int, default=100)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    eager = eager_variants(ModelBuilder(), args.count)
+    eager_seconds = time.perf_counter() - start
+    space = DesignSpace(site_params=SITE)
+    print(f'{space.size} combinations, {space.feasible_count} feasible, {args.count} variants wanted')
+    print(f'eager           {eager_seconds * 1000:8.1f} ms  ({space.feasible_count} geometries built)')
+
+    for method in METHODS:
+        start = time.perf_counter()
+        lazy = lazy_variants(ModelBuilder(), method, args.count)
+        seconds = time.perf_counter() - start
+        if method == 'full_factorial':
+            assert [params for params, _ in lazy] == [params for params, _ in eager], 'variants differ'
+        print(f'{method:15} {seconds * 1000:8.1f} ms  ({len(lazy)} geometries built, {eager_seconds / seconds:5.1f}x)')
+    print('full-factorial variants identical')
+
+
+if __name__ == '__main__':
+    main()
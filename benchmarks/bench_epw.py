@@ -0,0 +1,106 @@
+# EPW reader benchmark
+# File: benchmarks/bench_epw.py
+#
+# Writes a synthetic but well-formed 8760-hour EPW file and compares:
+#   csv     - csv.reader into a dict of hourly lists, what process_8760_data consumed
+#   parse   - epw_reader.parse_epw, typed NumPy columns in one pass
+#   cached  - epw_reader.read_epw on a current .npy cache (memory-mapped)
+#   python benchmarks/bench_epw.py --runs 20
+
+import argparse
+import csv
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from epw_reader import EPW_FIELDS, parse_epw, read_epw  # noqa: E402
+
+HEADER = [
+    'LOCATION,Synthetic City,ST,USA,TMY3,999999,40.71,-74.01,-5.0,10.0',
+    'DESIGN CONDITIONS,0',
+    'TYPICAL/EXTREME PERIODS,0',
+    'GROUND TEMPERATURES,0',
+    'HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0',
+    'COMMENTS 1,Synthetic weather for benchmarks',
+    'COMMENTS 2,',
+    'DATA PERIODS,1,1,Data,Sunday, 1/ 1,12/31',
+]
+
+DAYS_PER_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def write_synthetic_epw(path, seed=0, year=2020):
+    """Plausible hourly values with seasonal and diurnal cycles, in EPW layout"""
+    rng = random.Random(seed)
+    lines = list(HEADER)
+    hour_of_year = 0
+    for month, days in enumerate(DAYS_PER_MONTH, start=1):
+        for day in range(1, days + 1):
+            for hour in range(1, 25):
+                season = math.cos(2 * math.pi * (hour_of_year / 8760 - 0.55))
+                diurnal = math.cos(2 * math.pi * (hour - 15) / 24)
+                temperature = 12 + 12 * season + 5 * diurnal + rng.gauss(0, 1.5)
+                sun = max(0.0, -math.cos(2 * math.pi * hour / 24)) * (0.6 + 0.4 * season)
+                ghi = round(900 * sun * rng.uniform(0.4, 1.0))
+                lines.append(','.join(str(value) for value in (
+                    year, month, day, hour, 60, '?9?9?9?9E0?9?9?9?9?9?9?9?9?9?9?9?9?9*9*9?9?9?9',
+                    f'{temperature:.1f}', f'{temperature - rng.uniform(1, 8):.1f}', rng.randint(30, 100),
+                    rng.randint(99000, 103000), round(1300 * sun), round(1360 * min(1, sun * 3)), rng.randint(250, 400),
+                    ghi, round(ghi * 0.7), round(ghi * 0.3), ghi * 110, round(ghi * 70), round(ghi * 35), rng.randint(0, 9000),
+                    rng.randint(0, 359), f'{rng.uniform(0, 12):.1f}', rng.randint(0, 10), rng.randint(0, 10),
+                    f'{rng.uniform(5, 30):.1f}', 77777, 9, '999999999', rng.randint(5, 40), '0.120', 0, 88,
+                    '0.160', 0, 1
+                )))
+                hour_of_year += 1
+
+    with open(path, 'w', newline='\r\n') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def csv_parse(path):
+    """Baseline: every field as a hourly Python list"""
+    names = [name for name, _ in EPW_FIELDS]
+    columns = {name: [] for name in names}
+    with open(path, newline='') as f:
+        rows = csv.reader(f)
+        for _ in range(len(HEADER)):
+            next(rows)
+        for row in rows:
+            for name, value in zip(names, row):
+                columns[name].append(value if name in ('data_source_flags', 'present_weather_codes') else float(value))
+    return columns
+
+
+def median_ms(operation, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark EPW parsing and cached loads')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'synthetic.epw')
+        write_synthetic_epw(path)
+        read_epw(path)  # build the cache
+
+        print(f"csv     {median_ms(lambda: csv_parse(path), max(3, args.runs // 4)):8.2f} ms")
+        print(f"parse   {median_ms(lambda: parse_epw(path), args.runs):8.2f} ms")
+        print(f"cached  {median_ms(lambda: read_epw(path), args.runs):8.3f} ms")
+        print(f"cached + column mean {median_ms(lambda: read_epw(path)['dry_bulb_temperature'].mean(), args.runs):8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
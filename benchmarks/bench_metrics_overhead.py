@@ -0,0 +1,148 @@
+# Latency instrumentation overhead benchmark
+# File: benchmarks/bench_metrics_overhead.py
+#
+# Measures what the stage and request histograms cost:
+#   lap            - one StageTimer.lap against the no-op NullStageTimer
+#   optimize       - optimize_building_design with and without stage timing
+#   request-timer  - the RequestTimer WSGI middleware around a trivial WSGI app
+#   analyze-site   - uncached /api/analyze-site through Flask, METRICS_ENABLED on and off
+# End-to-end request timings are noisier than the instrumentation itself on a busy
+# machine, so the per-request cost is also derived from the isolated parts: the request
+# timer plus one lap per stage (six on an uncached /api/analyze-site).
+# On/off runs are interleaved round by round so machine drift hits both sides equally,
+# each side keeps its fastest round (like timeit, the figure least disturbed by other
+# load) and the per-call difference is reported as absolute time and as a share of the call.
+#   python benchmarks/bench_metrics_overhead.py --rounds 15
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_metrics import NULL_STAGE_TIMER, LatencyHistogram, StageTimer  # noqa: E402
+
+
+def time_per_call(operation, number):
+    """Mean seconds per call over `number` calls"""
+    start = time.perf_counter()
+    for _ in range(number):
+        operation()
+    return (time.perf_counter() - start) / number
+
+
+def interleaved(on, off, number, rounds):
+    """Best per-call time of two operations, alternating which goes first each round"""
+    on_times, off_times = [], []
+    for index in range(rounds):
+        pair = [(on, on_times), (off, off_times)]
+        for operation, times in (pair if index % 2 else pair[::-1]):
+            times.append(time_per_call(operation, number))
+    return min(on_times), min(off_times)
+
+
+def lap_operations():
+    timer = StageTimer(LatencyHistogram('bench_stage_seconds', 'Benchmark stage', ('stage',)))
+
+    def timed():
+        timer.lap('stage', timer.start())
+
+    def untimed():
+        NULL_STAGE_TIMER.lap('stage', NULL_STAGE_TIMER.start())
+    return timed, untimed
+
+
+def optimize_operations(scratch):
+    from app import BuildingDesignService
+
+    path = os.path.join(scratch, 'overhead.db')
+    instrumented = BuildingDesignService(database_path=path)
+    plain = BuildingDesignService(database_path=path, instrument=False)
+    rng = random.Random(0)
+    sites = [(rng.uniform(35, 45), rng.uniform(-180, 180)) for _ in range(1000)]
+    state = {'i': 0}
+
+    def run(service):
+        state['i'] = (state['i'] + 1) % len(sites)
+        service.optimize_building_design(*sites[state['i']], 'office')
+
+    return (lambda: run(instrumented)), (lambda: run(plain))
+
+
+def request_timer_operations():
+    from app import RequestTimer
+
+    class MatchedRequest:
+        class url_rule:
+            rule = '/api/analyze-site'
+
+    def wsgi_app(environ, start_response):
+        # Stands in for Flask, which leaves its request object in the environ
+        environ['werkzeug.request'] = MatchedRequest
+        start_response('200 OK', [])
+        return [b'{}']
+
+    timed_app = RequestTimer(wsgi_app)
+    environ = {'REQUEST_METHOD': 'GET'}
+
+    def start_response(status, headers, exc_info=None):
+        pass
+    return (lambda: timed_app(environ, start_response)), (lambda: wsgi_app(environ, start_response))
+
+
+def request_operations(scratch):
+    from app import create_app
+
+    clients = [
+        create_app(config={
+            'DATABASE_PATH': os.path.join(scratch, f'api_{enabled}.db'),
+            'RESPONSE_CACHE_SIZE': 0,
+            'METRICS_ENABLED': enabled
+        }).test_client()
+        for enabled in (True, False)
+    ]
+    rng = random.Random(1)
+    sites = [(rng.uniform(35, 45), rng.uniform(-180, 180)) for _ in range(1000)]
+    state = {'i': 0}
+
+    def run(client):
+        state['i'] = (state['i'] + 1) % len(sites)
+        lat, lng = sites[state['i']]
+        response = client.get(f'/api/analyze-site?lat={lat}&lng={lng}&building_type=office')
+        assert response.status_code == 200
+
+    return (lambda: run(clients[0])), (lambda: run(clients[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cost of latency instrumentation')
+    parser.add_argument('--rounds', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        cases = [
+            ('lap', lap_operations(), 20000),
+            ('optimize', optimize_operations(scratch), 5000),
+            ('request-timer', request_timer_operations(), 20000),
+            ('analyze-site', request_operations(scratch), 300),
+        ]
+        overheads = {}
+        for name, (on, off), number in cases:
+            on(), off()  # warm up fixtures and caches
+            with_metrics, without_metrics = interleaved(on, off, number, args.rounds)
+            overheads[name] = (with_metrics - without_metrics, without_metrics)
+            overhead = with_metrics - without_metrics
+            print(f'{name:13} on {with_metrics * 1e6:9.2f} us   off {without_metrics * 1e6:9.2f} us   '
+                  f'overhead {overhead * 1e6:+7.2f} us ({overhead / without_metrics:+.1%})')
+
+    per_request = overheads['request-timer'][0] + 6 * overheads['lap'][0]
+    request_time = overheads['analyze-site'][1]
+    print(f'uncached /api/analyze-site: {per_request * 1e6:.2f} us of instrumentation per '
+          f'{request_time * 1e6:.0f} us request ({per_request / request_time:.2%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Incremental model builder benchmark
+# File: benchmarks/bench_model_builder.py
+#
+# The ParametricBuildingGenerator sweep (length x width x height x orientation x WWR,
+# 4,320 variants) with two envelope options, every model kept in memory like an
+# optimizer's population:
+#   scratch      - each variant built from nothing, materials and constructions included,
+#                  as create_building_model did
+#   incremental  - ModelBuilder.sweep: shared library, each variant derived from the
+#                  previous one and rebuilding only its dirty sections
+# Both paths must produce equal model dicts.
+#   python benchmarks/bench_model_builder.py
+
+import argparse
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_builder import ModelBuilder  # noqa: E402
+
+GRID = {
+    'wall_u': [0.35, 0.2],
+    'length': [20, 30, 40],
+    'width': [15, 20, 25],
+    'height': [3, 6, 9, 12],
+    'orientation': range(0, 360, 15),
+    'window_wall_ratio': [0.1, 0.2, 0.3, 0.4, 0.5],
+}
+
+
+def measure(build):
+    """(models, seconds, peak traced bytes) of one way of building the sweep
+
+    Timed without tracing, tracemalloc slows allocation-heavy code several times over.
+    """
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    models = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return models, seconds, peak
+
+
+def main():
+    argparse.ArgumentParser(description='Benchmark incremental model assembly').parse_args()
+    names = list(GRID)
+    combinations = list(itertools.product(*GRID.values()))
+
+    scratch, scratch_seconds, scratch_peak = measure(
+        lambda: [ModelBuilder().build(dict(zip(names, values))).to_dict() for values in combinations]
+    )
+    builders = []
+
+    def sweep():
+        builders.append(ModelBuilder())
+        return [model.to_dict() for model in builders[-1].sweep(GRID)]
+    incremental, incremental_seconds, incremental_peak = measure(sweep)
+
+    assert scratch == incremental, 'incremental models differ from models built from scratch'
+    metrics = builders[-1].metrics()
+    for label, seconds, peak in (('scratch', scratch_seconds, scratch_peak),
+                                 ('incremental', incremental_seconds, incremental_peak)):
+        print(f'{label:12} {len(combinations) / seconds:10,.0f} models/s  {peak / 2 ** 20:7.1f} MiB peak  '
+              f'({len(combinations)} models in {seconds:.2f} s)')
+    print(f'speedup {scratch_seconds / incremental_seconds:.1f}x, memory {scratch_peak / incremental_peak:.1f}x less, '
+          f'{metrics["sections_shared"]:,} sections shared / {metrics["sections_built"]:,} built, '
+          f'{metrics["library"]["materials"]} materials, {metrics["library"]["constructions"]} constructions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Nearest stored designs benchmark
+# File: benchmarks/bench_nearby.py
+#
+# Fills a scratch database with N synthetic designs through the real schema (so the
+# R*Tree triggers do the indexing), then times nearest_rows for random sites.
+#   python benchmarks/bench_nearby.py --rows 1000000 --queries 2000 --k 10
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from design_store import ConnectionPool, haversine_km, nearest_rows  # noqa: E402
+
+
+def site_generator(clustered, seed):
+    """Random coordinates, uniform over the globe or clustered around 200 fixed cities"""
+    centre_rng = random.Random(0)
+    centres = [(centre_rng.uniform(-60, 60), centre_rng.uniform(-180, 180)) for _ in range(200)]
+    rng = random.Random(seed)
+
+    def coordinates():
+        if clustered:
+            lat, lng = rng.choice(centres)
+            return max(-90, min(90, rng.gauss(lat, 0.5))), ((rng.gauss(lng, 0.5) + 180) % 360) - 180
+        return rng.uniform(-90, 90), rng.uniform(-180, 180)
+
+    return coordinates
+
+
+def populate(path, rows, clustered):
+    """Insert synthetic designs through the real schema"""
+    from app import BuildingDesignService
+
+    service = BuildingDesignService(database_path=path)
+    coordinates = site_generator(clustered, seed=1)
+
+    with service.db_pool.connection() as conn:
+        for start in range(0, rows, 100000):
+            batch = [
+                (*coordinates(), 'residential', 180.0, 0.3, 100.0, '{}')
+                for _ in range(min(100000, rows - start))
+            ]
+            with conn:
+                conn.executemany(
+                    'INSERT INTO building_designs (lat, lng, building_type, orientation, '
+                    'window_wall_ratio, energy_consumption, design_parameters) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    batch
+                )
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run(path, queries, k, verify, clustered=False):
+    """Time nearest_rows for random sites and optionally check against a full scan"""
+    pool = ConnectionPool(path, size=1)
+    coordinates = site_generator(clustered, seed=2)
+    sites = [coordinates() for _ in range(queries)]
+
+    timings = []
+    with pool.connection() as conn:
+        for lat, lng in sites[:50]:
+            nearest_rows(conn, 'building_designs', lat, lng, k)  # warm the page cache
+
+        for lat, lng in sites:
+            start = time.perf_counter()
+            nearest_rows(conn, 'building_designs', lat, lng, k)
+            timings.append(time.perf_counter() - start)
+
+        if verify:
+            everything = conn.execute('SELECT id, lat, lng FROM building_designs').fetchall()
+            for lat, lng in sites[:verify]:
+                expected = sorted(everything, key=lambda row: haversine_km(lat, lng, row[1], row[2]))[:k]
+                found = nearest_rows(conn, 'building_designs', lat, lng, k)
+                assert [row[0] for row in expected] == [row['id'] for row in found], (lat, lng)
+
+    timings.sort()
+    return {
+        'queries': queries,
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p90_ms': percentile(timings, 0.90) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'max_ms': timings[-1] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark nearest stored design queries')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--clustered', action='store_true',
+                        help='Cluster designs and query sites around 200 cities instead of the whole globe')
+    parser.add_argument('--verify', type=int, default=0, help='Check N queries against a full scan')
+    parser.add_argument('--database', help='Reuse an existing database instead of a scratch one')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = args.database or os.path.join(scratch, 'bench_designs.db')
+        if not args.database:
+            start = time.perf_counter()
+            populate(path, args.rows, args.clustered)
+            print(f"Inserted {args.rows} designs in {time.perf_counter() - start:.1f}s")
+
+        rows = sqlite3.connect(path).execute('SELECT count(*) FROM building_designs').fetchone()[0]
+        stats = run(path, args.queries, args.k, args.verify, args.clustered)
+        print(f"{rows} rows, k={args.k}: p50 {stats['p50_ms']:.3f} ms, p90 {stats['p90_ms']:.3f} ms, "
+              f"p99 {stats['p99_ms']:.3f} ms, max {stats['max_ms']:.3f} ms over {stats['queries']} queries")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# 5R1C simulator benchmark
+# File: benchmarks/bench_rc.py
+#
+# A year of hourly simulation for a batch of random designs on a synthetic EPW file:
+#   batch      - rc_simulator.simulate, all designs stepped together
+#   reference  - ISO 13790 Annex C as written, one design and one hour at a time in plain
+#                Python, with the standard's two-trial (0 and 10 W/m2) heating/cooling procedure
+# The reference is run on a sample of the designs and both paths must agree.
+#   python benchmarks/bench_rc.py --designs 10000 --reference-designs 3
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_epw import write_synthetic_epw  # noqa: E402
+from rc_simulator import (  # noqa: E402
+    WARMUP_HOURS, aperture_matrix, design_columns, envelope, network_step, random_designs, simulate, weather_from_epw
+)
+
+
+def reference_hour(zone, theta_m, theta_e, internal, solar, heating_setpoint, cooling_setpoint):
+    """Heating (+) or cooling (-) power and the next mass temperature, ISO 13790 C.4.2"""
+    trial = 10 * zone['floor_area']
+    _, air_free, _ = network_step(zone, theta_m, theta_e, internal, solar, 0.0)
+    if heating_setpoint <= air_free <= cooling_setpoint:
+        power = 0.0
+    else:
+        setpoint = heating_setpoint if air_free < heating_setpoint else cooling_setpoint
+        _, air_trial, _ = network_step(zone, theta_m, theta_e, internal, solar, trial)
+        power = trial * (setpoint - air_free) / (air_trial - air_free)
+    theta_m, _, _ = network_step(zone, theta_m, theta_e, internal, solar, power)
+    return power, theta_m
+
+
+def reference_design(zone, design, aperture, weather):
+    """Annual (heating kWh, cooling kWh, peak heating W, peak cooling W) of one design"""
+    temperature = weather['temperature'].tolist()
+    solar = (aperture @ weather['facade_irradiance']).tolist()
+    hours = len(temperature)
+    internal = design['internal_gains'] * zone['floor_area']
+    setpoints = design['heating_setpoint'], design['cooling_setpoint']
+
+    theta_m = design['heating_setpoint']
+    for index in range(hours - WARMUP_HOURS, hours):
+        _, theta_m = reference_hour(zone, theta_m, temperature[index], internal, solar[index], *setpoints)
+
+    heating = cooling = peak_heating = peak_cooling = 0.0
+    for index in range(hours):
+        power, theta_m = reference_hour(zone, theta_m, temperature[index], internal, solar[index], *setpoints)
+        heating += max(power, 0.0)
+        cooling += max(-power, 0.0)
+        peak_heating = max(peak_heating, power)
+        peak_cooling = max(peak_cooling, -power)
+    return heating / 1000, cooling / 1000, peak_heating, peak_cooling
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized 5R1C simulator')
+    parser.add_argument('--designs', type=int, default=10000)
+    parser.add_argument('--reference-designs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'synthetic.epw')
+        write_synthetic_epw(path)
+        weather = weather_from_epw(path, cache_dir=scratch)
+
+    designs = random_designs(args.designs)
+    start = time.perf_counter()
+    results = simulate(designs, weather)
+    batch_seconds = time.perf_counter() - start
+    print(f'batch      {args.designs / batch_seconds:10,.0f} designs/s  ({args.designs} designs in {batch_seconds:.2f} s)')
+
+    count = min(args.reference_designs, args.designs)
+    columns = design_columns(designs)
+    start = time.perf_counter()
+    worst = 0.0
+    for i in range(count):
+        design = {name: float(values[i]) for name, values in columns.items()}
+        zone = {name: float(values[i]) for name, values in envelope(columns).items()}
+        aperture = aperture_matrix(columns, envelope(columns)['window_area'], weather['facade_irradiance'].shape[0])[i]
+        expected = reference_design(zone, design, aperture, weather)
+        actual = [results[name][i] for name in
+                  ('heating_demand', 'cooling_demand', 'peak_heating_load', 'peak_cooling_load')]
+        worst = max(worst, max(abs(a - e) / max(abs(e), 1.0) for a, e in zip(actual, expected)))
+    reference_seconds = (time.perf_counter() - start) / max(count, 1)
+    print(f'reference  {1 / reference_seconds:10,.1f} designs/s  ({count} designs, one hour at a time)')
+    print(f'speedup {reference_seconds / (batch_seconds / args.designs):,.0f}x, '
+          f'max relative difference {worst:.1e} over energy and peak loads')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+# Serving stack load benchmark
+# File: benchmarks/bench_serving.py
+#
+# Starts the sync stack (gunicorn sync workers, as in the Docker image) and the async
+# stack (uvicorn asgi:app) on scratch databases, drives each with the same number of
+# concurrent client connections and reports throughput and latency per scenario:
+#   misses  - /api/analyze-site at distinct coordinates, every request is computed
+#   hits    - /api/climate-data at a few hundred coordinates, mostly cache hits
+#   mixed   - small /api/climate-data requests while some connections post large batches
+#   python benchmarks/bench_serving.py --connections 64 --duration 10 --workers 4
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STACKS = {
+    'sync': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app'
+    ],
+    'async': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning'
+    ],
+}
+STACK_MODULES = {'sync': 'gunicorn', 'async': 'uvicorn'}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(stack, workers, scratch):
+    """Launch a server process and wait until it answers, returns (process, port)"""
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT, ASYNC_WORKERS=str(workers),
+               DATABASE_PATH=os.path.join(scratch, f'{stack}.db'))
+    process = subprocess.Popen(
+        STACKS[stack](port, workers), cwd=scratch, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1) as sock:
+                sock.sendall(b'GET /api/climate-data?lat=0&lng=0 HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+                if sock.recv(12).startswith(b'HTTP/1.1 200'):
+                    return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{stack} server did not start')
+
+
+async def request(reader, writer, method, target, body=b''):
+    """One HTTP/1.1 request, returns (status code, whether the server keeps the connection open)"""
+    head = f'{method} {target} HTTP/1.1\r\nHost: bench\r\n'
+    if body:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(head.encode() + b'\r\n' + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length, chunked, keep_alive = 0, False, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+        elif name.lower() == 'connection' and 'close' in value.lower():
+            keep_alive = False  # gunicorn sync workers close after every response
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+def request_factory(scenario, index, rng):
+    """(kind, method, target, body) generator for one connection"""
+    batch = json.dumps({
+        'lats': [rng.uniform(-60, 60) for _ in range(2000)],
+        'lngs': [rng.uniform(-180, 180) for _ in range(2000)],
+    }).encode()
+    hot_sites = [(round(rng.uniform(-60, 60), 2), round(rng.uniform(-180, 180), 2)) for _ in range(300)]
+
+    def next_request():
+        if scenario == 'misses':
+            return 'small', 'GET', f'/api/analyze-site?lat={rng.uniform(-60, 60):.6f}&lng={rng.uniform(-180, 180):.6f}', b''
+        if scenario == 'mixed' and index % 8 == 0:
+            return 'batch', 'POST', '/api/analyze-sites', batch
+        lat, lng = rng.choice(hot_sites)
+        return 'small', 'GET', f'/api/climate-data?lat={lat}&lng={lng}', b''
+
+    return next_request
+
+
+async def drive(port, scenario, connections, duration):
+    """Run all connections for `duration` seconds, returns latency lists by request kind"""
+    latencies = {'small': [], 'batch': []}
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def connection(index):
+        nonlocal errors
+        next_request = request_factory(scenario, index, random.Random(index))
+        writer = None
+        try:
+            while time.monotonic() < deadline:
+                kind, method, target, body = next_request()
+                start = time.perf_counter()
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                status, keep_alive = await request(reader, writer, method, target, body)
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+                if status != 200:
+                    errors += 1
+                latencies[kind].append(time.perf_counter() - start)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    await asyncio.gather(*(connection(index) for index in range(connections)))
+    return latencies, errors
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(latencies, errors, duration):
+    """Throughput and latency percentiles per request kind"""
+    summary = {'errors': errors}
+    for kind, values in latencies.items():
+        if values:
+            values.sort()
+            summary[kind] = {
+                'requests': len(values),
+                'rps': len(values) / duration,
+                'p50_ms': percentile(values, 0.50) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000
+            }
+    return summary
+
+
+def run(stacks, scenarios, connections, duration, workers):
+    """Benchmark every stack on every scenario, returns {stack: {scenario: summary}}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for stack in stacks:
+            if shutil.which(STACK_MODULES[stack]) is None and subprocess.run(
+                    [sys.executable, '-c', f'import {STACK_MODULES[stack]}'], capture_output=True).returncode:
+                print(f'skipping {stack}: {STACK_MODULES[stack]} is not installed')
+                continue
+
+            process, port = start_server(stack, workers, scratch)
+            try:
+                results[stack] = {}
+                for scenario in scenarios:
+                    latencies, errors = asyncio.run(drive(port, scenario, connections, duration))
+                    results[stack][scenario] = summarize(latencies, errors, duration)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the sync and async serving stacks under concurrent load')
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per scenario')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='gunicorn sync workers / async process pool size')
+    parser.add_argument('--stacks', nargs='+', default=list(STACKS), choices=list(STACKS))
+    parser.add_argument('--scenarios', nargs='+', default=['misses', 'hits', 'mixed'],
+                        choices=['misses', 'hits', 'mixed'])
+    args = parser.parse_args()
+
+    results = run(args.stacks, args.scenarios, args.connections, args.duration, args.workers)
+    for stack, scenarios in results.items():
+        for scenario, summary in scenarios.items():
+            for kind in ('small', 'batch'):
+                if kind in summary:
+                    stats = summary[kind]
+                    print(f"{stack:5} {scenario:6} {kind:5}: {stats['rps']:8.1f} req/s, "
+                          f"p50 {stats['p50_ms']:8.2f} ms, p99 {stats['p99_ms']:8.2f} ms")
+            if summary['errors']:
+                print(f"{stack:5} {scenario:6} non-200: {summary['errors']} (hot-zone sites answer with the 400 envelope)")
+
+
+if __name__ == '__main__':
+    main()
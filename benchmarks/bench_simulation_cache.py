@@ -0,0 +1,94 @@
+# Simulation result cache benchmark
+# File: benchmarks/bench_simulation_cache.py
+#
+# An optimizer-like request stream, many requests over fewer distinct models, through
+# SimulationRunner with the 5R1C simulator standing in for EnergyPlus:
+#   uncached  - every request simulated in this process, one after the other
+#   cold      - empty cache: distinct models run once in the worker pool, repeats are
+#               coalesced onto the run in flight
+#   warm      - a new runner on the same cache directory: every request a disk hit
+# All three paths must return the same results.
+#   python benchmarks/bench_simulation_cache.py --requests 100 --unique 25
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_epw import write_synthetic_epw  # noqa: E402
+from rc_simulator import random_designs  # noqa: E402
+from simulation_cache import ResultCache, SimulationRunner  # noqa: E402
+
+
+def rc_simulate():
+    """Worker factory: simulate(design dict, EPW path) with the path's weather loaded once"""
+    from rc_simulator import simulate_design, weather_from_epw
+
+    weather = {}
+
+    def simulate(design, path):
+        if path not in weather:
+            weather[path] = weather_from_epw(path)
+        return simulate_design(design, weather[path])
+    return simulate
+
+
+def request_stream(requests, unique, seed=0):
+    """Design dicts, `requests` of them drawn with repeats from `unique` distinct designs"""
+    columns = random_designs(unique, seed=seed)
+    designs = [{name: values[i].item() for name, values in columns.items()} for i in range(unique)]
+    rng = random.Random(seed)
+    stream = designs + [rng.choice(designs) for _ in range(requests - unique)]
+    rng.shuffle(stream)
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the simulation result cache and runner')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--unique', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    stream = request_stream(args.requests, min(args.unique, args.requests))
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'synthetic.epw')
+        write_synthetic_epw(path)
+
+        simulate = rc_simulate()
+        start = time.perf_counter()
+        expected = [simulate(design, path) for design in stream]
+        uncached = time.perf_counter() - start
+        print(f'uncached {len(stream) / uncached:10,.1f} requests/s  ({len(stream)} simulations in {uncached:.2f} s)')
+
+        cache_dir = os.path.join(scratch, 'results')
+        with SimulationRunner(rc_simulate, ResultCache(cache_dir), version='bench', workers=args.workers) as runner:
+            start = time.perf_counter()
+            cold_results = runner.map(stream, path)
+            cold = time.perf_counter() - start
+            metrics = runner.metrics()
+        print(f'cold     {len(stream) / cold:10,.1f} requests/s  ({metrics["runs"]} runs, '
+              f'{metrics["coalesced"]} coalesced, {metrics["cache_hits"]} hits, pool start included)')
+
+        with SimulationRunner(rc_simulate, ResultCache(cache_dir), version='bench') as runner:
+            start = time.perf_counter()
+            warm_results = runner.map(stream, path)
+            warm = time.perf_counter() - start
+            metrics = runner.metrics()
+        print(f'warm     {len(stream) / warm:10,.1f} requests/s  ({metrics["cache_hits"]} hits, '
+              f'{metrics["cache"]["bytes"]:,} bytes on disk)')
+
+    for results in (cold_results, warm_results):
+        for actual, reference in zip(results, expected):
+            assert actual.keys() == reference.keys()
+            assert all(abs(actual[name] - reference[name]) <= 1e-9 * max(1.0, abs(reference[name]))
+                       for name in reference), 'cached results differ from direct simulation'
+    print(f'speedup cold {uncached / cold:,.1f}x, warm {uncached / warm:,.0f}x, results identical')
+
+
+if __name__ == '__main__':
+    main()
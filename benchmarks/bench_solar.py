@@ -0,0 +1,96 @@
+# Solar engine benchmark
+# File: benchmarks/bench_solar.py
+#
+# Clear-sky irradiance for a year of hourly samples over many sites:
+#   engine  - solar_engine.clear_sky_summary, all sites in one call, per chunk size
+#   pvlib   - Location.get_clearsky site by site (only when pvlib is installed)
+# With pvlib available the engine's hourly GHI/DNI/DHI and sun position are also
+# checked against it for a sample of sites, and the worst differences reported.
+#   python benchmarks/bench_solar.py --sites 5000
+#   python benchmarks/bench_solar.py --sites 500 --pvlib-sites 20
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solar_engine import clear_sky, clear_sky_summary, hourly_times, solar_position  # noqa: E402
+
+YEAR = 2023
+
+
+def random_sites(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-66, 66, count), rng.uniform(-180, 180, count), rng.uniform(0, 2500, count)
+
+
+def best_seconds(operation, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare_with_pvlib(lats, lngs, altitudes, pvlib_sites, runs):
+    import pandas as pd
+    from pvlib.location import Location
+
+    times = hourly_times(YEAR)
+    index = pd.DatetimeIndex(times).tz_localize('UTC')
+    count = min(pvlib_sites, len(lats))
+
+    def pvlib_loop():
+        for lat, lng, altitude in zip(lats[:count], lngs[:count], altitudes[:count]):
+            Location(lat, lng, altitude=altitude).get_clearsky(index, linke_turbidity=3.0)
+
+    seconds = best_seconds(pvlib_loop, max(1, runs // 2))
+    print(f'pvlib   {count / seconds:10.0f} sites/s  ({count} sites one at a time)')
+
+    grids = clear_sky(lats[:count], lngs[:count], times, altitudes[:count])
+    position = solar_position(lats[:count], lngs[:count], times, altitudes[:count])
+    worst = {name: 0.0 for name in ('ghi', 'dni', 'dhi', 'zenith', 'azimuth')}
+    for i in range(count):
+        location = Location(lats[i], lngs[i], altitude=altitudes[i])
+        reference_position = location.get_solarposition(index)
+        reference = location.get_clearsky(index, linke_turbidity=3.0, solar_position=reference_position)
+        for name in ('ghi', 'dni', 'dhi'):
+            worst[name] = max(worst[name], np.abs(grids[name][i] - reference[name].to_numpy()).max())
+        up = reference_position['apparent_elevation'].to_numpy() > 0
+        worst['zenith'] = max(worst['zenith'], np.abs(position['zenith'][i] - reference_position['zenith'].to_numpy()).max())
+        azimuth = (position['azimuth'][i] - reference_position['azimuth'].to_numpy() + 180) % 360 - 180
+        worst['azimuth'] = max(worst['azimuth'], np.abs(azimuth[up]).max())
+    print(f"max |engine - pvlib| over {count} sites: GHI {worst['ghi']:.2f}, DNI {worst['dni']:.2f}, "
+          f"DHI {worst['dhi']:.2f} W/m2; zenith {worst['zenith']:.3f}, azimuth {worst['azimuth']:.3f} deg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized clear-sky engine')
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--pvlib-sites', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    lats, lngs, altitudes = random_sites(args.sites)
+    for chunk_sites in (16, 32, 128, 512):
+        seconds = best_seconds(
+            lambda: clear_sky_summary(lats, lngs, YEAR, altitudes, chunk_sites=chunk_sites), args.runs
+        )
+        print(f'engine  {args.sites / seconds:10.0f} sites/s  (chunks of {chunk_sites} sites, '
+              f'{chunk_sites * len(hourly_times(YEAR)) * 4 / 2**20:.1f} MiB per hourly array)')
+
+    try:
+        import pvlib  # noqa: F401
+    except ImportError:
+        print('pvlib not installed, skipping the comparison')
+        return
+    compare_with_pvlib(lats, lngs, altitudes, args.pvlib_sites, args.runs)
+
+
+if __name__ == '__main__':
+    main()
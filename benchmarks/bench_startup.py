@@ -0,0 +1,62 @@
+# Cold start benchmark
+# File: benchmarks/bench_startup.py
+#
+# Spawns fresh interpreters, the way a new gunicorn worker or an autoscaled container
+# would start, and reports the median of:
+#   import       - `import app` (module import, includes building the module-level app)
+#   first_response - process start to the first /api/climate-data response, which
+#                    includes the lazy BuildingDesignService construction
+#   python benchmarks/bench_startup.py --runs 15
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+client = app.create_app(config={{'DATABASE_PATH': {database!r}}}).test_client()
+response = client.get('/api/climate-data?lat=40.7128&lng=-74.0060')
+assert response.status_code == 200, response.data
+done = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'first_response': done - start}}))
+'''
+
+
+def measure(runs):
+    """Median import and time-to-first-response over fresh interpreter runs"""
+    samples = {'import': [], 'first_response': []}
+    with tempfile.TemporaryDirectory() as scratch:
+        # Run in the scratch directory so the module-level app never touches a real database
+        probe = PROBE.format(root=ROOT, database=os.path.join(scratch, 'startup.db'))
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', probe], cwd=scratch, capture_output=True, text=True, check=True
+            ).stdout
+            for name, seconds in json.loads(output.strip().splitlines()[-1]).items():
+                samples[name].append(seconds)
+
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark app import time and time to first response')
+    parser.add_argument('--runs', type=int, default=15)
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(f"import app: {result['import'] * 1000:.1f} ms, "
+          f"first response: {result['first_response'] * 1000:.1f} ms (median of {args.runs} runs)")
+
+
+if __name__ == '__main__':
+    main()
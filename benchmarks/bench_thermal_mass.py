@@ -0,0 +1,98 @@
+# Thermal mass benchmark
+# File: benchmarks/bench_thermal_mass.py
+#
+# Daily thermal mass benefit of an optimizer population over a year of hourly
+# temperatures, three ways:
+#   loop      - calculate_thermal_mass_effect's Python loop over the material layers,
+#               repeated for the diurnal swing of each of the 365 days
+#   lists     - thermal_mass.mass_benefit_summary on the same lists of material dicts
+#   matrices  - the population already held as (designs x layers) arrays
+# All three must agree.
+#   python benchmarks/bench_thermal_mass.py --designs 10000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import thermal_mass  # noqa: E402
+
+# (density, specific heat, thickness range) of candidate layers
+LAYER_TYPES = (
+    (2000.0, 1000.0, (0.1, 0.3)),   # concrete
+    (1400.0, 1000.0, (0.1, 0.2)),   # block
+    (30.0, 840.0, (0.05, 0.3)),     # insulation
+    (900.0, 1000.0, (0.0125, 0.025)),  # gypsum
+    (500.0, 1600.0, (0.02, 0.1)),   # timber
+)
+
+
+def random_population(count, seed=0):
+    """count designs of 1 to 6 random material layers"""
+    rng = np.random.default_rng(seed)
+    designs = []
+    for _ in range(count):
+        layers = []
+        for kind in rng.integers(len(LAYER_TYPES), size=rng.integers(1, 7)):
+            density, specific_heat, (low, high) = LAYER_TYPES[kind]
+            layers.append({'density': density, 'specific_heat': specific_heat,
+                           'thickness': float(rng.uniform(low, high))})
+        designs.append(layers)
+    return designs
+
+
+def synthetic_temperature(seed=0):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(8760)
+    return (12 + 10 * np.cos(2 * np.pi * (hours / 8760 - 0.55)) + 5 * np.cos(2 * np.pi * (hours % 24 - 15) / 24)
+            + rng.normal(0, 1.0, 8760))
+
+
+def loop_benefit(designs, hourly_temperature):
+    """(designs x days) benefit, one design and one day at a time"""
+    temperature = hourly_temperature.tolist()
+    swings = [max(temperature[day * 24:day * 24 + 24]) - min(temperature[day * 24:day * 24 + 24])
+              for day in range(len(temperature) // 24)]
+    series = []
+    for materials in designs:
+        thermal_mass_capacity = sum([mat['density'] * mat['specific_heat'] * mat['thickness'] for mat in materials])
+        series.append([min(0.15, thermal_mass_capacity / 1000 * swing / 10) for swing in swings])
+    return np.array(series)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vectorized thermal mass evaluation')
+    parser.add_argument('--designs', type=int, default=10000)
+    args = parser.parse_args()
+
+    designs = random_population(args.designs)
+    temperature = synthetic_temperature()
+
+    start = time.perf_counter()
+    expected = loop_benefit(designs, temperature)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lists = thermal_mass.mass_benefit_summary(designs, temperature)['daily_benefit']
+    lists_seconds = time.perf_counter() - start
+
+    matrices = thermal_mass.layer_matrix(designs)
+    start = time.perf_counter()
+    capacity = thermal_mass.areal_heat_capacity(*matrices)
+    benefit = thermal_mass.mass_benefit(capacity, thermal_mass.diurnal_ranges(temperature))
+    matrix_seconds = time.perf_counter() - start
+
+    for actual in (lists, benefit):
+        assert np.allclose(actual, expected, rtol=1e-12, atol=1e-15), 'vectorized benefit differs from the loop'
+    for label, seconds in (('loop', loop_seconds), ('lists', lists_seconds), ('matrices', matrix_seconds)):
+        print(f'{label:9} {args.designs / seconds:12,.0f} designs/s  ({seconds * 1000:8.1f} ms, '
+              f'{loop_seconds / seconds:6.1f}x)')
+    print(f'{args.designs} designs x {benefit.shape[1]} days, results identical')
+
+
+if __name__ == '__main__':
+    main()
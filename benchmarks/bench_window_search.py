@@ -0,0 +1,69 @@
+# Window layout search benchmark
+# File: benchmarks/bench_window_search.py
+#
+# Every generate_layouts candidate for one room, scored by annual daylight (sDA less ASE
+# on direct sun, from the daylight coefficient engine on a synthetic EPW file), two ways:
+#   exhaustive  - every candidate evaluated, as optimize_window_placement did
+#   search      - window_search.search_layouts: duplicates, mirror images, dominated and
+#                 gloomy (low daylight factor) layouts dropped before the parallel evaluation
+# Reports the evaluations avoided and where the search's picks rank in the exhaustive order.
+#   python benchmarks/bench_window_search.py --orientation 180 --top-k 5
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_epw import write_synthetic_epw  # noqa: E402
+from daylight_coefficients import DaylightCoefficients  # noqa: E402
+from daylight_metrics import annual_metrics, occupancy_schedule  # noqa: E402
+from window_search import daylight_score, generate_layouts, layout_key, search_layouts  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pruned window layout search')
+    parser.add_argument('--orientation', type=float, default=180.0)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    room = {'width': 6.0, 'depth': 8.0, 'height': 3.0, 'orientation': args.orientation}
+    layouts = generate_layouts(room)
+    occupancy = occupancy_schedule()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'synthetic.epw')
+        write_synthetic_epw(path)
+        daylight = DaylightCoefficients(os.path.join(scratch, 'daylight'), max_entries=4)
+        daylight.sky(path)
+
+        def evaluate(layout):
+            geometry = dict(room, windows=layout)
+            return daylight_score(annual_metrics(daylight.iter_illuminance(geometry, path), occupancy,
+                                                 direct=daylight.iter_direct_illuminance(geometry, path)))
+
+        start = time.perf_counter()
+        exhaustive = sorted(((evaluate(layout), index) for index, layout in enumerate(layouts)), reverse=True)
+        exhaustive_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = search_layouts(layouts, evaluate, room, top_k=args.top_k, workers=args.workers)
+        search_seconds = time.perf_counter() - start
+
+    rank = {layout_key(layouts[index]): position for position, (_, index) in enumerate(exhaustive)}
+    stats = result['stats']
+    print(f'{len(layouts)} candidate layouts, facade azimuth {args.orientation:.0f}')
+    print(f'exhaustive {len(layouts):5} evaluations  {exhaustive_seconds:7.2f} s  best score {exhaustive[0][0]:.3f}')
+    print(f'search     {stats["evaluated"]:5} evaluations  {search_seconds:7.2f} s  best score '
+          f'{result["ranked"][0]["score"]:.3f}  ({exhaustive_seconds / search_seconds:.1f}x)')
+    print(f'avoided {stats["evaluations_avoided"]} evaluations: {stats["duplicates"]} duplicate/mirrored, '
+          f'{stats["dominated"]} dominated, {stats["screened"]} below the daylight factor floor')
+    print('search top-k at exhaustive ranks ' + ', '.join(str(rank[layout_key(entry['layout'])] + 1)
+                                                        for entry in result['ranked']))
+
+
+if __name__ == '__main__':
+    main()
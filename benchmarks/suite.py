@@ -0,0 +1,746 @@
+# Benchmark suite with JSON baselines and regression gates
+# File: benchmarks/suite.py
+#
+# Every case is warmed up, then timed call by call with perf_counter_ns over several
+# repeats. Throughput is that of the fastest repeat (items per second, an item being a
+# site for batch paths), which like timeit's min is the figure least disturbed by other
+# load on the machine; the median repeat, steadier from run to run, is what compare
+# gates on. Latency percentiles are taken over every timed call.
+#   python benchmarks/suite.py run                                  # all default cases
+#   python benchmarks/suite.py run -k api --output current.json     # cases matching a regex
+#   python benchmarks/suite.py run --save-baseline                  # refresh baselines/baseline.json
+#   python benchmarks/suite.py run --compare benchmarks/baselines/baseline.json
+#   python benchmarks/suite.py compare baseline.json current.json
+# compare exits with status 1 when a case's median-repeat throughput dropped by more than
+# --throughput-threshold or its p99 latency grew by more than --p99-threshold. The
+# defaults sit above the run-to-run noise measured on the baseline machine (median
+# throughput within 25%, p99 within 2.6x on a shared single CPU; regressed cases are
+# re-measured --retries times). Results record the --scale they ran at and only compare
+# at the same scale. Refresh a case's baseline in the change that alters the code it
+# measures.
+#
+# New hot paths register a case with the @benchmark decorator: a factory taking the
+# scratch directory and returning the zero-argument callable to time.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_epw import write_synthetic_epw  # noqa: E402
+from bench_nearby import populate, site_generator  # noqa: E402
+from bench_startup import PROBE  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'baseline.json')
+# Regression gates, above the measured run-to-run noise (see the header)
+THROUGHPUT_THRESHOLD = 0.30
+P99_THRESHOLD = 2.0
+
+CASES = {}
+
+
+class Case:
+    def __init__(self, name, factory, items, number, repeat, warmup, slow):
+        self.name = name
+        self.factory = factory
+        self.items = items
+        self.number = number
+        self.repeat = repeat
+        self.warmup = warmup
+        self.slow = slow
+
+
+def benchmark(name, items=1, number=200, repeat=7, warmup=20, slow=False):
+    """Register a benchmark case; slow cases only run when asked for"""
+    def register(factory):
+        CASES[name] = Case(name, factory, items, number, repeat, warmup, slow)
+        return factory
+    return register
+
+
+# Shared fixtures, one per scratch directory and configuration
+
+_fixtures = {}
+
+
+def building_service(scratch):
+    """BuildingDesignService on a scratch database"""
+    key = ('service', scratch)
+    if key not in _fixtures:
+        from app import BuildingDesignService
+        _fixtures[key] = BuildingDesignService(database_path=os.path.join(scratch, 'service.db'))
+    return _fixtures[key]
+
+
+def api_client(scratch, cached=True):
+    """Flask test client on a scratch database, with or without the response cache"""
+    key = ('client', scratch, cached)
+    if key not in _fixtures:
+        from app import create_app
+        config = {'DATABASE_PATH': os.path.join(scratch, 'api.db')}
+        if not cached:
+            config['RESPONSE_CACHE_SIZE'] = 0
+        _fixtures[key] = create_app(config=config).test_client()
+    return _fixtures[key]
+
+
+def random_sites(count, seed=0):
+    """Uniformly random (lat, lng) pairs"""
+    rng = random.Random(seed)
+    return [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(count)]
+
+
+def expect_ok(response):
+    assert response.status_code == 200, response.get_data()[:200]
+
+
+# Service paths
+
+@benchmark('climate.analyze', number=2000)
+def climate_analyze(scratch):
+    service = building_service(scratch)
+    sites = itertools.cycle(random_sites(5000))
+    return lambda: service.analyze_climate(*next(sites))
+
+
+@benchmark('climate.analyze_batch', items=10000, number=20)
+def climate_analyze_batch(scratch):
+    service = building_service(scratch)
+    lats, lngs = map(np.array, zip(*random_sites(10000)))
+    return lambda: service.analyze_climate_batch(lats, lngs)
+
+
+@benchmark('design.optimize', number=2000)
+def design_optimize(scratch):
+    service = building_service(scratch)
+    sites = itertools.cycle(random_sites(5000))
+    return lambda: service.optimize_building_design_envelope(*next(sites))
+
+
+@benchmark('design.optimize_batch', items=10000, number=5, warmup=2)
+def design_optimize_batch(scratch):
+    service = building_service(scratch)
+    lats, lngs = map(list, zip(*random_sites(10000)))
+    return lambda: service.optimize_building_design_batch(lats, lngs, 'office')
+
+
+# API endpoints, through the full Flask stack
+
+@benchmark('api.climate_data.cached', number=1000)
+def api_climate_data_cached(scratch):
+    client = api_client(scratch)
+    return lambda: expect_ok(client.get('/api/climate-data?lat=40.7128&lng=-74.0060'))
+
+
+@benchmark('api.climate_data.uncached', number=1000)
+def api_climate_data_uncached(scratch):
+    client = api_client(scratch, cached=False)
+    sites = itertools.cycle(random_sites(5000))
+
+    def call():
+        lat, lng = next(sites)
+        expect_ok(client.get(f'/api/climate-data?lat={lat}&lng={lng}'))
+    return call
+
+
+@benchmark('api.analyze_site.uncached', number=500)
+def api_analyze_site_uncached(scratch):
+    client = api_client(scratch, cached=False)
+    # Temperate band, where every building type has a complete design template
+    rng = random.Random(1)
+    sites = itertools.cycle([(rng.uniform(35, 45), rng.uniform(-180, 180)) for _ in range(5000)])
+
+    def call():
+        lat, lng = next(sites)
+        expect_ok(client.get(f'/api/analyze-site?lat={lat}&lng={lng}&building_type=office'))
+    return call
+
+
+@benchmark('api.analyze_sites', items=1000, number=10, warmup=2)
+def api_analyze_sites(scratch):
+    client = api_client(scratch)
+    lats, lngs = map(list, zip(*random_sites(1000)))
+    body = json.dumps({'lats': lats, 'lngs': lngs, 'building_type': 'office'})
+    return lambda: expect_ok(client.post('/api/analyze-sites', data=body, content_type='application/json'))
+
+
+@benchmark('api.analyze_sites_stream', items=5000, number=3, warmup=1)
+def api_analyze_sites_stream(scratch):
+    client = api_client(scratch)
+    body = ''.join(
+        json.dumps({'lat': lat, 'lng': lng, 'building_type': 'residential'}) + '\n'
+        for lat, lng in random_sites(5000)
+    )
+
+    def call():
+        response = client.post('/api/analyze-sites/stream', data=body, content_type='application/x-ndjson')
+        expect_ok(response)
+        response.get_data()  # drain the stream
+    return call
+
+
+# Stored designs
+
+@benchmark('store.nearby', number=1000)
+def store_nearby(scratch):
+    from design_store import nearest_rows
+
+    path = os.path.join(scratch, 'nearby.db')
+    populate(path, 100000, clustered=False)
+    conn = sqlite3.connect(path)
+    coordinates = site_generator(False, seed=2)
+    return lambda: nearest_rows(conn, 'building_designs', *coordinates(), k=10)
+
+
+# Weather files
+
+def synthetic_epw(scratch):
+    path = os.path.join(scratch, 'synthetic.epw')
+    if not os.path.exists(path):
+        write_synthetic_epw(path)
+    return path
+
+
+@benchmark('epw.parse', number=10, warmup=2)
+def epw_parse(scratch):
+    from epw_reader import parse_epw
+
+    path = synthetic_epw(scratch)
+    return lambda: parse_epw(path)
+
+
+@benchmark('epw.load_cached', number=500)
+def epw_load_cached(scratch):
+    from epw_reader import read_epw
+
+    path = synthetic_epw(scratch)
+    read_epw(path)
+    return lambda: read_epw(path)
+
+
+@benchmark('epw.catalog_nearest', number=2000)
+def epw_catalog_nearest(scratch):
+    from epw_catalog import EPWCatalog
+
+    # Header-only station files are enough for the index
+    directory = os.path.join(scratch, 'stations')
+    os.makedirs(directory, exist_ok=True)
+    for index, (lat, lng) in enumerate(random_sites(5000, seed=3)):
+        with open(os.path.join(directory, f'station_{index}.epw'), 'w') as f:
+            f.write(f'LOCATION,Station {index},,XX,TMY,{index},{lat:.3f},{lng:.3f},0.0,0.0\n')
+    catalog = EPWCatalog(directory)
+    sites = itertools.cycle(random_sites(1000, seed=4))
+    return lambda: catalog.k_nearest(*next(sites), k=4)
+
+
+@benchmark('epw.catalog_blend', number=50, warmup=5)
+def epw_catalog_blend(scratch):
+    from epw_catalog import EPWCatalog
+
+    directory = os.path.join(scratch, 'blend_stations')
+    os.makedirs(directory, exist_ok=True)
+    with open(synthetic_epw(scratch)) as f:
+        records = f.read().split('\n', 1)[1]
+    for index, (lat, lng) in enumerate([(40.0, -74.0), (41.0, -74.0), (40.0, -72.0), (39.0, -75.0)]):
+        with open(os.path.join(directory, f'station_{index}.epw'), 'w') as f:
+            f.write(f'LOCATION,Station {index},,US,TMY,{index},{lat},{lng},-5.0,0.0\n' + records)
+    catalog = EPWCatalog(directory)
+    return lambda: catalog.blend(40.3, -73.5, k=4)
+
+
+@benchmark('climate.station_stats', number=50, warmup=5)
+def climate_station_stats(scratch):
+    from climate_stats import StationClimate
+
+    path = synthetic_epw(scratch)
+    return lambda: StationClimate.from_epw(path).summary()
+
+
+def synthetic_stations(scratch):
+    """Directory of 20 copies of the synthetic EPW file at random station locations"""
+    directory = os.path.join(scratch, 'stats_stations')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+        with open(synthetic_epw(scratch)) as f:
+            records = f.read().split('\n', 1)[1]
+        for index, (lat, lng) in enumerate(random_sites(20, seed=7)):
+            with open(os.path.join(directory, f'station_{index}.epw'), 'w') as f:
+                f.write(f'LOCATION,Station {index},,XX,TMY,{index},{lat:.3f},{lng:.3f},0.0,0.0\n' + records)
+    return directory
+
+
+@benchmark('climate.stats_memoized', number=2000)
+def climate_stats_memoized(scratch):
+    from climate_stats import ClimateStatistics
+    from epw_catalog import EPWCatalog
+
+    statistics = ClimateStatistics(EPWCatalog(synthetic_stations(scratch)))
+    # A portfolio of sites queried over and over
+    sites = itertools.cycle(random_sites(200, seed=8))
+    return lambda: statistics.site_summary(*next(sites))
+
+
+@benchmark('climate.cache_database', number=1000)
+def climate_cache_database(scratch):
+    from climate_cache import ClimateCache
+    from climate_stats import ClimateStatistics
+    from epw_catalog import EPWCatalog
+
+    pool = building_service(scratch).db_pool
+    statistics = ClimateStatistics(EPWCatalog(synthetic_stations(scratch)))
+    sites = random_sites(200, seed=10)
+    # Populate the table, then time lookups with the in-process tier disabled
+    populate = ClimateCache(pool)
+    populate.get_many('epw_climate', statistics.version(), *zip(*sites), statistics.site_summaries)
+    populate.close()
+    cache = ClimateCache(pool, max_entries=0)
+    sites = itertools.cycle(sites)
+    return lambda: cache.get('epw_climate', statistics.version(), *next(sites), statistics.site_summary)
+
+
+@benchmark('wind.station_stats', number=50, warmup=5)
+def wind_station_stats(scratch):
+    from wind_engine import StationWind
+
+    path = synthetic_epw(scratch)
+    return lambda: StationWind.from_epw(path).summary()
+
+
+@benchmark('wind.site_roses', items=1000, number=50, warmup=5)
+def wind_site_roses(scratch):
+    from epw_catalog import EPWCatalog
+    from wind_engine import WindStatistics
+
+    statistics = WindStatistics(EPWCatalog(synthetic_stations(scratch)))
+    lats, lngs = np.array(random_sites(1000, seed=9)).T
+    return lambda: statistics.site_roses(lats, lngs)
+
+
+# Solar engine
+
+@benchmark('solar.clear_sky_site', number=50, warmup=5)
+def solar_clear_sky_site(scratch):
+    from solar_engine import clear_sky_summary
+
+    sites = itertools.cycle(random_sites(1000, seed=5))
+    return lambda: clear_sky_summary(*next(sites))
+
+
+@benchmark('solar.clear_sky_batch', items=1000, number=3, warmup=1)
+def solar_clear_sky_batch(scratch):
+    from solar_engine import clear_sky_summary
+
+    lats, lngs = np.array(random_sites(1000, seed=6)).T
+    return lambda: clear_sky_summary(lats, lngs)
+
+
+# Thermal comfort, see bench_comfort.py
+
+@benchmark('comfort.hourly_site', number=20, warmup=3)
+def comfort_hourly_site(scratch):
+    from bench_comfort import synthetic_weather
+    from comfort import hourly_comfort
+
+    temperature, humidity, wind = synthetic_weather(1, seed=7)
+    return lambda: hourly_comfort(temperature[0], humidity[0], wind[0])
+
+
+@benchmark('comfort.hourly_batch', items=20, number=3, warmup=1)
+def comfort_hourly_batch(scratch):
+    from bench_comfort import synthetic_weather
+    from comfort import hourly_comfort
+
+    temperature, humidity, wind = synthetic_weather(20, seed=8)
+    return lambda: hourly_comfort(temperature, humidity, wind)
+
+
+# 5R1C simulator, see bench_rc.py
+
+def rc_weather(scratch):
+    from rc_simulator import weather_from_epw
+
+    return weather_from_epw(synthetic_epw(scratch), cache_dir=scratch)
+
+
+@benchmark('rc.simulate_design', number=10, warmup=2)
+def rc_simulate_design(scratch):
+    from rc_simulator import DEFAULT_DESIGN, simulate_design
+
+    weather = rc_weather(scratch)
+    return lambda: simulate_design(DEFAULT_DESIGN, weather)
+
+
+@benchmark('rc.simulate_batch', items=1000, number=3, warmup=1)
+def rc_simulate_batch(scratch):
+    from rc_simulator import random_designs, simulate
+
+    weather = rc_weather(scratch)
+    designs = random_designs(1000, seed=11)
+    return lambda: simulate(designs, weather)
+
+
+# Simulation result cache, see bench_simulation_cache.py
+
+def building_model(index):
+    """A model dict shaped like BuildingPhysicsEngine.create_building_model output"""
+    surfaces = [{'Name': f'Wall{side}', 'Azimuth': 90.0 * side, 'Area': 60.0 + index % 7, 'U_Value': 0.35}
+                for side in range(4)]
+    return {
+        'Building': {'Name': 'OptimizedBuilding', 'North_Axis': float(index % 360), 'Terrain': 'Urban'},
+        'Zone': {'Name': 'ThermalZone1', 'Volume': 1800.0, 'Floor_Area': 600.0},
+        'BuildingSurface:Detailed': surfaces,
+        'Window': [dict(surface, Name=f'Window{side}', Area=surface['Area'] * 0.3) for side, surface in enumerate(surfaces)],
+    }
+
+
+@benchmark('simulation.model_key', number=2000)
+def simulation_model_key(scratch):
+    from simulation_cache import model_key
+
+    path = synthetic_epw(scratch)
+    models = itertools.cycle([building_model(index) for index in range(100)])
+    return lambda: model_key(next(models), path, 'bench')
+
+
+@benchmark('simulation.cache_hit', number=2000)
+def simulation_cache_hit(scratch):
+    from simulation_cache import ResultCache, model_key
+
+    path = synthetic_epw(scratch)
+    cache = ResultCache(os.path.join(scratch, 'simulation_cache'))
+    keys = [model_key(building_model(index), path, 'bench') for index in range(100)]
+    for key in keys:
+        cache.put(key, json.dumps({'annual_heating': 12000.0, 'annual_cooling': 8000.0}).encode())
+    keys = itertools.cycle(keys)
+    return lambda: cache.get(next(keys))
+
+
+# Model assembly, see bench_model_builder.py
+
+@benchmark('model.build', number=500)
+def model_build(scratch):
+    from model_builder import ModelBuilder
+
+    orientations = itertools.cycle(range(0, 360, 15))
+    return lambda: ModelBuilder().build({'orientation': next(orientations)}).to_dict()
+
+
+@benchmark('model.derive', number=2000)
+def model_derive(scratch):
+    from model_builder import ModelBuilder
+
+    builder = ModelBuilder()
+    parent = builder.build({})
+    ratios = itertools.cycle([0.1, 0.2, 0.3, 0.4, 0.5])
+    return lambda: builder.derive(parent, {'window_wall_ratio': next(ratios)}).to_dict()
+
+
+# Thermal mass, see bench_thermal_mass.py
+
+@benchmark('thermal_mass.population', items=1000, number=50, warmup=5)
+def thermal_mass_population(scratch):
+    from bench_thermal_mass import random_population, synthetic_temperature
+    from thermal_mass import areal_heat_capacity, diurnal_ranges, layer_matrix, mass_benefit
+
+    matrices = layer_matrix(random_population(1000, seed=12))
+    temperature = synthetic_temperature(seed=12)
+    return lambda: mass_benefit(areal_heat_capacity(*matrices), diurnal_ranges(temperature))
+
+
+# Daylight coefficients, see bench_daylight.py
+
+@benchmark('daylight.coefficients', number=20, warmup=3)
+def daylight_coefficients(scratch):
+    from daylight_coefficients import room_coefficients
+
+    orientations = itertools.cycle(range(0, 360, 15))
+    return lambda: room_coefficients({'orientation': next(orientations)})
+
+
+@benchmark('daylight.illuminance_cached', number=50, warmup=5)
+def daylight_illuminance_cached(scratch):
+    from daylight_coefficients import DaylightCoefficients
+
+    path = synthetic_epw(scratch)
+    daylight = DaylightCoefficients(os.path.join(scratch, 'daylight'), epw_cache_dir=scratch)
+    rooms = [{'orientation': orientation} for orientation in range(0, 360, 90)]
+    for room in rooms:
+        daylight.illuminance(room, path)
+    rooms = itertools.cycle(rooms)
+    return lambda: daylight.illuminance(next(rooms), path)
+
+
+@benchmark('daylight.metrics_streaming', items=1000, number=10, warmup=2)
+def daylight_metrics_streaming(scratch):
+    from bench_daylight_metrics import write_illuminance
+    from daylight_metrics import annual_metrics, occupancy_schedule
+
+    path = os.path.join(scratch, 'illuminance.npy')
+    write_illuminance(path, 1000, seed=13)
+    occupancy = occupancy_schedule()
+    return lambda: annual_metrics(np.load(path, mmap_mode='r'), occupancy)
+
+
+@benchmark('window.search_pruning', items=612, number=20, warmup=2)
+def window_search_pruning(scratch):
+    from window_search import generate_layouts, search_layouts
+
+    # The search's own overhead: dedup, proxies and the Pareto front, with a free evaluation
+    room = {'width': 6.0, 'depth': 8.0, 'height': 3.0, 'orientation': 180.0}
+    layouts = generate_layouts(room)
+    return lambda: search_layouts(layouts, len, room, workers=1)
+
+
+@benchmark('design.sample', items=100, number=50, warmup=5)
+def design_sample(scratch):
+    from design_sampler import DesignSpace
+
+    # Constraint filtering plus 100 Latin hypercube designs, no geometry
+    site = {'max_area': 700, 'max_height': 9}
+    return lambda: list(DesignSpace(site_params=site).sample('latin_hypercube', 100, seed=0))
+
+
+# Process start, see bench_startup.py
+
+@benchmark('startup.first_response', number=5, repeat=1, warmup=1, slow=True)
+def startup_first_response(scratch):
+    probe = PROBE.format(root=ROOT, database=os.path.join(scratch, 'startup.db'))
+    return lambda: subprocess.run([sys.executable, '-c', probe], cwd=scratch, capture_output=True, check=True)
+
+
+def measure(case, scratch, scale=1.0):
+    """Warm up and time one case, returns its result record"""
+    key = ('case', case.name, scratch)
+    if key not in _fixtures:
+        _fixtures[key] = case.factory(scratch)
+    operation = _fixtures[key]
+    for _ in range(case.warmup):
+        operation()
+
+    number = max(1, int(case.number * scale))
+    samples = []
+    throughputs = []
+    for _ in range(case.repeat):
+        timings = []
+        for _ in range(number):
+            start = time.perf_counter_ns()
+            operation()
+            timings.append(time.perf_counter_ns() - start)
+        throughputs.append(case.items * number / (sum(timings) / 1e9))
+        samples.extend(timings)
+
+    latencies_ms = np.array(samples) / 1e6
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+    return {
+        'items_per_call': case.items,
+        'calls': len(samples),
+        'throughput': max(throughputs),
+        'median_throughput': statistics.median(throughputs),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(latencies_ms.max())
+    }
+
+
+def environment():
+    """Machine description stored with results, baselines only compare on like hardware"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__
+    }
+
+
+def run_cases(scratch, pattern=None, slow=False, scale=1.0, report=None):
+    """Run every selected case, returns the results document"""
+    selected = [
+        case for case in CASES.values()
+        if (pattern is None or re.search(pattern, case.name)) and (slow or not case.slow or pattern)
+    ]
+    results = {}
+    for case in selected:
+        results[case.name] = measure(case, scratch, scale)
+        if report:
+            report(case.name, results[case.name])
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'scale': scale,
+        'cases': results
+    }
+
+
+def confirm_regressions(baseline, current, scratch, scale, retries, thresholds, report=None):
+    """Re-measure regressed cases up to `retries` times, keeping each case's best run
+
+    A genuine regression reproduces on every attempt, a slowdown caused by other load
+    on the machine usually does not.
+    """
+    for _ in range(retries):
+        rows, _ = compare(baseline, current, *thresholds)
+        regressed = [name for name, status, *_ in rows if status == 'REGRESSED']
+        if not regressed:
+            break
+        for name in regressed:
+            result = measure(CASES[name], scratch, scale)
+            if report:
+                report(f'{name} (retry)', result)
+            passes = not compare(baseline, {'cases': {name: result}}, *thresholds)[1]
+            if passes or median_throughput(result) > median_throughput(current['cases'][name]):
+                current['cases'][name] = result
+    return current
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def median_throughput(result):
+    """Throughput of the median repeat, the figure gated on; the fastest for older results"""
+    return result.get('median_throughput', result['throughput'])
+
+
+def compare(baseline, current, throughput_threshold=THROUGHPUT_THRESHOLD, p99_threshold=P99_THRESHOLD,
+            p99_floor_ms=0.05):
+    """Compare two results documents, returns (rows, regressions)
+
+    A case regresses when its median throughput drops by more than throughput_threshold
+    or its p99 grows by more than p99_threshold. p99 changes under p99_floor_ms are
+    ignored, so microsecond-scale cases do not fail on timer noise. Raises ValueError for
+    results run at different scales.
+    """
+    scales = baseline.get('scale', 1.0), current.get('scale', 1.0)
+    if scales[0] != scales[1]:
+        raise ValueError(f'Baseline was run at scale {scales[0]}, current results at {scales[1]}')
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline['cases']) | set(current['cases'])):
+        base = baseline['cases'].get(name)
+        now = current['cases'].get(name)
+        if base is None or now is None:
+            rows.append((name, 'new' if base is None else 'missing', None, None, None))
+            continue
+
+        throughput_change = median_throughput(now) / median_throughput(base) - 1
+        p99_change = now['p99_ms'] / base['p99_ms'] - 1
+        status = 'ok'
+        if throughput_change < -throughput_threshold:
+            status = 'REGRESSED'
+            regressions.append(f'{name}: median throughput {throughput_change:+.1%}')
+        if p99_change > p99_threshold and now['p99_ms'] - base['p99_ms'] > p99_floor_ms:
+            status = 'REGRESSED'
+            regressions.append(f'{name}: p99 {p99_change:+.1%}')
+        rows.append((name, status, throughput_change, p99_change, now))
+    return rows, regressions
+
+
+def print_case(name, result):
+    print(f"{name:28} {result['throughput']:14,.1f} items/s   p50 {result['p50_ms']:9.3f} ms   "
+          f"p90 {result['p90_ms']:9.3f} ms   p99 {result['p99_ms']:9.3f} ms")
+
+
+def print_comparison(baseline, current, rows, regressions):
+    if baseline['environment'] != current['environment']:
+        print('warning: baseline was recorded on a different environment:')
+        for key, value in baseline['environment'].items():
+            if current['environment'].get(key) != value:
+                print(f"  {key}: {value} -> {current['environment'].get(key)}")
+
+    for name, status, throughput_change, p99_change, _ in rows:
+        if throughput_change is None:
+            print(f'{name:28} {status}')
+        else:
+            print(f'{name:28} median throughput {throughput_change:+7.1%}   p99 {p99_change:+7.1%}   {status}')
+    if regressions:
+        print(f'{len(regressions)} regression(s):')
+        for regression in regressions:
+            print(f'  {regression}')
+
+
+def add_threshold_arguments(parser):
+    parser.add_argument('--throughput-threshold', type=float, default=THROUGHPUT_THRESHOLD,
+                        help=f'Allowed fractional median throughput drop (default {THROUGHPUT_THRESHOLD})')
+    parser.add_argument('--p99-threshold', type=float, default=P99_THRESHOLD,
+                        help=f'Allowed fractional p99 latency growth (default {P99_THRESHOLD})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite and gate on regressions')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run benchmark cases')
+    run_parser.add_argument('-k', '--filter', help='Only run cases whose name matches this regex')
+    run_parser.add_argument('--slow', action='store_true', help='Include slow cases (process start)')
+    run_parser.add_argument('--scale', type=float, default=1.0, help='Multiply the timed calls per repeat')
+    run_parser.add_argument('--output', help='Write results JSON here')
+    run_parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH,
+                            help=f'Write results as the baseline (default {os.path.relpath(BASELINE_PATH, ROOT)})')
+    run_parser.add_argument('--compare', metavar='BASELINE', help='Compare against a baseline, exit 1 on regression')
+    run_parser.add_argument('--retries', type=int, default=2,
+                            help='Re-measure regressed cases this many times before failing (default 2)')
+    add_threshold_arguments(run_parser)
+
+    compare_parser = commands.add_parser('compare', help='Compare two results files, exit 1 on regression')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    add_threshold_arguments(compare_parser)
+
+    args = parser.parse_args()
+
+    thresholds = (args.throughput_threshold, args.p99_threshold)
+    if args.command == 'run':
+        baseline = load_results(args.compare) if args.compare else None
+        if baseline is not None and baseline.get('scale', 1.0) != args.scale:
+            print(f"error: baseline was run at scale {baseline.get('scale', 1.0)}, not {args.scale}")
+            return 2
+        with tempfile.TemporaryDirectory() as scratch:
+            current = run_cases(scratch, args.filter, args.slow, args.scale, report=print_case)
+            if baseline is not None:
+                confirm_regressions(baseline, current, scratch, args.scale, args.retries, thresholds, print_case)
+        if args.output:
+            save_results(current, args.output)
+        if args.save_baseline:
+            save_results(current, args.save_baseline)
+        if not args.compare:
+            return 0
+    else:
+        baseline, current = load_results(args.baseline), load_results(args.current)
+
+    try:
+        rows, regressions = compare(baseline, current, *thresholds)
+    except ValueError as error:
+        print(f'error: {error}')
+        return 2
+    print_comparison(baseline, current, rows, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# Persistent read-through cache for derived climate statistics
+# File: climate_cache.py
+#
+# EPW station summaries, wind roses and clear-sky irradiance are expensive the first
+# time a location is asked for and never change until the weather files or the method
+# do. ClimateCache keeps them in two tiers:
+#   1. an in-process LRU, a dict lookup per hit
+#   2. rows of the climate_data table, shared by every worker and surviving restarts
+# and computes a value only when neither tier has it. A computed value is served at once
+# and kept in memory; its row is queued to a ClimateWriter, the write-behind DesignWriter
+# thread, so no request waits on an SQLite write.
+#
+# Rows are keyed by (source, snapped lat, snapped lng): coordinates are snapped to a grid
+# of `precision` degrees and the value is computed for the grid point, so every request
+# in a cell shares one row. Each row records the version it was computed with; a row
+# whose version differs from the caller's is stale and is recomputed and overwritten.
+# The full result is stored as JSON in `payload`, and the headline numbers also fill the
+# table's hdd, cdd, solar_irradiance, wind_speed and climate_zone columns so the rows can
+# be queried (and found through the climate_data R*Tree) directly.
+
+import json
+import math
+import threading
+from collections import OrderedDict
+
+from design_store import DesignWriter
+
+# Columns added to the original climate_data table, with their SQL types
+CACHE_COLUMNS = (('source', 'TEXT'), ('version', 'TEXT'), ('payload', 'TEXT'))
+
+# Summary fields copied into the table's own columns, first match wins
+SUMMARY_COLUMNS = {
+    'climate_zone': ('climate_zone',),
+    'hdd': ('heating_degree_days', 'hdd'),
+    'cdd': ('cooling_degree_days', 'cdd'),
+    'solar_irradiance': ('annual_irradiation', 'annual_ghi'),
+    'wind_speed': ('mean_speed', 'avg_wind_speed'),
+}
+
+UPSERT_SQL = f'''
+    INSERT INTO climate_data (lat, lng, source, version, payload, {', '.join(SUMMARY_COLUMNS)})
+    VALUES (?, ?, ?, ?, ?{', ?' * len(SUMMARY_COLUMNS)})
+    ON CONFLICT (source, lat, lng) DO UPDATE SET
+        version = excluded.version,
+        payload = excluded.payload,
+        {', '.join(f'{column} = excluded.{column}' for column in SUMMARY_COLUMNS)},
+        created_at = CURRENT_TIMESTAMP
+'''
+
+# Stored for locations where the source has nothing, e.g. no weather station in range
+_NOTHING = object()
+
+
+def migrate_climate_data(conn):
+    """Add the cache columns and the (source, lat, lng) key to an existing climate_data table"""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(climate_data)')}
+    for name, sql_type in CACHE_COLUMNS:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE climate_data ADD COLUMN {name} {sql_type}')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS climate_data_cell ON climate_data (source, lat, lng)')
+
+
+def summary_columns(payload):
+    """Values for the SUMMARY_COLUMNS of a row, None where the payload has no such field"""
+    values = []
+    for fields in SUMMARY_COLUMNS.values():
+        value = None
+        if isinstance(payload, dict):
+            value = next((payload[field] for field in fields if payload.get(field) is not None), None)
+        values.append(value)
+    return values
+
+
+class ClimateWriter(DesignWriter):
+    """Batched background UPSERTs of climate_data rows"""
+    INSERT_SQL = UPSERT_SQL
+    ROW_KIND = 'climate_data rows'
+    THREAD_NAME = 'climate-writer'
+
+    @staticmethod
+    def row_params(lat, lng, source, version, value):
+        return (lat, lng, source, version, json.dumps(value)) + tuple(summary_columns(value))
+
+
+class ClimateCache:
+    def __init__(self, pool, precision=0.01, max_entries=8192, writer=None):
+        self.pool = pool
+        self.writer = writer or ClimateWriter(pool)
+        self.precision = precision
+        self.max_entries = max_entries
+        self.decimals = max(0, -math.floor(math.log10(precision)))
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'database_hits': 0, 'stale': 0, 'misses': 0}
+
+    def quantize(self, lat, lng):
+        """Snap coordinates to the cache grid, returns (cell key, snapped lat, snapped lng)"""
+        i = round(lat / self.precision)
+        j = round(lng / self.precision)
+        return (i, j), round(i * self.precision, self.decimals), round(j * self.precision, self.decimals)
+
+    def remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def recall(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+            return value
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def get(self, source, version, lat, lng, compute):
+        """Cached value of compute(snapped lat, snapped lng) for a source and method version
+
+        compute may return None (nothing at this location), which is cached as well.
+        Returned values are shared between callers and must not be modified.
+        """
+        cell, _, _ = self.quantize(lat, lng)
+        value = self.recall((source, version) + cell)
+        if value is not None:
+            return None if value is _NOTHING else value
+        return self.get_many(source, version, [lat], [lng], lambda lats, lngs: [compute(lats[0], lngs[0])])[0]
+
+    def get_many(self, source, version, lats, lngs, compute_many):
+        """get for coordinate columns, compute_many(lats, lngs) returning a list for the missing cells
+
+        Sites in the same cell share one value; cells missing from memory are looked up
+        in a single query and the ones missing there too computed in a single call.
+        """
+        cells = {}
+        rows = []
+        for lat, lng in zip(lats, lngs):
+            cell, snapped_lat, snapped_lng = self.quantize(float(lat), float(lng))
+            rows.append(cell)
+            if cell not in cells:
+                cells[cell] = (snapped_lat, snapped_lng)
+
+        values = {}
+        for cell in cells:
+            value = self.recall((source, version) + cell)
+            if value is not None:
+                values[cell] = value
+
+        missing = [cell for cell in cells if cell not in values]
+        if missing:
+            values.update(self.load(source, version, {cell: cells[cell] for cell in missing}))
+            missing = [cell for cell in missing if cell not in values]
+        if missing:
+            self.count('misses', len(missing))
+            computed = compute_many([cells[cell][0] for cell in missing], [cells[cell][1] for cell in missing])
+            self.store(source, version, [(cells[cell], value) for cell, value in zip(missing, computed)])
+            for cell, value in zip(missing, computed):
+                values[cell] = _NOTHING if value is None else value
+                self.remember((source, version) + cell, values[cell])
+
+        return [None if values[cell] is _NOTHING else values[cell] for cell in rows]
+
+    def load(self, source, version, points):
+        """Current-version rows for {cell: (lat, lng)}, as {cell: value}"""
+        found = {}
+        by_point = {point: cell for cell, point in points.items()}
+        items = list(by_point)
+        with self.pool.connection() as conn:
+            # 400 points, 800 parameters, stays under SQLite's older 999 variable limit
+            for start in range(0, len(items), 400):
+                chunk = items[start:start + 400]
+                placeholders = ', '.join('(?, ?)' for _ in chunk)
+                for lat, lng, row_version, payload in conn.execute(
+                    f'SELECT lat, lng, version, payload FROM climate_data '
+                    f'WHERE source = ? AND (lat, lng) IN (VALUES {placeholders})',
+                    [source] + [value for point in chunk for value in point]
+                ):
+                    if row_version != version:
+                        self.count('stale')
+                        continue
+                    cell = by_point[(lat, lng)]
+                    value = json.loads(payload)
+                    found[cell] = _NOTHING if value is None else value
+                    self.remember((source, version) + cell, found[cell])
+        self.count('database_hits', len(found))
+        return found
+
+    def store(self, source, version, points):
+        """Queue (lat, lng), value pairs for climate_data, replacing stale rows; never blocks
+
+        A full queue drops the rows (counted by the writer), the values are simply
+        computed again after a restart.
+        """
+        self.writer.submit([(lat, lng, source, version, value) for (lat, lng), value in points])
+
+    def flush(self, timeout=None):
+        """Wait until every queued row is in climate_data, returns False on timeout"""
+        return self.writer.flush(timeout)
+
+    def close(self, timeout=10.0):
+        """Write the queued rows and stop the writer thread, used at shutdown"""
+        self.writer.close(timeout)
+
+    def invalidate(self, source=None):
+        """Forget cached values of one source (all sources by default) in both tiers"""
+        # Queued rows would otherwise land after the delete
+        self.flush()
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == source]:
+                    del self._entries[key]
+        with self.pool.connection() as conn:
+            with conn:
+                if source is None:
+                    conn.execute('DELETE FROM climate_data WHERE source IS NOT NULL')
+                else:
+                    conn.execute('DELETE FROM climate_data WHERE source = ?', (source,))
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['memory_entries'] = len(self._entries)
+        metrics['writer'] = self.writer.metrics()
+        return metrics
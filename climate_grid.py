@@ -0,0 +1,138 @@
+# Precomputed global climate grid
+# File: climate_grid.py
+#
+# Build once, then every worker memory-maps the same file:
+#   python climate_grid.py --resolution 0.1 --output climate_grid.npy
+#   CLIMATE_GRID_PATH=climate_grid.npy gunicorn app:app
+#
+# The grid is a plain .npy array of shape (n_lat, n_lng, len(GRID_FIELDS)) covering
+# -90..90 and -180..180 inclusive, so the resolution is implied by the shape.
+# Opening it with mmap_mode='r' means lookups only fault in the pages they touch and
+# all processes on the host share one copy through the page cache.
+
+import argparse
+import math
+
+import numpy as np
+
+GRID_FIELDS = ('avg_temperature', 'solar_potential', 'heating_degree_days', 'cooling_degree_days')
+GRID_DTYPE = np.float32
+
+
+def grid_shape(resolution):
+    """Grid dimensions for a resolution in degrees"""
+    n_lat = 180 / resolution
+    n_lng = 360 / resolution
+    if abs(n_lat - round(n_lat)) > 1e-6 or abs(n_lng - round(n_lng)) > 1e-6:
+        raise ValueError(f"Resolution {resolution} must evenly divide 180 degrees")
+    return int(round(n_lat)) + 1, int(round(n_lng)) + 1, len(GRID_FIELDS)
+
+
+def build_climate_grid(climate_columns, path, resolution=0.1, rows_per_chunk=64):
+    """Fill a lat/lng grid with climate attributes and write it as a .npy file
+
+    climate_columns(lats, lngs) must return a dict with an array for every name in
+    GRID_FIELDS, e.g. BuildingDesignService.raw_climate_columns.
+    """
+    shape = grid_shape(resolution)
+    n_lat, n_lng, _ = shape
+    lats = np.linspace(-90, 90, n_lat)
+    lngs = np.linspace(-180, 180, n_lng)
+
+    grid = np.lib.format.open_memmap(path, mode='w+', dtype=GRID_DTYPE, shape=shape)
+
+    # Fill in row chunks so the build never holds the full float64 grid in memory
+    for start in range(0, n_lat, rows_per_chunk):
+        stop = min(start + rows_per_chunk, n_lat)
+        lat_block, lng_block = np.meshgrid(lats[start:stop], lngs, indexing='ij')
+        columns = climate_columns(lat_block.ravel(), lng_block.ravel())
+        for k, field in enumerate(GRID_FIELDS):
+            grid[start:stop, :, k] = np.asarray(columns[field]).reshape(stop - start, n_lng)
+
+    grid.flush()
+    del grid
+    return path
+
+
+class ClimateGrid:
+    def __init__(self, path):
+        self.path = path
+        self.values = np.load(path, mmap_mode='r')
+
+        n_lat, n_lng, n_fields = self.values.shape
+        if n_fields != len(GRID_FIELDS) or (n_lng - 1) != 2 * (n_lat - 1):
+            raise ValueError(f"{path} is not a climate grid (shape {self.values.shape})")
+
+        self.resolution = 180.0 / (n_lat - 1)
+
+    def lookup(self, lats, lngs, interpolate=False):
+        """Climate attributes for coordinate arrays, NaN where a coordinate is out of range"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        n_lat, n_lng, _ = self.values.shape
+
+        in_range = (np.abs(lats) <= 90) & (np.abs(lngs) <= 180)
+        # Fractional cell coordinates, out-of-range rows are pinned to cell 0 and masked later
+        y = np.where(in_range, (lats + 90) / self.resolution, 0.0)
+        x = np.where(in_range, (lngs + 180) / self.resolution, 0.0)
+
+        if interpolate:
+            i0 = np.minimum(np.floor(y).astype(np.intp), n_lat - 2)
+            j0 = np.minimum(np.floor(x).astype(np.intp), n_lng - 2)
+            fy = (y - i0)[:, None]
+            fx = (x - j0)[:, None]
+            values = (
+                self.values[i0, j0] * (1 - fy) * (1 - fx)
+                + self.values[i0 + 1, j0] * fy * (1 - fx)
+                + self.values[i0, j0 + 1] * (1 - fy) * fx
+                + self.values[i0 + 1, j0 + 1] * fy * fx
+            )
+        else:
+            values = self.values[np.rint(y).astype(np.intp), np.rint(x).astype(np.intp)].astype(float)
+
+        values[~in_range] = np.nan
+        return {field: values[:, k] for k, field in enumerate(GRID_FIELDS)}
+
+    def lookup_one(self, lat, lng, interpolate=False):
+        """Scalar lookup, same arithmetic as lookup() without the array overhead"""
+        if not (abs(lat) <= 90 and abs(lng) <= 180):
+            raise ValueError(f"Coordinates out of range: {lat}, {lng}")
+
+        n_lat, n_lng, _ = self.values.shape
+        y = (lat + 90) / self.resolution
+        x = (lng + 180) / self.resolution
+
+        if not interpolate:
+            # round() and np.rint both round half to even
+            return tuple(float(v) for v in self.values[round(y), round(x)].tolist())
+
+        i0 = min(math.floor(y), n_lat - 2)
+        j0 = min(math.floor(x), n_lng - 2)
+        fy = y - i0
+        fx = x - j0
+        corners = self.values[i0:i0 + 2, j0:j0 + 2].tolist()
+        return tuple(
+            corners[0][0][k] * (1 - fy) * (1 - fx)
+            + corners[1][0][k] * fy * (1 - fx)
+            + corners[0][1][k] * (1 - fy) * fx
+            + corners[1][1][k] * fy * fx
+            for k in range(len(GRID_FIELDS))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the precomputed global climate grid')
+    parser.add_argument('--resolution', type=float, default=0.1, help='Cell size in degrees')
+    parser.add_argument('--output', default='climate_grid.npy', help='Output .npy path')
+    args = parser.parse_args()
+
+    from app import BuildingDesignService
+
+    # A grid-less service evaluates the analytic climate model directly
+    service = BuildingDesignService(climate_grid_path=None)
+    build_climate_grid(service.raw_climate_columns, args.output, args.resolution)
+    print(f"Wrote {grid_shape(args.resolution)} climate grid to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
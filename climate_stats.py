@@ -0,0 +1,339 @@
+# Hourly degree-day and climate statistics from EPW weather files
+# File: climate_stats.py
+#
+# Turns a station's 8760 hourly records into the numbers the design service needs:
+# heating and cooling degree days at any base temperature, ASHRAE-style design
+# temperatures, diurnal ranges and monthly means.
+#
+# Each station's dry-bulb temperatures are sorted once and kept with their running sums,
+# so degree days for a base temperature are a binary search plus one subtraction:
+#   HDD(base) = (k * base - sum of the k temperatures below base) / 24
+# and any number of bases (or a sweep over them) costs O(log n) each. Stations are
+# kept in an LRU keyed on the file's size and mtime, and finished summaries are memoized
+# per (station, base temperatures), as is the nearest station of each queried site,
+# so repeated portfolio queries are a couple of dict lookups and one stat().
+#
+# Missing values (the EPW sentinels, or NaN for blank fields) never enter the statistics:
+# gaps in dry-bulb temperature are interpolated linearly from the neighbouring valid
+# hours, so degree days and daily ranges still cover the whole year, and monthly means
+# of the other fields are taken over their valid hours only.
+#   python climate_stats.py weather.epw --heating-base 18 --cooling-base 24
+
+import argparse
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from epw_reader import missing_mask, read_epw
+
+# Bump when summaries change, so rows cached by climate_cache.py are recomputed
+METHOD_VERSION = 2
+
+# Same bases as the latitude estimate in BuildingDesignService.analyze_climate
+HEATING_BASE = 18.0
+COOLING_BASE = 24.0
+
+# Annual percentiles of hourly dry-bulb temperature (ASHRAE Fundamentals ch. 14):
+# heating design at 99.6 % and 99 % means the temperature exceeded that share of hours
+HEATING_DESIGN_PERCENTILES = {'heating_99.6': 0.4, 'heating_99': 1.0}
+COOLING_DESIGN_PERCENTILES = {'cooling_0.4': 99.6, 'cooling_1': 99.0, 'cooling_2': 98.0}
+
+MONTHLY_FIELDS = ('dry_bulb_temperature', 'relative_humidity', 'wind_speed')
+
+
+def rounded(value, digits):
+    """value rounded as a Python float, None where it is NaN or infinite (JSON has no NaN)"""
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
+
+
+class SortedProfile:
+    """Sorted values with running sums, answering degree-day sums for any base"""
+
+    def __init__(self, values, samples_per_day):
+        self.values = np.sort(np.asarray(values, dtype=np.float64))
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.values)))
+        self.samples_per_day = samples_per_day
+
+    def below(self, base):
+        """Sum of (base - v) over values below base, in degree days"""
+        base = np.asarray(base, dtype=np.float64)
+        k = np.searchsorted(self.values, base, side='left')
+        return (k * base - self.cumulative[k]) / self.samples_per_day
+
+    def above(self, base):
+        """Sum of (v - base) over values above base, in degree days"""
+        base = np.asarray(base, dtype=np.float64)
+        k = np.searchsorted(self.values, base, side='right')
+        return ((self.cumulative[-1] - self.cumulative[k]) - (len(self.values) - k) * base) / self.samples_per_day
+
+    def percentile(self, q):
+        """Linearly interpolated percentile(s), same as np.percentile's default"""
+        return np.interp(np.asarray(q, dtype=np.float64) / 100 * (len(self.values) - 1),
+                         np.arange(len(self.values)), self.values)
+
+
+class StationClimate:
+    """Base-independent statistics of one station's hourly record"""
+
+    def __init__(self, columns, location=None):
+        self.location = location or {}
+        temperature = np.asarray(columns['dry_bulb_temperature'], dtype=np.float64)
+        months = np.asarray(columns['month'], dtype=np.intp) - 1
+        days = len(temperature) // 24
+        if days == 0:
+            raise ValueError('Climate statistics need at least one full day of hourly records')
+
+        valid = ~missing_mask('dry_bulb_temperature', temperature)
+        if not valid.any():
+            raise ValueError('The weather record has no valid dry-bulb temperatures')
+        self.filled_hours = int(len(temperature) - valid.sum())
+        if self.filled_hours:
+            hour_index = np.arange(len(temperature))
+            temperature = np.interp(hour_index, hour_index[valid], temperature[valid])
+
+        self.hours = len(temperature)
+        self.mean_temperature = float(temperature.mean())
+        self.hourly = SortedProfile(temperature, 24)
+
+        # Whole days only, an EPW file always has them
+        daily = temperature[:days * 24].reshape(days, 24)
+        self.daily = SortedProfile(daily.mean(axis=1), 1)
+        diurnal_range = daily.max(axis=1) - daily.min(axis=1)
+        day_months = months[:days * 24:24]
+
+        days_per_month = np.bincount(day_months, minlength=12)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.monthly_means = {
+                name: self.monthly_mean(months, temperature if name == 'dry_bulb_temperature' else columns[name], name)
+                for name in MONTHLY_FIELDS if name in columns
+            }
+            # Mean of the valid hours times 24, so gaps do not lower the daily total
+            self.monthly_means['daily_global_horizontal_radiation'] = self.monthly_mean(
+                months, columns['global_horizontal_radiation'], 'global_horizontal_radiation'
+            ) * 24 / 1000  # kWh/m2 per day
+            self.monthly_means['diurnal_range'] = np.bincount(
+                day_months, weights=diurnal_range, minlength=12
+            ) / days_per_month
+        self.mean_diurnal_range = float(diurnal_range.mean())
+        self.max_diurnal_range = float(diurnal_range.max())
+
+    @staticmethod
+    def monthly_mean(months, column, name):
+        """Mean of a column per month over its valid hours, NaN for months without any"""
+        column = np.asarray(column, dtype=np.float64)
+        valid = ~missing_mask(name, column)
+        return np.bincount(months[valid], weights=column[valid], minlength=12) / np.bincount(
+            months[valid], minlength=12
+        )
+
+    @classmethod
+    def from_epw(cls, path, cache_dir=None):
+        epw = read_epw(path, cache_dir=cache_dir)
+        return cls(epw.columns, epw.location)
+
+    def heating_degree_days(self, base=HEATING_BASE, method='hourly'):
+        """Annual heating degree days; base may be an array for a sweep
+
+        'hourly' integrates every hour below the base, 'daily' uses daily mean temperatures.
+        """
+        return self.profile(method).below(base)
+
+    def cooling_degree_days(self, base=COOLING_BASE, method='hourly'):
+        """Annual cooling degree days; base may be an array for a sweep"""
+        return self.profile(method).above(base)
+
+    def profile(self, method):
+        if method == 'hourly':
+            return self.hourly
+        if method == 'daily':
+            return self.daily
+        raise ValueError(f"Degree-day method must be 'hourly' or 'daily', got {method!r}")
+
+    def design_temperatures(self):
+        """Heating and cooling design dry-bulb temperatures by annual percentile"""
+        percentiles = {**HEATING_DESIGN_PERCENTILES, **COOLING_DESIGN_PERCENTILES}
+        values = self.hourly.percentile(list(percentiles.values()))
+        return {name: round(float(value), 1) for name, value in zip(percentiles, values)}
+
+    def summary(self, heating_base=HEATING_BASE, cooling_base=COOLING_BASE, method='hourly'):
+        """Everything analyze_climate can use, as plain Python values"""
+        return {
+            'avg_temperature': self.mean_temperature,
+            'heating_degree_days': float(self.heating_degree_days(heating_base, method)),
+            'cooling_degree_days': float(self.cooling_degree_days(cooling_base, method)),
+            'heating_base': heating_base,
+            'cooling_base': cooling_base,
+            'design_temperatures': self.design_temperatures(),
+            'mean_diurnal_range': round(self.mean_diurnal_range, 1),
+            'max_diurnal_range': round(self.max_diurnal_range, 1),
+            'monthly_means': {
+                # None for months without valid hours
+                name: [rounded(value, 2) for value in values] for name, values in self.monthly_means.items()
+            },
+        }
+
+
+class StationCache:
+    """LRU caches of per-station results for EPW files, optionally located through an EPWCatalog"""
+
+    method_version = METHOD_VERSION
+
+    def __init__(self, catalog=None, max_stations=256, max_summaries=4096, max_distance_km=None, cache_dir=None):
+        self.catalog = catalog
+        self.max_stations = max_stations
+        self.max_summaries = max_summaries
+        # Sites farther than this from every station fall back to the caller's estimate
+        self.max_distance_km = max_distance_km
+        self.cache_dir = cache_dir if cache_dir is not None else getattr(catalog, 'cache_dir', None)
+
+        self._stations = OrderedDict()
+        self._summaries = OrderedDict()
+        # (lat, lng) -> nearest station path, valid until refresh()
+        self._sites = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stations_loaded': 0}
+
+    @staticmethod
+    def signature(path):
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def remember(self, entries, key, value, limit):
+        with self._lock:
+            if entries is self._stations:
+                self.stats['stations_loaded'] += 1
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+
+    def lookup(self, entries, key, counted=False):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            if counted:
+                self.stats['hits' if value is not None else 'misses'] += 1
+            return value
+
+    def site_path(self, lat, lng):
+        """Path of the nearest catalogued station's file, or None when none is close enough"""
+        if self.catalog is None:
+            raise ValueError(f'{type(self).__name__} needs an EPWCatalog to look up sites')
+        site = (lat, lng)
+        path = self.lookup(self._sites, site)
+        if path is None:
+            path = self.catalog.find_nearest_epw(lat, lng, self.max_distance_km) or ''
+            self.remember(self._sites, site, path, self.max_summaries)
+        return path or None
+
+    def site_paths(self, lats, lngs):
+        """site_path for coordinate columns: a 'found' mask and {path: rows served by it}"""
+        if self.catalog is None:
+            raise ValueError(f'{type(self).__name__} needs an EPWCatalog to look up sites')
+        paths = self.catalog.nearest_paths(lats, lngs, self.max_distance_km)
+        rows_by_path = {}
+        for row, path in enumerate(paths):
+            if path is not None:
+                rows_by_path.setdefault(path, []).append(row)
+        return np.array([path is not None for path in paths], dtype=bool), rows_by_path
+
+    def version(self):
+        """Identifies results for persistent caches: the method, the catalogued files and the search radius"""
+        fingerprint = self.catalog.fingerprint if self.catalog is not None else ''
+        return f'{self.method_version}:{fingerprint}:{self.max_distance_km}'
+
+    def refresh(self):
+        """Rescan the catalog's directory and forget which station serves which site"""
+        counts = self.catalog.refresh()
+        with self._lock:
+            self._sites.clear()
+        return counts
+
+
+class ClimateStatistics(StationCache):
+    """Memoized StationClimate summaries for EPW files"""
+
+    def station(self, path):
+        """StationClimate for an EPW file, reloaded when the file changes"""
+        signature = self.signature(path)
+        station = self.lookup(self._stations, signature)
+        if station is None:
+            station = StationClimate.from_epw(path, self.cache_dir)
+            self.remember(self._stations, signature, station, self.max_stations)
+        return station
+
+    def summary(self, path, heating_base=HEATING_BASE, cooling_base=COOLING_BASE, method='hourly'):
+        """StationClimate.summary for a file, memoized per file version and base temperatures
+
+        The returned dict is shared between callers and must not be modified.
+        """
+        key = self.signature(path) + (float(heating_base), float(cooling_base), method)
+        summary = self.lookup(self._summaries, key, counted=True)
+        if summary is not None:
+            return summary
+
+        summary = self.station(path).summary(heating_base, cooling_base, method)
+        self.remember(self._summaries, key, summary, self.max_summaries)
+        return summary
+
+    def site_summary(self, lat, lng, heating_base=HEATING_BASE, cooling_base=COOLING_BASE, method='hourly'):
+        """Summary of the nearest catalogued station, or None when none is close enough"""
+        path = self.site_path(lat, lng)
+        if path is None:
+            return None
+        return self.summary(path, heating_base, cooling_base, method)
+
+    def site_summaries(self, lats, lngs, heating_base=HEATING_BASE, cooling_base=COOLING_BASE, method='hourly'):
+        """site_summary for coordinate columns, one summary per distinct station"""
+        found, rows_by_path = self.site_paths(lats, lngs)
+        summaries = [None] * len(found)
+        for path, rows in rows_by_path.items():
+            summary = self.summary(path, heating_base, cooling_base, method)
+            for row in rows:
+                summaries[row] = summary
+        return summaries
+
+    def site_columns(self, lats, lngs, heating_base=HEATING_BASE, cooling_base=COOLING_BASE, method='hourly'):
+        """Vectorized site_summary for coordinate columns
+
+        Returns {'found', 'avg_temperature', 'heating_degree_days', 'cooling_degree_days'};
+        values are NaN where 'found' is False.
+        """
+        found, rows_by_path = self.site_paths(lats, lngs)
+        columns = {
+            name: np.full(len(found), np.nan)
+            for name in ('avg_temperature', 'heating_degree_days', 'cooling_degree_days')
+        }
+        for path, rows in rows_by_path.items():
+            summary = self.summary(path, heating_base, cooling_base, method)
+            for name, column in columns.items():
+                column[rows] = summary[name]
+
+        columns['found'] = found
+        return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Degree days and climate statistics of an EPW file')
+    parser.add_argument('path')
+    parser.add_argument('--heating-base', type=float, default=HEATING_BASE)
+    parser.add_argument('--cooling-base', type=float, default=COOLING_BASE)
+    parser.add_argument('--method', choices=('hourly', 'daily'), default='hourly')
+    args = parser.parse_args()
+
+    summary = StationClimate.from_epw(args.path).summary(args.heating_base, args.cooling_base, args.method)
+    print(f"mean {summary['avg_temperature']:.1f} C, "
+          f"HDD{args.heating_base:g} {summary['heating_degree_days']:.0f}, "
+          f"CDD{args.cooling_base:g} {summary['cooling_degree_days']:.0f}")
+    print('design temperatures: ' + ', '.join(f'{name} {value} C' for name, value in summary['design_temperatures'].items()))
+    print(f"diurnal range: mean {summary['mean_diurnal_range']} C, max {summary['max_diurnal_range']} C")
+    for name, values in summary['monthly_means'].items():
+        print(f'{name}: ' + ' '.join('-' if value is None else f'{value:.1f}' for value in values))
+
+
+if __name__ == '__main__':
+    main()
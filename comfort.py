@@ -0,0 +1,306 @@
+# Thermal comfort indices over hourly series
+# File: comfort.py
+#
+# Heat index, wind chill, humidex, UTCI and PMV/PPD as NumPy ufunc expressions, so a
+# whole year of hours (or a sites x hours grid) is evaluated in one call instead of one
+# Python call per value. Inputs broadcast against each other; temperatures are in C,
+# relative humidity in %, wind speed in m/s at 10 m (the EPW convention).
+#
+# Hourly values are classified into UTCI thermal stress categories (outdoor) and ISO 7730
+# PMV categories (indoor), and category_hours() counts the hours of each class per year.
+#   python comfort.py weather.epw
+
+import argparse
+
+import numpy as np
+
+# UTCI thermal stress categories from coldest to hottest, with the upper UTCI bound (C)
+# of each but the last
+UTCI_CATEGORIES = (
+    'extreme_cold_stress', 'very_strong_cold_stress', 'strong_cold_stress', 'moderate_cold_stress',
+    'slight_cold_stress', 'no_thermal_stress', 'moderate_heat_stress', 'strong_heat_stress',
+    'very_strong_heat_stress', 'extreme_heat_stress'
+)
+UTCI_THRESHOLDS = (-40, -27, -13, 0, 9, 26, 32, 38, 46)
+
+# ISO 7730 Annex A building categories by |PMV|, and hours outside all of them
+PMV_CATEGORIES = ('A', 'B', 'C', 'outside')
+PMV_THRESHOLDS = (0.2, 0.5, 0.7)
+
+# Wind speed range of the UTCI regression, m/s at 10 m
+UTCI_WIND_RANGE = (0.5, 17.0)
+
+# Points per block when evaluating the UTCI polynomial, bounds the monomial matrices
+UTCI_BLOCK = 32768
+
+# Coefficients of the UTCI polynomial approximation (Broede et al. 2012, the operational
+# UTCI_approx procedure): UTCI = Ta + sum c * Pa^p * dTmrt^d * va^v * Ta^t with
+# p + d + v + t <= 6, in the reference order
+#   for p in 0..6, for d in 0..6-p, for v in 0..6-p-d, for t in 0..6-p-d-v
+# where Pa is the vapour pressure in kPa and dTmrt = Tmrt - Ta.
+UTCI_COEFFICIENTS = (
+    6.07562052e-01, -2.27712343e-02, 8.06470249e-04, -1.54271372e-04, -3.24651735e-06,
+    7.32602852e-08, 1.35959073e-09, -2.25836520e+00, 8.80326035e-02, 2.16844454e-03,
+    -1.53347087e-05, -5.72983704e-07, -2.55090145e-09, -7.51269505e-01, -4.08350271e-03,
+    -5.21670675e-05, 1.94544667e-06, 1.14099531e-08, 1.58137256e-01, -6.57263143e-05,
+    2.22697524e-07, -4.16117031e-08, -1.27762753e-02, 9.66891875e-06, 2.52785852e-09,
+    4.56306672e-04, -1.74202546e-07, -5.91491269e-06, 3.98374029e-01, 1.83945314e-04,
+    -1.73754510e-04, -7.60781159e-07, 3.77830287e-08, 5.43079673e-10, -2.00518269e-02,
+    8.92859837e-04, 3.45433048e-06, -3.77925774e-07, -1.69699377e-09, 1.69992415e-04,
+    -4.99204314e-05, 2.47417178e-07, 1.07596466e-08, 8.49242932e-05, 1.35191328e-06,
+    -6.21531254e-09, -4.99410301e-06, -1.89489258e-08, 8.15300114e-08, 7.55043090e-04,
+    -5.65095215e-05, -4.52166564e-07, 2.46688878e-08, 2.42674348e-10, 1.54547250e-04,
+    5.24110970e-06, -8.75874982e-08, -1.50743064e-09, -1.56236307e-05, -1.33895614e-07,
+    2.49709824e-09, 6.51711721e-07, 1.94960053e-09, -1.00361113e-08, -1.21206673e-05,
+    -2.18203660e-07, 7.51269482e-09, 9.79063848e-11, 1.25006734e-06, -1.81584736e-09,
+    -3.52197671e-10, -3.36514630e-08, 1.35908359e-10, 4.17032620e-10, -1.30369025e-09,
+    4.13908461e-10, 9.22652254e-12, -5.08220384e-09, -2.24730961e-11, 1.17139133e-10,
+    6.62154879e-10, 4.03863260e-13, 1.95087203e-12, -4.73602469e-12, 5.12733497e+00,
+    -3.12788561e-01, -1.96701861e-02, 9.99690870e-04, 9.51738512e-06, -4.66426341e-07,
+    5.48050612e-01, -3.30552823e-03, -1.64119440e-03, -5.16670694e-06, 9.52692432e-07,
+    -4.29223622e-02, 5.00845667e-03, 1.00601257e-06, -1.81748644e-06, -1.25813502e-03,
+    -1.79330391e-04, 2.34994441e-06, 1.29735808e-04, 1.29064870e-06, -2.28558686e-06,
+    -3.69476348e-02, 1.62325322e-03, -3.14279680e-05, 2.59835559e-06, -4.77136523e-08,
+    8.64203390e-03, -6.87405181e-04, -9.13863872e-06, 5.15916806e-07, -3.59217476e-05,
+    3.28696511e-05, -7.10542454e-07, -1.24382300e-05, -7.38584400e-09, 2.20609296e-07,
+    -7.32469180e-04, -1.87381964e-05, 4.80925239e-06, -8.75492040e-08, 2.77862930e-05,
+    -5.06004592e-06, 1.14325367e-07, 2.53016723e-06, -1.72857035e-08, -3.95079398e-08,
+    -3.59413173e-07, 7.04388046e-07, -1.89309167e-08, -4.79768731e-07, 7.96079978e-09,
+    1.62897058e-09, 3.94367674e-08, -1.18566247e-09, 3.34678041e-10, -1.15606447e-10,
+    -2.80626406e+00, 5.48712484e-01, -3.99428410e-03, -9.54009191e-04, 1.93090978e-05,
+    -3.08806365e-01, 1.16952364e-02, 4.95271903e-04, -1.90710882e-05, 2.10787756e-03,
+    -6.98445738e-04, 2.30109073e-05, 4.17856590e-04, -1.27043871e-05, -3.04620472e-06,
+    5.14507424e-02, -4.32510997e-03, 8.99281156e-05, -7.14663943e-07, -2.66016305e-04,
+    2.63789586e-04, -7.01199003e-06, -1.06823306e-04, 3.61341136e-06, 2.29748967e-07,
+    3.04788893e-04, -6.42070836e-05, 1.16257971e-06, 7.68023384e-06, -5.47446896e-07,
+    -3.59937910e-08, -4.36497725e-06, 1.68737969e-07, 2.67489271e-08, 3.23926897e-09,
+    -3.53874123e-02, -2.21201190e-01, 1.55126038e-02, -2.63917279e-04, 4.53433455e-02,
+    -4.32943862e-03, 1.45389826e-04, 2.17508610e-04, -6.66724702e-05, 3.33217140e-05,
+    -2.26921615e-03, 3.80261982e-04, -5.45314314e-09, -7.96355448e-04, 2.53458034e-05,
+    -6.31223658e-06, 3.02122035e-04, -4.77403547e-06, 1.73825715e-06, -4.09087898e-07,
+    6.14155345e-01, -6.16755931e-02, 1.33374846e-03, 3.55375387e-03, -5.13027851e-04,
+    1.02449757e-04, -1.48526421e-03, -4.11469183e-05, -6.80434415e-06, -9.77675906e-06,
+    8.82773108e-02, -3.01859306e-03, 1.04452989e-03, 2.47090539e-04, 1.48348065e-03,
+)
+
+
+def _utci_matrix():
+    """UTCI_COEFFICIENTS as a matrix between (Pa, Ta) and (dTmrt, va) monomials
+
+    Returns (matrix, left powers, right powers): the polynomial part of UTCI is
+    sum over i, j of left_i * matrix[i, j] * right_j, where left_i = Pa^p Ta^t and
+    right_j = dTmrt^d va^v for (p, t) = left powers[i] and (d, v) = right powers[j].
+    """
+    left = [(p, t) for p in range(7) for t in range(7 - p)]
+    right = [(d, v) for d in range(7) for v in range(7 - d)]
+    matrix = np.zeros((len(left), len(right)))
+    coefficients = iter(UTCI_COEFFICIENTS)
+    for p in range(7):
+        for d in range(7 - p):
+            for v in range(7 - p - d):
+                for t in range(7 - p - d - v):
+                    matrix[left.index((p, t)), right.index((d, v))] = next(coefficients)
+    return matrix, np.array(left).T, np.array(right).T
+
+
+UTCI_MATRIX, UTCI_LEFT_POWERS, UTCI_RIGHT_POWERS = _utci_matrix()
+
+
+def as_float_arrays(*values):
+    return np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in values))
+
+
+def heat_index(temperature, relative_humidity):
+    """NWS heat index in C (Rothfusz regression with the NWS low and high humidity adjustments)"""
+    t, rh = as_float_arrays(temperature * 1.8 + 32, relative_humidity)
+    simple = 0.5 * (t + 61 + (t - 68) * 1.2 + rh * 0.094)
+    full = (
+        -42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh - 6.83783e-3 * t * t
+        - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh
+    )
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    full -= np.where(dry, (13 - rh) / 4 * np.sqrt(np.maximum(17 - np.abs(t - 95), 0) / 17), 0)
+    humid = (rh > 85) & (t >= 80) & (t <= 87)
+    full += np.where(humid, (rh - 85) / 10 * (87 - t) / 5, 0)
+    return (np.where((simple + t) / 2 >= 80, full, simple) - 32) / 1.8
+
+
+def wind_chill(temperature, wind_speed):
+    """Wind chill index in C (Environment Canada / NWS 2001), the air temperature where it is undefined
+
+    Defined for air at or below 10 C and wind of at least 4.8 km/h.
+    """
+    t, wind = as_float_arrays(temperature, wind_speed)
+    kmh = wind * 3.6
+    v = kmh ** 0.16
+    chill = 13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v
+    return np.where((t <= 10) & (kmh >= 4.8), chill, t)
+
+
+def humidex(temperature, relative_humidity=None, dew_point=None):
+    """Humidex in C, from the dew point when given (Masterton and Richardson 1979) or else relative humidity"""
+    if dew_point is not None:
+        t, td = as_float_arrays(temperature, dew_point)
+        vapour_pressure = 6.11 * np.exp(5417.7530 * (1 / 273.16 - 1 / (273.15 + td)))
+    elif relative_humidity is not None:
+        t, rh = as_float_arrays(temperature, relative_humidity)
+        vapour_pressure = 6.112 * 10 ** (7.5 * t / (237.7 + t)) * rh / 100
+    else:
+        raise ValueError('humidex needs relative_humidity or dew_point')
+    return t + 5 / 9 * (vapour_pressure - 10)
+
+
+def saturation_vapour_pressure(temperature):
+    """Saturation vapour pressure over water in hPa, the formula of the UTCI reference code"""
+    tk = np.asarray(temperature, dtype=np.float64) + 273.15
+    return 0.01 * np.exp(
+        -2836.5744 / tk ** 2 - 6028.076559 / tk + 19.54263612 - 0.02737830188 * tk + 1.6261698e-05 * tk ** 2
+        + 7.0229056e-10 * tk ** 3 - 1.8680009e-13 * tk ** 4 + 2.7150305 * np.log(tk)
+    )
+
+
+def utci(temperature, relative_humidity, wind_speed, mean_radiant_temperature=None):
+    """Universal Thermal Climate Index in C, by the operational polynomial approximation
+
+    Without a mean radiant temperature the air temperature is used (a shaded site).
+    Wind is clipped to the 0.5-17 m/s range the approximation was fitted on.
+    """
+    if mean_radiant_temperature is None:
+        mean_radiant_temperature = temperature
+    ta, rh, va, tmrt = as_float_arrays(temperature, relative_humidity, wind_speed, mean_radiant_temperature)
+    shape = ta.shape
+    ta = ta.ravel()
+    pa = (saturation_vapour_pressure(ta) * rh.ravel() / 1000)  # kPa
+    delta = tmrt.ravel() - ta
+    va = np.clip(va.ravel(), *UTCI_WIND_RANGE)
+
+    result = np.empty_like(ta)
+    exponents = np.arange(7)[:, None]
+    for start in range(0, len(ta), UTCI_BLOCK):
+        block = slice(start, start + UTCI_BLOCK)
+        # Powers 0..6 of each variable, then the monomials on either side of the matrix
+        ta_powers, pa_powers = ta[block] ** exponents, pa[block] ** exponents
+        delta_powers, va_powers = delta[block] ** exponents, va[block] ** exponents
+        left = pa_powers[UTCI_LEFT_POWERS[0]] * ta_powers[UTCI_LEFT_POWERS[1]]
+        right = delta_powers[UTCI_RIGHT_POWERS[0]] * va_powers[UTCI_RIGHT_POWERS[1]]
+        result[block] = ta[block] + np.einsum('ij,ij->j', UTCI_MATRIX.T @ left, right)
+    return result.reshape(shape)
+
+
+def pmv_ppd(temperature, relative_humidity, air_speed=0.1, mean_radiant_temperature=None, met=1.2, clo=0.5,
+            external_work=0.0, tolerance=1.5e-4, max_iterations=150):
+    """Predicted mean vote and predicted percentage dissatisfied (ISO 7730:2005, Annex D)
+
+    Returns (pmv, ppd). The clothing surface temperature is solved by the standard's
+    fixed-point iteration for all points at once, until every point has converged.
+    """
+    if mean_radiant_temperature is None:
+        mean_radiant_temperature = temperature
+    ta, rh, vel, tr, met, clo, wme = as_float_arrays(
+        temperature, relative_humidity, air_speed, mean_radiant_temperature, met, clo, external_work
+    )
+
+    pa = rh * 10 * np.exp(16.6536 - 4030.183 / (ta + 235))
+    icl = 0.155 * clo
+    m = met * 58.15
+    mw = m - wme * 58.15
+    fcl = np.where(icl <= 0.078, 1 + 1.29 * icl, 1.05 + 0.645 * icl)
+    hcf = 12.1 * np.sqrt(vel)
+    taa = ta + 273
+    tra = tr + 273
+
+    p1 = icl * fcl
+    p2 = p1 * 3.96
+    p3 = p1 * 100
+    p4 = p1 * taa
+    p5 = 308.7 - 0.028 * mw + p2 * (tra / 100) ** 4
+    tcla = taa + (35.5 - ta) / (3.5 * icl + 0.1)
+    xn = tcla / 100
+    xf = tcla / 50
+    for _ in range(max_iterations):
+        xf = (xf + xn) / 2
+        hc = np.maximum(hcf, 2.38 * np.abs(100 * xf - taa) ** 0.25)
+        xn = (p5 + p4 * hc - p2 * xf ** 4) / (100 + p3 * hc)
+        if np.all(np.abs(xn - xf) <= tolerance):
+            break
+    tcl = 100 * xn - 273
+
+    heat_loss = (
+        3.05e-3 * (5733 - 6.99 * mw - pa)               # skin diffusion
+        + np.where(mw > 58.15, 0.42 * (mw - 58.15), 0)  # sweating
+        + 1.7e-5 * m * (5867 - pa)                      # latent respiration
+        + 0.0014 * m * (34 - ta)                        # dry respiration
+        + 3.96 * fcl * (xn ** 4 - (tra / 100) ** 4)     # radiation
+        + fcl * hc * (tcl - ta)                         # convection
+    )
+    pmv = (0.303 * np.exp(-0.036 * m) + 0.028) * (mw - heat_loss)
+    ppd = 100 - 95 * np.exp(-0.03353 * pmv ** 4 - 0.2179 * pmv ** 2)
+    return pmv, ppd
+
+
+def utci_category(values):
+    """Index into UTCI_CATEGORIES for each UTCI value, as uint8"""
+    return np.searchsorted(UTCI_THRESHOLDS, values, side='left').astype(np.uint8)
+
+
+def pmv_category(pmv):
+    """Index into PMV_CATEGORIES for each PMV value, as uint8"""
+    return np.searchsorted(PMV_THRESHOLDS, np.abs(pmv), side='left').astype(np.uint8)
+
+
+def category_hours(categories, names):
+    """{name: number of hours in that category}, counted along the last (hour) axis"""
+    categories = np.asarray(categories)
+    counts = {}
+    for index, name in enumerate(names):
+        count = np.count_nonzero(categories == index, axis=-1)
+        counts[name] = int(count) if np.ndim(count) == 0 else count
+    return counts
+
+
+def hourly_comfort(temperature, relative_humidity, wind_speed, mean_radiant_temperature=None,
+                   met=1.2, clo=0.5, indoor_air_speed=0.1, dew_point=None):
+    """Every index for an hourly series (or sites x hours grid), with categories and annual hour counts
+
+    UTCI uses the outdoor wind; PMV/PPD describe the same air indoors at indoor_air_speed.
+    """
+    pmv, ppd = pmv_ppd(temperature, relative_humidity, indoor_air_speed, mean_radiant_temperature, met, clo)
+    utci_values = utci(temperature, relative_humidity, wind_speed, mean_radiant_temperature)
+    utci_classes = utci_category(utci_values)
+    pmv_classes = pmv_category(pmv)
+    return {
+        'heat_index': heat_index(temperature, relative_humidity),
+        'wind_chill': wind_chill(temperature, wind_speed),
+        'humidex': humidex(temperature, relative_humidity, dew_point),
+        'utci': utci_values,
+        'pmv': pmv,
+        'ppd': ppd,
+        'utci_category': utci_classes,
+        'pmv_category': pmv_classes,
+        'utci_hours': category_hours(utci_classes, UTCI_CATEGORIES),
+        'pmv_hours': category_hours(pmv_classes, PMV_CATEGORIES),
+    }
+
+
+def main():
+    from epw_reader import read_epw
+
+    parser = argparse.ArgumentParser(description='Annual thermal comfort hours of an EPW file')
+    parser.add_argument('path')
+    parser.add_argument('--met', type=float, default=1.2)
+    parser.add_argument('--clo', type=float, default=0.5)
+    args = parser.parse_args()
+
+    epw = read_epw(args.path)
+    comfort = hourly_comfort(
+        epw['dry_bulb_temperature'], epw['relative_humidity'], epw['wind_speed'],
+        met=args.met, clo=args.clo, dew_point=epw['dew_point_temperature']
+    )
+    print(f"UTCI {comfort['utci'].min():.1f} to {comfort['utci'].max():.1f} C, "
+          f"heat index max {comfort['heat_index'].max():.1f} C, wind chill min {comfort['wind_chill'].min():.1f} C")
+    for title, hours in (('UTCI', comfort['utci_hours']), ('PMV', comfort['pmv_hours'])):
+        print(f'{title} hours: ' + ', '.join(f'{name} {count}' for name, count in hours.items() if count))
+
+
+if __name__ == '__main__':
+    main()
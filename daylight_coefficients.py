@@ -0,0 +1,419 @@
+# Daylight coefficient engine with cached coefficient and sky matrices
+# File: daylight_coefficients.py
+#
+# Annual illuminance is split into two matrices that change for different reasons:
+#   - the daylight coefficients of a room, (sensors x sky patches): the illuminance each
+#     sensor gets from a patch of unit luminance. They depend on geometry only.
+#   - the sky matrix of a weather file, (sky patches x hours): each patch's luminance in
+#     cd/m2 for every hour. It depends on the location's weather only.
+# Illuminance for every sensor and hour is then one matrix product. Both matrices are
+# cached on disk, coefficients keyed by a hash of the canonical geometry dict and sky
+# matrices by the weather file's content hash, so a geometry is traced once however
+# many climates it is tried in, and a climate's sky is built once for every geometry.
+# The disk tier is bounded by max_bytes, least recently used entries evicted first.
+#
+# The sky is the 145 Tregenza patches plus one ground patch, in Radiance's order (ground
+# first), so coefficients from rfluxmtx can be plugged in as the coefficient backend.
+# room_coefficients is the built-in NumPy stand-in for that step, needing no Radiance:
+# a box room with windows on one facade and no outside obstructions. The direct part is
+# traced by sampling each patch with subdivisions x subdivisions directions from every
+# sensor through the window openings; light reflected inside the room is added with the
+# split-flux average (flux through the glazing x reflectance / (room area x (1 - reflectance))).
+#
+# Annual sunlight exposure counts direct sun only, so a second, sun-only sky matrix (the
+# sun's patch, no diffuse sky or ground) is multiplied by direct coefficients, the traced
+# part without reflected light (rfluxmtx -ab 0 for a Radiance backend).
+#   python benchmarks/bench_daylight.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from epw_reader import read_epw
+from rc_simulator import epw_times
+from simulation_cache import canonical_json, weather_identity
+from solar_engine import solar_position
+
+METHOD_VERSION = 1
+
+# Patches per 12 degree altitude band from the horizon up, the last one the zenith cap
+TREGENZA_BANDS = (30, 30, 24, 24, 18, 12, 6, 1)
+BAND_HEIGHT = 12.0
+SKY_PATCHES = sum(TREGENZA_BANDS)
+PATCHES = SKY_PATCHES + 1
+GROUND = 0
+
+SUBDIVISIONS = 4
+SENSOR_CHUNK = 256
+
+# Room defaults for room_coefficients; windows default to one centred band per the WWR
+ROOM_DEFAULTS = {
+    'width': 6.0,  # m along the window facade
+    'depth': 8.0,  # m from the window facade to the back wall
+    'height': 3.0,
+    'orientation': 180.0,  # azimuth of the window facade's outward normal, clockwise from north
+    'window_wall_ratio': 0.3,
+    'windows': None,  # [{'x', 'z', 'width', 'height'}], x from the left edge looking out, z from the floor
+    'grid_spacing': 0.5,
+    'workplane_height': 0.8,
+    'transmittance': 0.6,  # visible transmittance of the glazing
+    'reflectance': 0.5,  # area-weighted mean reflectance of the room surfaces
+}
+# Centred band windows span this share of the facade width, like model_builder
+WINDOW_WIDTH_SHARE = 0.9
+
+
+def sky_patches():
+    """Altitude and azimuth bounds (degrees) and solid angle (sr) of the 145 Tregenza patches"""
+    bounds = []
+    for band, count in enumerate(TREGENZA_BANDS):
+        low = band * BAND_HEIGHT
+        width = 360.0 / count
+        for j in range(count):
+            bounds.append((low, min(90.0, low + BAND_HEIGHT), j * width - width / 2, width))
+    low, high, azimuth_low, azimuth_width = (np.array(column) for column in zip(*bounds))
+    return {
+        'altitude_low': low,
+        'altitude_high': high,
+        'azimuth_low': azimuth_low,
+        'azimuth_width': azimuth_width,
+        'solid_angle': np.radians(azimuth_width) * (np.sin(np.radians(high)) - np.sin(np.radians(low))),
+    }
+
+
+def patch_index(altitude, azimuth):
+    """Tregenza patch (0-144) containing each direction above the horizon"""
+    counts = np.array(TREGENZA_BANDS)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    band = np.clip(np.floor(np.asarray(altitude) / BAND_HEIGHT).astype(np.int64), 0, len(counts) - 1)
+    width = 360.0 / counts[band]
+    return starts[band] + (np.floor(((np.asarray(azimuth) + width / 2) % 360) / width).astype(np.int64) % counts[band])
+
+
+def patch_samples(subdivisions=SUBDIVISIONS):
+    """(east, north, up) unit directions sampling each sky patch evenly, (145 x samples x 3), and their solid angles"""
+    patches = sky_patches()
+    steps = (np.arange(subdivisions) + 0.5) / subdivisions
+    sin_low = np.sin(np.radians(patches['altitude_low']))
+    sin_high = np.sin(np.radians(patches['altitude_high']))
+    # Even steps in sin(altitude) and azimuth are equal solid angles
+    sin_altitude = (sin_low[:, None] + (sin_high - sin_low)[:, None] * steps)[:, :, None]
+    azimuth = np.radians(patches['azimuth_low'][:, None] + patches['azimuth_width'][:, None] * steps)[:, None, :]
+    cos_altitude = np.sqrt(1 - sin_altitude ** 2)
+    directions = np.stack(np.broadcast_arrays(
+        cos_altitude * np.sin(azimuth), cos_altitude * np.cos(azimuth), sin_altitude
+    ), axis=-1).reshape(SKY_PATCHES, subdivisions ** 2, 3)
+    return directions, patches['solid_angle'] / subdivisions ** 2
+
+
+def room_windows(room):
+    """Window rectangles as an (n x 4) array of x0, z0, x1, z1"""
+    if room['windows'] is not None:
+        return np.array([[w['x'], w['z'], w['x'] + w['width'], w['z'] + w['height']] for w in room['windows']],
+                        dtype=np.float64).reshape(-1, 4)
+    wwr = float(room['window_wall_ratio'])
+    if wwr <= 0:
+        return np.zeros((0, 4))
+    width, height = float(room['width']), float(room['height'])
+    band = min(height, wwr * height / WINDOW_WIDTH_SHARE)
+    inset = width * (1 - WINDOW_WIDTH_SHARE) / 2
+    sill = (height - band) / 2
+    return np.array([[inset, sill, width - inset, sill + band]])
+
+
+def room_sensors(room):
+    """Workplane grid (sensors x 3): x along the facade, distance from the facade, height"""
+    spacing = float(room['grid_spacing'])
+    xs = np.arange(spacing / 2, float(room['width']), spacing)
+    ys = np.arange(spacing / 2, float(room['depth']), spacing)
+    x, y = np.meshgrid(xs, ys)
+    return np.column_stack((x.ravel(), y.ravel(), np.full(x.size, float(room['workplane_height']))))
+
+
+def room_coefficients(geometry, subdivisions=SUBDIVISIONS, reflections=True):
+    """NumPy stand-in for rfluxmtx: (sensors x 146) daylight coefficients and the (sensors x 3) sensor points"""
+    room = dict(ROOM_DEFAULTS, **geometry)
+    windows = room_windows(room)
+    sensors = room_sensors(room)
+    transmittance = float(room['transmittance'])
+    reflectance = float(room['reflectance'])
+
+    directions, solid_angle = patch_samples(subdivisions)
+    # Directions in the room's frame: toward the facade (outward), to the right looking out, up
+    relative = np.radians(float(room['orientation']))
+    east, north, up = directions[..., 0], directions[..., 1], directions[..., 2]
+    outward = east * np.sin(relative) + north * np.cos(relative)
+    lateral = east * np.cos(relative) - north * np.sin(relative)
+    weight = transmittance * up * solid_angle[:, None] * (outward > 0)
+
+    coefficients = np.zeros((len(sensors), PATCHES))
+    toward = np.where(outward > 0, outward, np.inf).ravel()
+    for start in range(0, len(sensors), SENSOR_CHUNK):
+        chunk = sensors[start:start + SENSOR_CHUNK]
+        # Where each sensor's ray in each direction crosses the facade plane
+        distance = chunk[:, 1:2] / toward
+        x = chunk[:, 0:1] + distance * lateral.ravel()
+        z = chunk[:, 2:3] + distance * up.ravel()
+        visible = np.zeros(x.shape, dtype=bool)
+        for x0, z0, x1, z1 in windows:
+            visible |= (x >= x0) & (x <= x1) & (z >= z0) & (z <= z1)
+        coefficients[start:start + SENSOR_CHUNK, 1:] = (
+            visible.reshape(len(chunk), SKY_PATCHES, -1) * weight
+        ).sum(axis=2)
+
+    if not reflections:
+        return coefficients.astype(np.float32), sensors
+
+    # Internally reflected light, the same at every sensor
+    glazing_area = ((windows[:, 2] - windows[:, 0]) * (windows[:, 3] - windows[:, 1])).sum()
+    width, depth, height = float(room['width']), float(room['depth']), float(room['height'])
+    room_area = 2 * (width * depth + width * height + depth * height)
+    reflected = transmittance * glazing_area * reflectance / (room_area * (1 - reflectance))
+    coefficients[:, 1:] += reflected * (np.maximum(outward, 0) * solid_angle[:, None]).sum(axis=1)
+    # Ground seen through the window: the lower quarter sphere in front of it, cosine weighted
+    coefficients[:, GROUND] += reflected * np.pi / 2
+    return coefficients.astype(np.float32), sensors
+
+
+def direct_coefficients(geometry, subdivisions=SUBDIVISIONS):
+    """room_coefficients without internally reflected light, for direct sun"""
+    return room_coefficients(geometry, subdivisions, reflections=False)
+
+
+def sun_matrix(direct_normal, altitude, azimuth):
+    """(146 x hours) sky matrix of the sun alone: its direct normal illuminance in the patch containing it"""
+    solid_angle = sky_patches()['solid_angle']
+    direct_normal = np.asarray(direct_normal, dtype=np.float64)
+    altitude = np.asarray(altitude, dtype=np.float64)
+    sun = np.zeros((PATCHES, len(direct_normal)), dtype=np.float32)
+    hours = np.flatnonzero((altitude > 0) & (direct_normal > 0))
+    patch = patch_index(altitude[hours], np.asarray(azimuth)[hours])
+    sun[patch + 1, hours] = direct_normal[hours] / solid_angle[patch]
+    return sun
+
+
+def sky_matrix(direct_normal, diffuse_horizontal, global_horizontal, altitude, azimuth, albedo=0.2):
+    """(146 x hours) patch luminance in cd/m2 from hourly illuminances in lux and sun positions in degrees
+
+    Diffuse light follows the CIE overcast distribution scaled to the hour's diffuse
+    horizontal illuminance, the sun goes into the patch containing it with its direct
+    normal illuminance, and the ground is a uniform diffuse reflector of albedo.
+    """
+    directions, _ = patch_samples()
+    solid_angle = sky_patches()['solid_angle']
+    mean_up = directions[..., 2].mean(axis=1)
+    shape = (1 + 2 * mean_up) / 3
+    diffuse = shape / (shape * solid_angle * mean_up).sum()
+
+    direct_normal = np.asarray(direct_normal, dtype=np.float64)
+    altitude = np.asarray(altitude, dtype=np.float64)
+    sky = np.empty((PATCHES, len(direct_normal)), dtype=np.float32)
+    sky[GROUND] = albedo * np.asarray(global_horizontal, dtype=np.float64) / np.pi
+    sky[1:] = np.outer(diffuse, np.asarray(diffuse_horizontal, dtype=np.float64))
+    sky += sun_matrix(direct_normal, altitude, azimuth)
+    return sky
+
+
+def epw_sun_positions(path, cache_dir=None):
+    """An EPW file's columns and the hourly sun (altitude, azimuth) in degrees"""
+    epw = read_epw(path, cache_dir=cache_dir)
+    columns, location = epw.columns, epw.location
+    times = epw_times(columns, location.get('timezone', 0.0))
+    position = solar_position([location['latitude']], [location['longitude']], times, location.get('elevation', 0.0))
+    return columns, 90 - position['zenith'][0], position['azimuth'][0]
+
+
+def sky_matrix_from_epw(path, albedo=0.2, cache_dir=None):
+    """sky_matrix of an EPW file's illuminance records"""
+    columns, altitude, azimuth = epw_sun_positions(path, cache_dir)
+    return sky_matrix(
+        columns['direct_normal_illuminance'], columns['diffuse_horizontal_illuminance'],
+        columns['global_horizontal_illuminance'], altitude, azimuth, albedo
+    )
+
+
+def sun_matrix_from_epw(path, cache_dir=None):
+    """sun_matrix of an EPW file's direct normal illuminance"""
+    columns, altitude, azimuth = epw_sun_positions(path, cache_dir)
+    return sun_matrix(columns['direct_normal_illuminance'], altitude, azimuth)
+
+
+def save_array(path, array):
+    """np.save through a temporary file, so readers never see half a matrix"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy'
+    np.save(temporary, array)
+    os.replace(temporary, path)
+
+
+class DaylightCoefficients:
+    def __init__(self, cache_dir='daylight_cache', backend=None, max_entries=64, epw_cache_dir=None,
+                 direct_backend=None, max_bytes=1024 * 1024 * 1024):
+        """backend(geometry) returns (coefficients, sensors); room_coefficients by default
+
+        direct_backend is the same without reflected light, direct_coefficients by default
+        and backend itself when only a backend is given. The disk tier is kept under
+        max_bytes by evicting the least recently used entries, as in ResultCache.
+        """
+        self.cache_dir = cache_dir
+        self.backend = backend or room_coefficients
+        self.direct_backend = direct_backend or (backend if backend is not None else direct_coefficients)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.epw_cache_dir = epw_cache_dir
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'coefficients_computed': 0, 'skies_computed': 0,
+                      'evictions': 0}
+        # {(kind, key): [part paths, size in bytes]} of the entries on disk, least recently used first
+        self._files = OrderedDict()
+        self.disk_bytes = 0
+        self.scan()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def geometry_key(self, geometry, backend=None):
+        backend = backend or self.backend
+        digest = hashlib.sha256(f'{METHOD_VERSION}\0{backend.__module__}.{backend.__qualname__}\0'.encode())
+        digest.update(canonical_json(geometry))
+        return digest.hexdigest()
+
+    def sky_key(self, weather, albedo):
+        return hashlib.sha256(f'{METHOD_VERSION}\0{weather_identity(weather)}\0{albedo!r}'.encode()).hexdigest()
+
+    def scan(self):
+        """Index the entries already on disk, oldest access first"""
+        found = {}
+        if os.path.isdir(self.cache_dir):
+            for kind in os.scandir(self.cache_dir):
+                if not kind.is_dir():
+                    continue
+                for item in os.scandir(kind.path):
+                    if item.name.endswith('.npy') and not item.name.endswith('.tmp.npy'):
+                        stat = item.stat()
+                        entry = found.setdefault((kind.name, item.name.split('.')[0]), [0, [], 0])
+                        entry[0] = max(entry[0], stat.st_mtime_ns)
+                        entry[1].append(item.path)
+                        entry[2] += stat.st_size
+        with self._lock:
+            self._files.clear()
+            for name, (_, paths, size) in sorted(found.items(), key=lambda item: item[1][0]):
+                self._files[name] = [paths, size]
+            self.disk_bytes = sum(size for _, size in self._files.values())
+
+    def stored(self, name, paths):
+        """Account an entry's files as just used, then evict down to max_bytes"""
+        size = 0
+        for path in paths:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        evicted = []
+        with self._lock:
+            previous = self._files.pop(name, None)
+            self.disk_bytes += size - (previous[1] if previous else 0)
+            self._files[name] = [paths, size]
+            while self.disk_bytes > self.max_bytes and len(self._files) > 1:
+                old_name, (old_paths, old_size) = self._files.popitem(last=False)
+                self.disk_bytes -= old_size
+                self.stats['evictions'] += 1
+                # Not served from memory once its files are gone
+                self._entries.pop(old_name, None)
+                evicted.extend(old_paths)
+        for path in evicted:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cached(self, kind, key, parts, compute):
+        """The `parts` arrays of an entry from memory, then disk, computing and storing them when missing"""
+        with self._lock:
+            arrays = self._entries.get((kind, key))
+            if arrays is not None:
+                self._entries.move_to_end((kind, key))
+                if (kind, key) in self._files:
+                    self._files.move_to_end((kind, key))
+                self.stats['memory_hits'] += 1
+                return arrays
+
+        paths = [os.path.join(self.cache_dir, kind, f'{key}.{part}.npy') for part in range(parts)]
+        try:
+            arrays = tuple(np.load(path, mmap_mode='r') for path in paths)
+            for path in paths:
+                # mtime is the recency order the next scan() starts from
+                os.utime(path)
+            self.count('disk_hits')
+        except (OSError, ValueError):
+            arrays = compute()
+            for path, array in zip(paths, arrays):
+                save_array(path, array)
+        self.stored((kind, key), paths)
+
+        with self._lock:
+            self._entries[(kind, key)] = arrays
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return arrays
+
+    def coefficients(self, geometry):
+        """(coefficients (sensors x 146), sensors (sensors x 3)) of a geometry"""
+        def compute():
+            self.count('coefficients_computed')
+            return self.backend(geometry)
+        return self.cached('coefficients', self.geometry_key(geometry), 2, compute)
+
+    def direct_coefficients(self, geometry):
+        """(coefficients, sensors) of a geometry without reflected light"""
+        def compute():
+            self.count('coefficients_computed')
+            return self.direct_backend(geometry)
+        return self.cached('direct', self.geometry_key(geometry, self.direct_backend), 2, compute)
+
+    def sky(self, weather, albedo=0.2):
+        """(146 x hours) sky matrix of an EPW file"""
+        def compute():
+            self.count('skies_computed')
+            return (sky_matrix_from_epw(weather, albedo, self.epw_cache_dir),)
+        return self.cached('sky', self.sky_key(weather, albedo), 1, compute)[0]
+
+    def sun(self, weather):
+        """(146 x hours) sun-only sky matrix of an EPW file"""
+        def compute():
+            self.count('skies_computed')
+            return (sun_matrix_from_epw(weather, self.epw_cache_dir),)
+        return self.cached('sun', self.sky_key(weather, 'sun'), 1, compute)[0]
+
+    def illuminance(self, geometry, weather, albedo=0.2):
+        """(sensors x hours) workplane illuminance in lux, one matrix product of the cached matrices"""
+        coefficients, _ = self.coefficients(geometry)
+        return np.asarray(coefficients) @ np.asarray(self.sky(weather, albedo))
+
+    def iter_illuminance(self, geometry, weather, albedo=0.2, chunk_sensors=SENSOR_CHUNK):
+        """illuminance in blocks of chunk_sensors rows, for daylight_metrics without the full matrix"""
+        coefficients, _ = self.coefficients(geometry)
+        sky = np.asarray(self.sky(weather, albedo))
+        for start in range(0, len(coefficients), chunk_sensors):
+            yield np.asarray(coefficients[start:start + chunk_sensors]) @ sky
+
+    def iter_direct_illuminance(self, geometry, weather, chunk_sensors=SENSOR_CHUNK):
+        """Direct-sun illuminance in the same blocks as iter_illuminance, for annual sunlight exposure"""
+        coefficients, _ = self.direct_coefficients(geometry)
+        sun = np.asarray(self.sun(weather))
+        for start in range(0, len(coefficients), chunk_sensors):
+            yield np.asarray(coefficients[start:start + chunk_sensors]) @ sun
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['memory_entries'] = len(self._entries)
+            metrics['disk_entries'] = len(self._files)
+            metrics['disk_bytes'] = self.disk_bytes
+        return metrics
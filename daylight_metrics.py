@@ -0,0 +1,160 @@
+# Streaming annual daylight metrics over sensor grids
+# File: daylight_metrics.py
+#
+# Daylight autonomy (DA), useful daylight illuminance (UDI) and annual sunlight exposure
+# (ASE) are per-sensor counts of occupied hours in illuminance bands, summarized over
+# the grid. A fine grid's (sensors x 8760) illuminance runs to gigabytes, so the metrics
+# are reductions over blocks of sensor rows: the input is a 2-D array (in memory or
+# np.memmap'd from disk, any dtype) read a block at a time, or any iterable of row blocks
+# such as DaylightCoefficients.iter_illuminance. Each block is cut to the occupied hours
+# as float32 and reduced to a few counts per sensor; no more than one block is ever held,
+# and never as float64.
+#   - DA: share of occupied hours at or above da_threshold; spatial DA (sDA, IES LM-83)
+#     is the share of sensors with DA of at least sda_fraction
+#   - UDI: shares of occupied hours below, inside and above udi_range
+#   - ASE: share of sensors above ase_threshold for more than ase_hours occupied hours,
+#     counted on the direct-sun illuminance when one is given
+#   python benchmarks/bench_daylight_metrics.py --sensors 4000
+
+import numpy as np
+
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+HOURS_PER_YEAR = 8760
+
+
+def occupancy_schedule(hours=HOURS_PER_YEAR, start=8, end=18, weekdays_only=False, first_weekday=0):
+    """Occupied hours mask, hour of day in [start, end); first_weekday 0 is a Monday on January 1st"""
+    index = np.arange(hours)
+    hour = index % 24
+    occupied = (hour >= start) & (hour < end)
+    if weekdays_only:
+        occupied &= (index // 24 + first_weekday) % 7 < 5
+    return occupied
+
+
+def iter_blocks(illuminance, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Row blocks of a 2-D array, sized to about chunk_bytes as float32, or the blocks of an iterable"""
+    if hasattr(illuminance, 'shape') and len(illuminance.shape) == 2:
+        rows = max(1, chunk_bytes // (4 * max(1, illuminance.shape[1])))
+        for start in range(0, illuminance.shape[0], rows):
+            yield illuminance[start:start + rows]
+    else:
+        yield from illuminance
+
+
+class RowReader:
+    """Rows of a 2-D array or an iterable of row blocks, taken count rows at a time
+
+    Lets a second input follow the blocks of the first however each is chunked.
+    """
+
+    def __init__(self, rows, name):
+        self.name = name
+        self._array = rows if hasattr(rows, 'shape') and len(rows.shape) == 2 else None
+        self._blocks = None if self._array is not None else iter(rows)
+        self._position = 0
+        self._pending = []  # row blocks read from the iterable but not taken yet
+        self._pending_rows = 0
+
+    def take(self, count):
+        """The next count rows"""
+        if self._array is not None:
+            block = self._array[self._position:self._position + count]
+            self._position += count
+            if len(block) < count:
+                raise ValueError(f'{self.name} has fewer sensor rows than illuminance')
+            return block
+
+        while self._pending_rows < count:
+            block = next(self._blocks, None)
+            if block is None:
+                raise ValueError(f'{self.name} has fewer sensor rows than illuminance')
+            block = np.asarray(block)
+            self._pending.append(block)
+            self._pending_rows += len(block)
+        pending = self._pending[0] if len(self._pending) == 1 else np.concatenate(self._pending)
+        self._pending = [pending[count:]] if len(pending) > count else []
+        self._pending_rows -= count
+        return pending[:count]
+
+    def finish(self):
+        """Raise ValueError when rows are left over"""
+        if self._array is not None:
+            left = self._position < self._array.shape[0]
+        else:
+            left = self._pending_rows > 0 or any(len(block) for block in self._blocks)
+        if left:
+            raise ValueError(f'{self.name} has more sensor rows than illuminance')
+
+
+def occupied_block(block, occupancy):
+    """A block's occupied hours as float32"""
+    block = np.asarray(block)
+    if occupancy is not None:
+        if len(occupancy) != block.shape[1]:
+            raise ValueError(f'Occupancy covers {len(occupancy)} hours, illuminance {block.shape[1]}')
+        block = block[:, occupancy]
+    return block.astype(np.float32, copy=False)
+
+
+def annual_metrics(illuminance, occupancy=None, direct=None, da_threshold=300.0, udi_range=(100.0, 2000.0),
+                   ase_threshold=1000.0, ase_hours=250, sda_fraction=0.5, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Per-sensor DA, UDI and ASE hours plus their spatial summaries, in one pass over the blocks
+
+    illuminance and the optional direct-sun illuminance are (sensors x hours) in lux, as
+    arrays or iterables of row blocks, not necessarily chunked alike but with the same
+    sensor rows; occupancy is a boolean (hours,) mask, every hour counting when None.
+    """
+    if occupancy is not None:
+        occupancy = np.asarray(occupancy, dtype=bool)
+    udi_low, udi_high = udi_range
+    counts = {'da': [], 'low': [], 'high': [], 'sunlit': [], 'total': []}
+    occupied_hours = 0
+
+    blocks = iter_blocks(illuminance, chunk_bytes)
+    # Sliced to the rows of each illuminance block, however direct is chunked
+    direct_rows = RowReader(direct, 'Direct-sun illuminance') if direct is not None else None
+    for block in blocks:
+        block = occupied_block(block, occupancy)
+        occupied_hours = block.shape[1]
+        counts['da'].append(np.count_nonzero(block >= da_threshold, axis=1))
+        counts['low'].append(np.count_nonzero(block < udi_low, axis=1))
+        counts['high'].append(np.count_nonzero(block > udi_high, axis=1))
+        counts['total'].append(block.sum(axis=1, dtype=np.float64))
+        sun = block if direct_rows is None else occupied_block(direct_rows.take(len(block)), occupancy)
+        counts['sunlit'].append(np.count_nonzero(sun > ase_threshold, axis=1))
+    if direct_rows is not None:
+        direct_rows.finish()
+
+    da, low, high, sunlit, total = (
+        np.concatenate(counts[name]) if counts[name] else np.zeros(0) for name in ('da', 'low', 'high', 'sunlit', 'total')
+    )
+    hours = max(occupied_hours, 1)
+    daylight_autonomy = da / hours
+    useful = (occupied_hours - low - high) / hours
+    sensors = len(da)
+
+    def spatial(values):
+        return float(values.mean()) if sensors else 0.0
+
+    return {
+        'sensors': sensors,
+        'occupied_hours': occupied_hours,
+        'per_sensor': {
+            'daylight_autonomy': daylight_autonomy,
+            'udi_fell_short': low / hours,
+            'udi_useful': useful,
+            'udi_exceeded': high / hours,
+            'sunlit_hours': sunlit,
+            'mean_illuminance': total / hours,
+        },
+        'spatial_daylight_autonomy': spatial(daylight_autonomy >= sda_fraction),
+        'mean_daylight_autonomy': spatial(daylight_autonomy),
+        'useful_daylight_illuminance': {
+            'fell_short': spatial(low / hours),
+            'useful': spatial(useful),
+            'exceeded': spatial(high / hours),
+        },
+        'annual_sunlight_exposure': spatial(sunlit > ase_hours),
+        'mean_illuminance': spatial(total / hours),
+    }
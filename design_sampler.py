@@ -0,0 +1,113 @@
+# Lazy design space sampling with vectorized site constraints
+# File: design_sampler.py
+#
+# generate_building_variants walked every combination of the parameter grid in nested
+# loops, checked the site constraints one design at a time, built geometry for each
+# feasible one and then kept the first 100. DesignSpace turns that around:
+#   - the grid is never expanded: a design is a flat index into the grid's shape, and
+#     its parameter values are looked up only when the design is yielded
+#   - meets_constraints takes arrays, so the feasibility of the whole grid is one
+#     broadcast over the constrained axes (length, width, height), kept as a view
+#   - samplers are generators yielding parameter dicts: full-factorial walks the feasible
+#     designs in grid order a chunk at a time, Latin hypercube and Sobol (scipy.stats.qmc)
+#     draw points in the unit cube, snap them to grid levels and drop the infeasible and
+#     already seen ones
+# Callers build geometry only for the designs they consume.
+#   python benchmarks/bench_design_sampler.py
+
+import itertools
+
+import numpy as np
+from scipy.stats import qmc
+
+# The generate_building_variants grid
+DEFAULT_PARAMETERS = {
+    'length': (20, 30, 40),
+    'width': (15, 20, 25),
+    'height': (3, 6, 9, 12),
+    'orientation': tuple(range(0, 360, 15)),
+    'window_wall_ratio': (0.1, 0.2, 0.3, 0.4, 0.5),
+}
+METHODS = ('full_factorial', 'latin_hypercube', 'sobol')
+DEFAULT_CHUNK = 4096
+SOBOL_BATCH = 256  # a power of two keeps the Sobol points balanced
+
+
+def meets_constraints(length, width, height, site_params):
+    """True where a design fits the site: footprint max_area, max_height, max_length, max_width
+
+    Arguments broadcast against each other as NumPy arrays; absent limits do not constrain.
+    """
+    length, width, height = np.asarray(length), np.asarray(width), np.asarray(height)
+    feasible = np.ones(np.broadcast_shapes(length.shape, width.shape, height.shape), dtype=bool)
+    limits = (('max_area', length * width), ('max_height', height), ('max_length', length), ('max_width', width))
+    for name, value in limits:
+        if site_params.get(name) is not None:
+            feasible &= value <= site_params[name]
+    return feasible
+
+
+class DesignSpace:
+    """The feasible designs of a parameter grid, sampled lazily"""
+
+    def __init__(self, parameters=None, site_params=None):
+        parameters = DEFAULT_PARAMETERS if parameters is None else parameters
+        self.names = tuple(parameters)
+        self.levels = tuple(np.asarray(list(values)) for values in parameters.values())
+        self.shape = tuple(len(values) for values in self.levels)
+        self.size = int(np.prod(self.shape))
+
+        # Open mesh: each constrained axis varies along its own dimension, the rest broadcast
+        mesh = dict(zip(self.names, np.meshgrid(*self.levels, indexing='ij', sparse=True)))
+        missing = [name for name in ('length', 'width', 'height') if name not in mesh]
+        if missing:
+            raise ValueError(f'Design parameters lack {", ".join(missing)}')
+        feasible = meets_constraints(mesh['length'], mesh['width'], mesh['height'], site_params or {})
+        self.feasible = np.broadcast_to(feasible, self.shape)
+        self.feasible_count = int(feasible.sum()) * self.size // max(1, feasible.size)
+
+    def design(self, index):
+        """Parameter dict of the design at a flat grid index"""
+        position = np.unravel_index(index, self.shape)
+        return {name: levels[i].item() for name, levels, i in zip(self.names, self.levels, position)}
+
+    def full_factorial(self, chunk=DEFAULT_CHUNK):
+        """Every feasible design, in grid order"""
+        for start in range(0, self.size, chunk):
+            indices = np.arange(start, min(start + chunk, self.size))
+            for index in indices[self.feasible[np.unravel_index(indices, self.shape)]]:
+                yield self.design(index)
+
+    def snap(self, points):
+        """Flat grid indices of unit-cube points, each coordinate binned over its axis's levels"""
+        position = np.minimum((points * self.shape).astype(np.intp), np.array(self.shape) - 1)
+        return np.ravel_multi_index(position.T, self.shape)
+
+    def draw(self, engine, count, batch=None):
+        """Up to count distinct feasible designs from engine points, batch (or the shortfall) at a time"""
+        seen = set()
+        while len(seen) < min(count, self.feasible_count):
+            indices = self.snap(engine(batch or count - len(seen)))
+            for index in indices[self.feasible[np.unravel_index(indices, self.shape)]]:
+                if index not in seen and len(seen) < count:
+                    seen.add(index)
+                    yield self.design(index)
+
+    def latin_hypercube(self, count, seed=None):
+        """count feasible designs, a Latin hypercube over the grid redrawn for the shortfall"""
+        sampler = qmc.LatinHypercube(len(self.shape), rng=seed)
+        return self.draw(sampler.random, count)
+
+    def sobol(self, count, seed=None):
+        """count feasible designs along a scrambled Sobol sequence"""
+        sampler = qmc.Sobol(len(self.shape), rng=seed)
+        return self.draw(sampler.random, count, SOBOL_BATCH)
+
+    def sample(self, method='full_factorial', count=None, seed=None):
+        """Generator of feasible parameter dicts; count None is every feasible design"""
+        if method not in METHODS:
+            raise ValueError(f'Unknown sampling method {method!r}, expected one of {", ".join(METHODS)}')
+        if method == 'full_factorial':
+            return itertools.islice(self.full_factorial(), count)
+        count = self.feasible_count if count is None else count
+        return getattr(self, method)(count, seed)
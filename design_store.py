@@ -0,0 +1,387 @@
+# Building design persistence
+# File: design_store.py
+#
+# Optimization results are recorded for audit and model retraining without touching
+# the request path: routes hand rows to DesignWriter, a background thread batches them
+# into one transaction per flush on a small pool of WAL-mode SQLite connections.
+
+import atexit
+import json
+import logging
+import math
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+DATABASE_PATH = 'building_designs.db'
+
+# Tables with lat/lng columns that get an R*Tree index, and the columns nearest_rows returns
+SPATIAL_TABLES = {
+    'building_designs': (
+        'id', 'lat', 'lng', 'building_type', 'orientation', 'window_wall_ratio',
+        'energy_consumption', 'design_parameters', 'created_at'
+    ),
+    'climate_data': (
+        'id', 'lat', 'lng', 'climate_zone', 'hdd', 'cdd', 'solar_irradiance', 'wind_speed', 'created_at'
+    )
+}
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    def __init__(self, path=DATABASE_PATH, size=2, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._connections = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._connections.put(self._connect())
+
+    def _connect(self):
+        """Open a connection configured for concurrent readers and one writer"""
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        # WAL lets readers proceed while the writer commits, NORMAL sync is durable in WAL mode
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, blocking until one is free"""
+        conn = self._connections.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class DesignWriter:
+    INSERT_SQL = '''
+        INSERT INTO building_designs (
+            lat, lng, building_type, orientation, window_wall_ratio,
+            energy_consumption, design_parameters
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    # Subclasses writing other tables replace INSERT_SQL, row_params and these names
+    ROW_KIND = 'building designs'
+    THREAD_NAME = 'design-writer'
+
+    def __init__(self, pool, max_pending=100000, batch_size=1000, flush_interval=0.25):
+        self.pool = pool
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Each queue item is one submission (a list of rows), so a 50k-site batch costs a single put
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self.stats = {
+            'pending_rows': 0,
+            'high_water_rows': 0,
+            'submitted_rows': 0,
+            'written_rows': 0,
+            'dropped_rows': 0,
+            'failed_rows': 0,
+            'batches': 0,
+            'last_batch_seconds': 0.0
+        }
+
+    def submit(self, rows):
+        """Queue design rows for insertion, never blocks the caller
+
+        Rows are (lat, lng, building_type, result) tuples where result is the dict
+        returned by optimize_building_design. Returns False if the queue is full.
+        """
+        rows = list(rows)
+        if not rows:
+            return True
+
+        with self._lock:
+            if self._stopping or self.stats['pending_rows'] + len(rows) > self.max_pending:
+                self.stats['dropped_rows'] += len(rows)
+                return False
+            self.stats['pending_rows'] += len(rows)
+            self.stats['submitted_rows'] += len(rows)
+            self.stats['high_water_rows'] = max(self.stats['high_water_rows'], self.stats['pending_rows'])
+            # Started lazily so a pre-forking server never forks a process holding the thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.THREAD_NAME, daemon=True)
+                self._thread.start()
+
+        self._queue.put(rows)
+        return True
+
+    def _run(self):
+        """Writer loop: drain up to batch_size rows, insert them in one transaction"""
+        while True:
+            try:
+                batch = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if batch is None:
+                self._queue.task_done()
+                return
+
+            submissions = 1
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                submissions += 1
+                if more is None:
+                    stop = True
+                    break
+                batch.extend(more)
+
+            self._write(batch)
+            for _ in range(submissions):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        """Insert one batch of rows inside a single transaction"""
+        start = time.perf_counter()
+        try:
+            params = [self.row_params(*row) for row in batch]
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.executemany(self.INSERT_SQL, params)
+            outcome = 'written_rows'
+        except Exception:
+            logger.exception('Failed to persist %d %s', len(batch), self.ROW_KIND)
+            outcome = 'failed_rows'
+
+        with self._lock:
+            self.stats[outcome] += len(batch)
+            self.stats['pending_rows'] -= len(batch)
+            self.stats['batches'] += 1
+            self.stats['last_batch_seconds'] = time.perf_counter() - start
+            self._drained.notify_all()
+
+    @staticmethod
+    def row_params(lat, lng, building_type, result):
+        """Map an optimize_building_design result onto building_designs columns"""
+        parameters = result['optimized_parameters']
+        return (
+            lat,
+            lng,
+            building_type,
+            parameters.get('optimal_orientation'),
+            parameters.get('window_wall_ratio'),
+            result['energy_performance']['total_annual'],
+            json.dumps(result)
+        )
+
+    def wait_for_backlog(self, max_rows, timeout=None):
+        """Block until at most max_rows are pending, lets bulk producers apply backpressure"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._drained:
+            while self.stats['pending_rows'] > max_rows:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every queued row has been written, returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Flush outstanding rows and stop the writer thread, used at shutdown"""
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def metrics(self):
+        """Queue depth and throughput counters for sizing the writer under load"""
+        with self._lock:
+            metrics = dict(self.stats)
+        metrics.update({
+            'queue_depth': self._queue.qsize(),
+            'max_pending_rows': self.max_pending,
+            'batch_size': self.batch_size
+        })
+        return metrics
+
+    def register_shutdown_hook(self):
+        """Flush on interpreter exit, covers gunicorn's graceful worker shutdown"""
+        atexit.register(self.close)
+
+
+# Spatial index. Each table in SPATIAL_TABLES gets a <table>_rtree R*Tree with degenerate
+# (point) boxes kept in sync by triggers, so nearest-neighbour queries only touch the
+# handful of rows inside a bounding box instead of scanning the table.
+
+def create_spatial_index(conn, table):
+    """Create the R*Tree index and sync triggers for a table, backfilling existing rows"""
+    rtree = f'{table}_rtree'
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rtree,)
+    ).fetchone()
+
+    conn.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(id, min_lat, max_lat, min_lng, max_lng)')
+    conn.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_rtree_insert AFTER INSERT ON {table}
+        WHEN NEW.lat IS NOT NULL AND NEW.lng IS NOT NULL
+        BEGIN
+            INSERT INTO {rtree} VALUES (NEW.id, NEW.lat, NEW.lat, NEW.lng, NEW.lng);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {table}_rtree_update AFTER UPDATE OF lat, lng ON {table}
+        BEGIN
+            DELETE FROM {rtree} WHERE id = OLD.id;
+            INSERT INTO {rtree} SELECT NEW.id, NEW.lat, NEW.lat, NEW.lng, NEW.lng
+            WHERE NEW.lat IS NOT NULL AND NEW.lng IS NOT NULL;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {table}_rtree_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {rtree} WHERE id = OLD.id;
+        END;
+    ''')
+
+    if not exists:
+        conn.execute(
+            f'INSERT INTO {rtree} SELECT id, lat, lat, lng, lng FROM {table} '
+            f'WHERE lat IS NOT NULL AND lng IS NOT NULL'
+        )
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres, accepts scalars or NumPy arrays"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def covering_boxes(lat, lng, radius_km):
+    """Lat/lng boxes that together contain every point within radius_km, split at the antimeridian"""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat = max(-90.0, lat - dlat)
+    max_lat = min(90.0, lat + dlat)
+
+    # Longitude degrees shrink towards the poles, size the box for the most poleward latitude
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if max_lat >= 90 or min_lat <= -90 or dlat >= 90 or cos_lat * 180 <= dlat:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    dlng = dlat / cos_lat
+    boxes = [(min_lat, max_lat, max(-180.0, lng - dlng), min(180.0, lng + dlng))]
+    if lng - dlng < -180:
+        boxes.append((min_lat, max_lat, lng - dlng + 360, 180.0))
+    if lng + dlng > 180:
+        boxes.append((min_lat, max_lat, -180.0, lng + dlng - 360))
+    return boxes
+
+
+def _box_clause(boxes):
+    """WHERE clause and parameters selecting R*Tree entries inside any of the boxes"""
+    # Overlap rather than containment tests, R*Tree rounds float32 coordinates outwards
+    clause = ' OR '.join('(r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?)' for _ in boxes)
+    return clause, [value for box in boxes for value in box]
+
+
+def _index_points(conn, rtree, lat, lng, radius_km):
+    """ids and approximate distances of R*Tree entries inside the box covering radius_km"""
+    clause, params = _box_clause(covering_boxes(lat, lng, radius_km))
+    entries = np.array(conn.execute(
+        f'SELECT id, min_lat, max_lat, min_lng, max_lng FROM {rtree} r WHERE {clause}', params
+    ).fetchall())
+    # R*Tree keeps float32 bounds rounded outwards, the box centre is the point to within ~1 m
+    return entries[:, 0], haversine_km(
+        lat, lng, (entries[:, 1] + entries[:, 2]) / 2, (entries[:, 3] + entries[:, 4]) / 2
+    )
+
+
+def nearest_rows(conn, table, lat, lng, k=10, max_candidates_per_neighbour=8):
+    """k nearest rows of an indexed table to (lat, lng), each with a distance_km field
+
+    Sizes a bounding box until it holds at least k index entries, ranks them from the
+    index alone, and only reads base-table rows for the final few. Cost scales with the
+    number of rows near the site, not the table size.
+    """
+    columns = SPATIAL_TABLES[table]
+    rtree = f'{table}_rtree'
+    world = [(-90.0, 90.0, -180.0, 180.0)]
+
+    # Start near the k-th neighbour distance a uniform spread of rows would give
+    # (max(id) is an O(log n) stand-in for the row count)
+    total = conn.execute(f'SELECT max(id) FROM {table}').fetchone()[0] or 1
+    radius_km = max(0.01, EARTH_RADIUS_KM * math.sqrt(k / total))
+
+    # Counting stays inside SQLite, so adjusting the box in small steps is cheap. Shrink
+    # while a dense cluster floods the box, grow until it holds k rows.
+    grown = False
+    while True:
+        boxes = covering_boxes(lat, lng, radius_km)
+        clause, params = _box_clause(boxes)
+        count = conn.execute(f'SELECT count(*) FROM {rtree} r WHERE {clause}', params).fetchone()[0]
+        if count < k and boxes != world:
+            radius_km *= 2
+            grown = True
+        elif count > k * max_candidates_per_neighbour and not grown and radius_km > 0.01:
+            radius_km /= 4
+        else:
+            break
+
+    if not count:
+        return []
+
+    ids, distances = _index_points(conn, rtree, lat, lng, radius_km)
+    kth = min(k, len(distances)) - 1
+    kth_km = float(np.partition(distances, kth)[kth])
+
+    # The box holds every row within radius_km. If the k-th candidate is further out, a
+    # closer row could sit just beyond the box edge, so widen to the k-th distance once.
+    if kth_km > radius_km:
+        ids, distances = _index_points(conn, rtree, lat, lng, kth_km)
+
+    # Anything within the k-th approximate distance (plus float32 slack) may be a winner
+    shortlist = ids[distances <= kth_km + 0.01].astype(int).tolist()
+    placeholders = ', '.join('?' * len(shortlist))
+    rows = conn.execute(
+        f'SELECT {", ".join(columns)} FROM {table} WHERE id IN ({placeholders})', shortlist
+    ).fetchall()
+
+    results = []
+    for row in rows:
+        record = dict(zip(columns, row))
+        record['distance_km'] = float(haversine_km(lat, lng, record['lat'], record['lng']))
+        results.append(record)
+    results.sort(key=lambda record: (record['distance_km'], record['id']))
+    return results[:k]
@@ -0,0 +1,274 @@
+# Offline EPW station catalog
+# File: epw_catalog.py
+#
+# Indexes a local directory tree of EPW files by station location. Each station is a
+# point on the unit sphere, so a KD-tree answers nearest and k-nearest queries in
+# O(log n) with no special cases at the poles or the antimeridian: the chord between
+# two unit vectors is monotonic in their great-circle distance.
+#
+# Only the LOCATION record of each file is read. A JSON manifest remembers every file's
+# size, mtime and location, so refresh() only opens files that were added or changed.
+# blend() mixes the hourly columns of the k nearest stations by inverse distance.
+#   python epw_catalog.py WEATHER_DIR --lat 40.71 --lng -74.01 -k 3
+
+import argparse
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from epw_reader import MISSING_VALUES, missing_mask, parse_location, read_epw
+
+EARTH_RADIUS_KM = 6371.0088
+MANIFEST_NAME = '.epw_catalog.json'
+MANIFEST_VERSION = 1
+
+# Columns taken from the nearest station rather than averaged
+NEAREST_ONLY_FIELDS = (
+    'year', 'month', 'day', 'hour', 'minute', 'present_weather_observation', 'present_weather_codes'
+)
+
+
+def unit_vectors(lats, lngs):
+    """(n, 3) points on the unit sphere for latitude/longitude in degrees"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def unit_vector(lat, lng):
+    """unit_vectors for a single point, without the array overhead"""
+    lat, lng = math.radians(lat), math.radians(lng)
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lng), cos_lat * math.sin(lng), math.sin(lat))
+
+
+def km_to_chord(distance_km):
+    return 2 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def without_leap_day(columns):
+    """Drop 29 February so leap-year files line up with 8760-hour ones"""
+    if len(columns['month']) != 8784:
+        return columns
+    keep = ~((columns['month'] == 2) & (columns['day'] == 29))
+    return {name: column[keep] for name, column in columns.items()}
+
+
+class EPWCatalog:
+    def __init__(self, directory, manifest_path=None, cache_dir=None):
+        self.directory = directory
+        self.manifest_path = manifest_path or os.path.join(directory, MANIFEST_NAME)
+        # Where read_epw keeps binary caches, None puts them next to each file
+        self.cache_dir = cache_dir
+
+        self.stations = {}
+        self.paths = []
+        self.tree = None
+        self.load_manifest()
+        self.refresh()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get('version') == MANIFEST_VERSION:
+            self.stations = manifest['stations']
+
+    def save_manifest(self):
+        temporary = f'{self.manifest_path}.{os.getpid()}.tmp'
+        try:
+            with open(temporary, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'stations': self.stations}, f)
+            os.replace(temporary, self.manifest_path)
+        except OSError:
+            pass  # read-only weather directory, the catalog still works from memory
+
+    def scan(self):
+        """{relative path: (size, mtime_ns)} for every EPW file under the directory"""
+        found = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.lower().endswith('.epw'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found[os.path.relpath(path, self.directory)] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def refresh(self):
+        """Pick up added, changed and removed files, returns (added, changed, removed) counts"""
+        found = self.scan()
+        added = changed = 0
+
+        for relative, (size, mtime_ns) in found.items():
+            known = self.stations.get(relative)
+            if known is not None and known['size'] == size and known['mtime_ns'] == mtime_ns:
+                continue
+            try:
+                with open(os.path.join(self.directory, relative), encoding='latin-1') as f:
+                    location = parse_location(f.readline())
+                if 'latitude' not in location or 'longitude' not in location:
+                    raise ValueError(f'{relative} has no station coordinates')
+            except (OSError, ValueError):
+                self.stations.pop(relative, None)  # not a readable EPW file
+                continue
+            if known is None:
+                added += 1
+            else:
+                changed += 1
+            self.stations[relative] = {'size': size, 'mtime_ns': mtime_ns, 'location': location}
+
+        removed = [relative for relative in self.stations if relative not in found]
+        for relative in removed:
+            del self.stations[relative]
+
+        if added or changed or removed or self.tree is None:
+            self.build_index()
+        if added or changed or removed:
+            self.save_manifest()
+        return added, changed, len(removed)
+
+    def build_index(self):
+        self.paths = sorted(self.stations)
+        # Changes whenever a file is added, removed or modified, for versioning derived results
+        self.fingerprint = hashlib.sha256(json.dumps([
+            (relative, self.stations[relative]['size'], self.stations[relative]['mtime_ns']) for relative in self.paths
+        ]).encode()).hexdigest()[:16]
+        if not self.paths:
+            self.tree = None
+            return
+        locations = [self.stations[relative]['location'] for relative in self.paths]
+        self.tree = cKDTree(unit_vectors(
+            [location['latitude'] for location in locations],
+            [location['longitude'] for location in locations]
+        ))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def station(self, index, chord):
+        """Station record for a tree index and the chord to the query point"""
+        relative = self.paths[index]
+        return {
+            'path': os.path.join(self.directory, relative),
+            'location': self.stations[relative]['location'],
+            'distance_km': 2 * EARTH_RADIUS_KM * math.asin(min(float(chord) / 2, 1.0))
+        }
+
+    def k_nearest(self, lat, lng, k=1, max_distance_km=None):
+        """Up to k stations sorted by great-circle distance, each {'path', 'location', 'distance_km'}"""
+        if k < 1:
+            raise ValueError(f'k must be at least 1, got {k}')
+        if self.tree is None:
+            return []
+        k = min(k, len(self.paths))
+        upper_bound = km_to_chord(max_distance_km) if max_distance_km is not None else np.inf
+        chords, indices = self.tree.query(unit_vector(lat, lng), k=k, distance_upper_bound=upper_bound)
+        chords, indices = np.atleast_1d(chords), np.atleast_1d(indices)
+        return [
+            self.station(index, chord) for chord, index in zip(chords, indices) if index < len(self.paths)
+        ]
+
+    def nearest(self, lat, lng, max_distance_km=None):
+        """Nearest station, or None when the catalog has none within max_distance_km"""
+        stations = self.k_nearest(lat, lng, 1, max_distance_km)
+        return stations[0] if stations else None
+
+    def find_nearest_epw(self, lat, lng, max_distance_km=None):
+        """Path of the nearest station's EPW file, or None"""
+        station = self.nearest(lat, lng, max_distance_km)
+        return station['path'] if station else None
+
+    def nearest_paths(self, lats, lngs, max_distance_km=None):
+        """find_nearest_epw for coordinate columns in one tree query, None where no station is close enough"""
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        if self.tree is None:
+            return [None] * len(lats)
+        upper_bound = km_to_chord(max_distance_km) if max_distance_km is not None else np.inf
+        _, indices = self.tree.query(unit_vectors(lats, lngs), k=1, distance_upper_bound=upper_bound)
+        paths = [os.path.join(self.directory, relative) for relative in self.paths]
+        return [paths[index] if index < len(paths) else None for index in indices.tolist()]
+
+    def blend(self, lat, lng, k=4, power=2, fields=None, max_distance_km=None):
+        """Inverse-distance weighted hourly columns of the k nearest stations
+
+        Weights are 1 / distance**power. A station closer than 1 m is used as is.
+        Wind direction is blended as a vector; date and present weather columns
+        come from the nearest station. Leap days are dropped so files align.
+        Missing values are left out: each hour's weights are renormalized over the
+        stations with a reading, and hours none of them has keep the missing value.
+        """
+        stations = self.k_nearest(lat, lng, k, max_distance_km)
+        if not stations:
+            return None
+
+        distances = np.array([station['distance_km'] for station in stations])
+        if distances[0] < 1e-3:
+            stations, distances = stations[:1], distances[:1]
+        weights = 1 / np.maximum(distances, 1e-3) ** power
+        weights /= weights.sum()
+
+        tables = [
+            without_leap_day(read_epw(station['path'], cache_dir=self.cache_dir).columns) for station in stations
+        ]
+        hours = {len(table['month']) for table in tables}
+        if len(hours) != 1:
+            raise ValueError(f'Stations have different record counts: {sorted(hours)}')
+
+        names = fields or list(tables[0])
+        blended = {}
+        for name in names:
+            if name in NEAREST_ONLY_FIELDS:
+                blended[name] = np.array(tables[0][name])
+                continue
+            values = np.stack([table[name].astype(np.float64) for table in tables])
+            present = ~np.stack([missing_mask(name, table[name]) for table in tables])
+            complete = present.all()
+            hour_weights, recorded = weights[:, None], True
+            if not complete:
+                hour_weights = hour_weights * present
+                total = hour_weights.sum(axis=0)
+                recorded = total > 0
+                hour_weights = hour_weights / np.where(recorded, total, 1)
+                values = np.where(present, values, 0.0)
+            if name == 'wind_direction':
+                angle = np.radians(values)
+                east = (hour_weights * np.sin(angle)).sum(axis=0)
+                north = (hour_weights * np.cos(angle)).sum(axis=0)
+                column = np.degrees(np.arctan2(east, north)) % 360
+            elif complete:
+                # The usual case, every station has every hour
+                column = weights @ values
+            else:
+                column = (hour_weights * values).sum(axis=0)
+            blended[name] = np.where(recorded, column, MISSING_VALUES.get(name, np.nan)).astype(tables[0][name].dtype)
+
+        return {
+            'stations': [dict(station, weight=float(weight)) for station, weight in zip(stations, weights)],
+            'columns': blended
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index a directory of EPW files and query nearest stations')
+    parser.add_argument('directory')
+    parser.add_argument('--lat', type=float, required=True)
+    parser.add_argument('--lng', type=float, required=True)
+    parser.add_argument('-k', type=int, default=1)
+    args = parser.parse_args()
+
+    catalog = EPWCatalog(args.directory)
+    print(f'{len(catalog)} stations')
+    for station in catalog.k_nearest(args.lat, args.lng, args.k):
+        location = station['location']
+        print(f"{station['distance_km']:9.1f} km  {location.get('city')}, {location.get('country')}  {station['path']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+# Columnar EPW weather file reader with a binary 8760 cache
+# File: epw_reader.py
+#
+# Parses the hourly records of an EnergyPlus Weather file in one pass into typed NumPy
+# columns, one per EPW field (the data source flags string is skipped). The columns are
+# written next to the file as a binary cache, each one contiguous and 64-byte aligned,
+# with a small JSON sidecar holding their offsets, the location and header records and
+# the source file's size and mtime. Later loads memory-map the cache instead of parsing
+# text: zero-copy, well under a millisecond. A cache is rebuilt whenever the source
+# file changes.
+#   python epw_reader.py weather.epw [--cache-dir DIR] [--no-cache]
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+# Hourly record fields in file order, with the type each column is stored as.
+# Measured quantities are float32: EPW values carry at most one decimal and the
+# largest magnitudes (pressure in Pa, illuminance in lux) stay exact below 2**24.
+EPW_FIELDS = (
+    ('year', np.int16),
+    ('month', np.uint8),
+    ('day', np.uint8),
+    ('hour', np.uint8),
+    ('minute', np.uint8),
+    ('data_source_flags', None),  # free-form uncertainty flags, not stored
+    ('dry_bulb_temperature', np.float32),
+    ('dew_point_temperature', np.float32),
+    ('relative_humidity', np.float32),
+    ('atmospheric_pressure', np.float32),
+    ('extraterrestrial_horizontal_radiation', np.float32),
+    ('extraterrestrial_direct_normal_radiation', np.float32),
+    ('horizontal_infrared_radiation', np.float32),
+    ('global_horizontal_radiation', np.float32),
+    ('direct_normal_radiation', np.float32),
+    ('diffuse_horizontal_radiation', np.float32),
+    ('global_horizontal_illuminance', np.float32),
+    ('direct_normal_illuminance', np.float32),
+    ('diffuse_horizontal_illuminance', np.float32),
+    ('zenith_luminance', np.float32),
+    ('wind_direction', np.float32),
+    ('wind_speed', np.float32),
+    ('total_sky_cover', np.float32),
+    ('opaque_sky_cover', np.float32),
+    ('visibility', np.float32),
+    ('ceiling_height', np.float32),
+    ('present_weather_observation', np.uint8),
+    ('present_weather_codes', 'S9'),  # nine digit code, kept as text for its leading zeros
+    ('precipitable_water', np.float32),
+    ('aerosol_optical_depth', np.float32),
+    ('snow_depth', np.float32),
+    ('days_since_last_snowfall', np.float32),
+    ('albedo', np.float32),
+    ('liquid_precipitation_depth', np.float32),
+    ('liquid_precipitation_quantity', np.float32),
+)
+
+# EnergyPlus "missing" value of each field: marks gaps in the records, and fills trailing
+# fields that older files omit
+MISSING_VALUES = {
+    'dry_bulb_temperature': 99.9,
+    'dew_point_temperature': 99.9,
+    'relative_humidity': 999,
+    'atmospheric_pressure': 999999,
+    'extraterrestrial_horizontal_radiation': 9999,
+    'extraterrestrial_direct_normal_radiation': 9999,
+    'horizontal_infrared_radiation': 9999,
+    'global_horizontal_radiation': 9999,
+    'direct_normal_radiation': 9999,
+    'diffuse_horizontal_radiation': 9999,
+    'global_horizontal_illuminance': 999999,
+    'direct_normal_illuminance': 999999,
+    'diffuse_horizontal_illuminance': 999999,
+    'zenith_luminance': 9999,
+    'wind_direction': 999,
+    'wind_speed': 999,
+    'total_sky_cover': 99,
+    'opaque_sky_cover': 99,
+    'visibility': 9999,
+    'ceiling_height': 99999,
+    'present_weather_observation': 9,
+    'present_weather_codes': b'999999999',
+    'precipitable_water': 999,
+    'aerosol_optical_depth': 0.999,
+    'snow_depth': 999,
+    'days_since_last_snowfall': 99,
+    'albedo': 999,
+    'liquid_precipitation_depth': 999,
+    'liquid_precipitation_quantity': 99,
+}
+
+# Fields that date each record, with no missing value of their own
+DATE_FIELDS = ('year', 'month', 'day', 'hour', 'minute')
+
+STORED_FIELDS = [(name, dtype) for name, dtype in EPW_FIELDS if dtype is not None]
+
+HEADER_LINES = 8
+CACHE_FORMAT_VERSION = 1
+CACHE_ALIGNMENT = 64
+
+LOCATION_KEYS = ('city', 'state', 'country', 'source', 'wmo', 'latitude', 'longitude', 'timezone', 'elevation')
+
+
+def parse_location(line):
+    """Fields of the LOCATION header record, coordinates as floats"""
+    values = [value.strip() for value in line.rstrip('\r\n').split(',')[1:]]
+    location = dict(zip(LOCATION_KEYS, values))
+    for key in ('latitude', 'longitude', 'timezone', 'elevation'):
+        if key in location:
+            location[key] = float(location[key])
+    return location
+
+
+def parse_hourly(text):
+    """Hourly records (the text after the header) as {field: contiguous typed column}"""
+    first = text.lstrip().partition('\n')[0]
+    field_count = min(first.count(',') + 1, len(EPW_FIELDS))
+    present = [
+        (index, name, dtype) for index, (name, dtype) in enumerate(EPW_FIELDS[:field_count]) if dtype is not None
+    ]
+    dtype = np.dtype([(name, dtype) for _, name, dtype in present])
+    usecols = [index for index, _, _ in present]
+
+    try:
+        parsed = np.loadtxt(io.StringIO(text), delimiter=',', usecols=usecols, dtype=dtype, ndmin=1)
+    except ValueError:
+        # Blank fields somewhere in the file, slower parser that tolerates them: measured
+        # values become NaN, coded ones their missing value, date fields are an error
+        fills = {
+            index: np.nan if np.dtype(column_dtype).kind == 'f' else MISSING_VALUES.get(name, 0)
+            for index, name, column_dtype in present
+        }
+        parsed = np.genfromtxt(
+            io.StringIO(text), delimiter=',', usecols=usecols, dtype=dtype,
+            filling_values=fills, usemask=True, ndmin=1
+        )
+        for name in DATE_FIELDS:
+            # Blank (masked) or unparsable (filled with 0) where 0 is no valid value
+            if parsed.mask[name].any() or (name in ('month', 'day', 'hour') and (parsed.data[name] == 0).any()):
+                raise ValueError(f'Hourly records have blank or malformed {name} fields')
+        parsed = parsed.data
+
+    columns = {}
+    for name, column_dtype in STORED_FIELDS:
+        if name in dtype.names:
+            columns[name] = np.ascontiguousarray(parsed[name])
+        else:
+            columns[name] = np.full(len(parsed), MISSING_VALUES.get(name, 0), dtype=column_dtype)
+    return columns
+
+
+def missing_mask(name, column):
+    """True where a column holds its field's missing value (or NaN, a blank field)"""
+    column = np.asarray(column)
+    missing = np.zeros(column.shape, dtype=bool)
+    if name in MISSING_VALUES:
+        missing |= column == np.asarray(MISSING_VALUES[name]).astype(column.dtype)
+    if column.dtype.kind == 'f':
+        missing |= np.isnan(column)
+    return missing
+
+
+def parse_epw(path):
+    """Parse an EPW file, returns (location, header lines, hourly columns)"""
+    with open(path, encoding='latin-1') as f:
+        header = [f.readline().rstrip('\r\n') for _ in range(HEADER_LINES)]
+        text = f.read()
+
+    if not header[0].upper().startswith('LOCATION'):
+        raise ValueError(f'{path} is not an EPW file: first record is not LOCATION')
+    return parse_location(header[0]), header, parse_hourly(text)
+
+
+def cache_paths(path, cache_dir=None):
+    """(.columns, .json) cache locations for an EPW file"""
+    if cache_dir is None:
+        base = path
+    else:
+        # Files from different directories can share a name
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+        base = os.path.join(cache_dir, f'{os.path.basename(path)}.{digest}')
+    return base + '.columns', base + '.json'
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def write_columns(f, columns):
+    """Write columns back to back at aligned offsets, returns {name: [dtype, offset]}"""
+    layout = {}
+    offset = 0
+    for name, column in columns.items():
+        padding = -offset % CACHE_ALIGNMENT
+        f.write(b'\0' * padding)
+        offset += padding
+        layout[name] = [column.dtype.str, offset]
+        f.write(column.tobytes())
+        offset += column.nbytes
+    return layout
+
+
+def write_cache(path, location, header, columns, cache_dir=None):
+    """Write the parsed columns and metadata, atomically so readers never see half a cache"""
+    columns_path, meta_path = cache_paths(path, cache_dir)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    meta = {
+        'version': CACHE_FORMAT_VERSION,
+        'source': source_signature(path),
+        'location': location,
+        'header': header,
+        'rows': len(next(iter(columns.values()))),
+    }
+
+    def write_meta(f):
+        f.write(json.dumps(meta).encode())
+
+    def write_data(f):
+        meta['columns'] = write_columns(f, columns)
+
+    for target, write in ((columns_path, write_data), (meta_path, write_meta)):
+        temporary = f'{target}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            write(f)
+        os.replace(temporary, target)
+
+
+def load_cache(path, cache_dir=None):
+    """(location, header, memory-mapped columns) from a current cache, or None"""
+    columns_path, meta_path = cache_paths(path, cache_dir)
+    try:
+        with open(meta_path, 'rb') as f:
+            meta = json.loads(f.read())
+        if meta.get('version') != CACHE_FORMAT_VERSION or meta.get('source') != source_signature(path):
+            return None
+        data = np.memmap(columns_path, dtype=np.uint8, mode='r')
+
+        rows = meta['rows']
+        columns = {
+            name: np.frombuffer(data, dtype=np.dtype(dtype), count=rows, offset=offset)
+            for name, (dtype, offset) in meta['columns'].items()
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    return meta['location'], meta['header'], columns
+
+
+class EPWData:
+    """Location metadata plus the hourly columns of one EPW file"""
+
+    def __init__(self, location, header, columns):
+        self.location = location
+        self.header = header
+        self.columns = columns
+
+    def __getitem__(self, name):
+        """One hourly column, read-only and memory-mapped when loaded from the cache"""
+        return self.columns[name]
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    @property
+    def fields(self):
+        return tuple(self.columns)
+
+
+def read_epw(path, cache=True, cache_dir=None):
+    """Read an EPW file, from its binary cache when one is current"""
+    if cache:
+        cached = load_cache(path, cache_dir)
+        if cached is not None:
+            return EPWData(*cached)
+
+    location, header, columns = parse_epw(path)
+    if cache:
+        try:
+            write_cache(path, location, header, columns, cache_dir)
+        except OSError:
+            pass  # read-only weather directory, the parse result is still good
+    return EPWData(location, header, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse an EPW file and build its binary cache')
+    parser.add_argument('path')
+    parser.add_argument('--cache-dir', help='Write caches here instead of next to the EPW file')
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    epw = read_epw(args.path, cache=not args.no_cache, cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - start
+
+    location = epw.location
+    print(f"{location.get('city')}, {location.get('country')} "
+          f"({location.get('latitude')}, {location.get('longitude')}): {len(epw)} hours in {elapsed * 1000:.1f} ms")
+    temperature = epw['dry_bulb_temperature']
+    print(f'dry bulb {temperature.min():.1f} to {temperature.max():.1f} C, mean {temperature.mean():.1f} C')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+# Low-overhead latency histograms
+# File: latency_metrics.py
+#
+# Fixed-bucket histograms cheap enough for the hot path: an observation is one
+# perf_counter_ns call, a bisect over the bucket bounds and two increments in a counts
+# list owned by the calling thread, so no lock is taken. Readers sum the per-thread
+# lists, which under the GIL only ever see whole increments. The lists of threads that
+# have finished are folded into one retired list whenever a new thread starts
+# observing, so thread churn does not grow a series.
+#
+# Metrics are process-wide, like prometheus_client's default registry, and are
+# rendered in the Prometheus text format for the /metrics endpoint. Worker processes
+# can drain() their observations and have a parent merge() them. When
+# prometheus_client is installed, PrometheusCollector exposes the same histograms
+# through its registry (see ApplicationMonitoring in 8.4 Monitoring & Analytics.py).
+
+import threading
+import weakref
+from bisect import bisect_left
+from threading import get_ident
+from time import perf_counter_ns
+
+# Upper bounds in seconds, from microsecond-scale stages up to slow batch requests
+DEFAULT_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3,
+    5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class LatencySeries:
+    """One labelled series of a histogram, sharded per thread"""
+    __slots__ = ('_bounds_ns', '_lock', '_shards', '_threads')
+
+    def __init__(self, bounds_ns, lock):
+        self._bounds_ns = bounds_ns
+        self._lock = lock
+        # thread id -> [bucket counts..., +Inf count, sum_ns], written only by that thread;
+        # None holds the counts of finished threads
+        self._shards = {}
+        # thread id -> weakref to the thread, to find the shards of finished threads
+        self._threads = {}
+
+    def observe_ns(self, elapsed_ns):
+        shard = self._shards.get(get_ident())
+        if shard is None:
+            shard = self._new_shard()
+        shard[bisect_left(self._bounds_ns, elapsed_ns)] += 1
+        shard[-1] += elapsed_ns
+
+    def _new_shard(self):
+        thread = threading.current_thread()
+        with self._lock:
+            self._prune()
+            shard = self._shards[get_ident()] = [0] * (len(self._bounds_ns) + 2)
+            self._threads[get_ident()] = weakref.ref(thread)
+        return shard
+
+    def _prune(self):
+        """Fold the shards of finished threads into the retired shard, under the lock"""
+        for ident, ref in list(self._threads.items()):
+            thread = ref()
+            if thread is None or not thread.is_alive():
+                del self._threads[ident]
+                shard = self._shards.pop(ident)
+                retired = self._shards.setdefault(None, [0] * len(shard))
+                for index, count in enumerate(shard):
+                    retired[index] += count
+
+    def totals(self):
+        """(bucket counts including +Inf, sum_ns) over every thread"""
+        with self._lock:
+            shards = list(self._shards.values())
+        totals = [sum(column) for column in zip(*shards)] if shards else [0] * (len(self._bounds_ns) + 2)
+        return totals[:-1], totals[-1]
+
+    def reset(self):
+        """Zero every shard; increments racing with the reset may be lost"""
+        with self._lock:
+            for shard in self._shards.values():
+                shard[:] = [0] * len(shard)
+
+    def add(self, counts, sum_ns):
+        shard = self._shards.get(get_ident()) or self._new_shard()
+        for index, count in enumerate(counts):
+            shard[index] += count
+        shard[-1] += sum_ns
+
+
+class LatencyHistogram:
+    def __init__(self, name, documentation, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._bounds_ns = [round(bound * 1e9) for bound in self.buckets]
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def labels(self, *values):
+        """Series for a label combination; bind it once and reuse it on hot paths"""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f'{self.name} expects labels {self.label_names}, got {values}')
+            with self._lock:
+                series = self._series.setdefault(values, LatencySeries(self._bounds_ns, self._lock))
+        return series
+
+    def observe_ns(self, values, elapsed_ns):
+        self.labels(*values).observe_ns(elapsed_ns)
+
+    def snapshot(self):
+        """{labels: (cumulative bucket counts, count, sum in seconds)}"""
+        with self._lock:
+            series = list(self._series.items())
+
+        result = {}
+        for values, single in series:
+            counts, sum_ns = single.totals()
+            cumulative = []
+            total = 0
+            for count in counts:
+                total += count
+                cumulative.append(total)
+            result[values] = (cumulative, total, sum_ns / 1e9)
+        return result
+
+    def clear(self):
+        """Reset every series in place, bound series (StageTimer) stay valid"""
+        with self._lock:
+            series = list(self._series.values())
+        for single in series:
+            single.reset()
+
+    def drain(self):
+        """Observations since the last drain as {labels: (bucket counts, sum_ns)}, resetting them
+
+        Meant for single-threaded worker processes, see asgi.py.
+        """
+        with self._lock:
+            series = list(self._series.items())
+
+        drained = {}
+        for values, single in series:
+            counts, sum_ns = single.totals()
+            if any(counts):
+                drained[values] = (counts, sum_ns)
+                single.reset()
+        return drained
+
+    def merge(self, drained):
+        """Add observations drained from another process's histogram"""
+        for values, (counts, sum_ns) in drained.items():
+            self.labels(*values).add(counts, sum_ns)
+
+    def expose(self):
+        """Prometheus text exposition lines"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for values, (cumulative, count, total) in sorted(self.snapshot().items()):
+            labels = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, values))
+            separator = ',' if labels else ''
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), cumulative):
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="{le}"}} {bucket_count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total!r}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms = []
+
+    def histogram(self, name, documentation, label_names, buckets=DEFAULT_BUCKETS):
+        histogram = LatencyHistogram(name, documentation, label_names, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def render(self):
+        """Every histogram in the Prometheus text format"""
+        return '\n'.join(line for histogram in self.histograms for line in histogram.expose()) + '\n'
+
+    def clear(self):
+        for histogram in self.histograms:
+            histogram.clear()
+
+    def drain(self):
+        """Observations since the last drain, for shipping from a worker process"""
+        return {histogram.name: histogram.drain() for histogram in self.histograms}
+
+    def merge(self, drained):
+        """Fold a worker's drained observations into this registry"""
+        for histogram in self.histograms:
+            histogram.merge(drained.get(histogram.name, {}))
+
+
+class StageTimer:
+    """Lap timer for the stages of one operation
+
+        started = timer.start()
+        ...
+        started = timer.lap('climate_analysis', started)
+
+    Each lap costs one perf_counter_ns call and one observation.
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self._series = {}
+
+    def start(self):
+        return perf_counter_ns()
+
+    def lap(self, stage, started):
+        now = perf_counter_ns()
+        series = self._series.get(stage)
+        if series is None:
+            series = self._series[stage] = self.histogram.labels(stage)
+        series.observe_ns(now - started)
+        return now
+
+
+class NullStageTimer:
+    """StageTimer stand-in when instrumentation is switched off"""
+
+    def start(self):
+        return 0
+
+    def lap(self, stage, started):
+        return 0
+
+
+NULL_STAGE_TIMER = NullStageTimer()
+
+
+class PrometheusCollector:
+    """prometheus_client custom collector exposing a MetricsRegistry"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        from prometheus_client.core import HistogramMetricFamily
+
+        for histogram in self.registry.histograms:
+            family = HistogramMetricFamily(histogram.name, histogram.documentation, labels=histogram.label_names)
+            for values, (cumulative, _, total) in histogram.snapshot().items():
+                bounds = [repr(float(bound)) for bound in histogram.buckets] + ['+Inf']
+                family.add_metric(list(values), list(zip(bounds, cumulative)), total)
+            yield family
+
+
+# Process-wide metrics served on /metrics
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    'building_optimization_stage_seconds',
+    'Time spent in each stage of building design optimization',
+    ('stage',)
+)
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Time from request start until the response is returned to the server (first byte for streams)',
+    ('endpoint', 'method', 'status')
+)
@@ -0,0 +1,292 @@
+# Incremental EnergyPlus model assembly with shared material and construction libraries
+# File: model_builder.py
+#
+# A parameter sweep builds thousands of model dicts (the create_building_model layout:
+# Building, Zone, BuildingSurface:Detailed, Window, Material, Construction) that mostly
+# differ in one or two parameters. ModelBuilder avoids rebuilding what did not change:
+#   - materials and constructions are interned in a MaterialLibrary: every variant with
+#     the same envelope refers to the same dicts, built once per sweep
+#   - derive(parent, changes) copies the parent's section references and rebuilds only
+#     the sections that depend on a changed parameter (SECTION_PARAMETERS); the rest are
+#     shared with the parent, and the new model records which sections are dirty
+# An orientation change touches only Building, a window-to-wall ratio change only Window.
+# Sections are shared between models and must be treated as read-only.
+#   python benchmarks/bench_model_builder.py
+
+import itertools
+
+from rc_simulator import DEFAULT_DESIGN, STOREY_HEIGHT
+
+# Parameters each section is built from
+ENVELOPE_PARAMETERS = ('wall_u', 'roof_u', 'floor_u', 'window_u', 'window_g', 'thermal_mass')
+SECTION_PARAMETERS = {
+    'Building': ('orientation',),
+    'Zone': ('length', 'width', 'height'),
+    'Material': ENVELOPE_PARAMETERS,
+    'Construction': ENVELOPE_PARAMETERS,
+    'BuildingSurface:Detailed': ('length', 'width', 'height', 'wall_u', 'roof_u', 'floor_u', 'thermal_mass'),
+    'Window': ('length', 'width', 'height', 'window_wall_ratio', 'window_u', 'window_g'),
+}
+SECTIONS = tuple(SECTION_PARAMETERS)
+MODEL_PARAMETERS = ('length', 'width', 'height', 'orientation', 'window_wall_ratio') + ENVELOPE_PARAMETERS
+
+# Shorter names used by ParametricBuildingGenerator
+PARAMETER_ALIASES = {'wwr': 'window_wall_ratio'}
+
+# Inner (massive) layer of each thermal mass class: name, thickness m, conductivity W/(m K),
+# density kg/m3, specific heat J/(kg K)
+MASS_LAYERS = {
+    'very_light': ('Gypsum board', 0.025, 0.25, 900.0, 1000.0),
+    'light': ('Lightweight block', 0.1, 0.2, 600.0, 1000.0),
+    'medium': ('Concrete block', 0.15, 0.5, 1400.0, 1000.0),
+    'heavy': ('Concrete', 0.2, 1.13, 2000.0, 1000.0),
+    'very_heavy': ('Concrete', 0.3, 1.13, 2300.0, 1000.0),
+}
+MASS_LAYERS['low'] = MASS_LAYERS['light']
+MASS_LAYERS['high'] = MASS_LAYERS['heavy']
+
+INSULATION = ('Insulation', 0.035, 30.0, 840.0)  # name, conductivity, density, specific heat
+# Inside and outside surface resistances in m2 K/W, ISO 6946
+SURFACE_RESISTANCES = {'wall': (0.13, 0.04), 'roof': (0.10, 0.04), 'floor': (0.17, 0.04)}
+
+# Windows are one band per wall, this share of the wall's width, centred vertically
+WINDOW_WIDTH_SHARE = 0.9
+ZONE_NAME = 'ThermalZone1'
+
+
+def model_parameters(params):
+    """Parameters with aliases resolved and DEFAULT_DESIGN filling in the model's inputs"""
+    resolved = {PARAMETER_ALIASES.get(name, name): value for name, value in params.items()}
+    for name in MODEL_PARAMETERS:
+        resolved.setdefault(name, DEFAULT_DESIGN[name])
+    return resolved
+
+
+def wall_corners(length, width, height):
+    """(name, four vertices) of each exterior wall, upper left corner first, counterclockwise from outside"""
+    x, y, z = float(length), float(width), float(height)
+    return (
+        ('Wall_South', ((0.0, 0.0, z), (0.0, 0.0, 0.0), (x, 0.0, 0.0), (x, 0.0, z))),
+        ('Wall_East', ((x, 0.0, z), (x, 0.0, 0.0), (x, y, 0.0), (x, y, z))),
+        ('Wall_North', ((x, y, z), (x, y, 0.0), (0.0, y, 0.0), (0.0, y, z))),
+        ('Wall_West', ((0.0, y, z), (0.0, y, 0.0), (0.0, 0.0, 0.0), (0.0, 0.0, z))),
+    )
+
+
+class MaterialLibrary:
+    def __init__(self):
+        # {content key: shared dict}
+        self.materials = {}
+        self.constructions = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def intern(self, table, item):
+        """The library's copy of an item, storing it on first sight"""
+        key = tuple(sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in item.items()))
+        shared = table.get(key)
+        if shared is None:
+            shared = table[key] = item
+            self.stats['misses'] += 1
+        else:
+            self.stats['hits'] += 1
+        return shared
+
+    def material(self, name, thickness, conductivity, density, specific_heat):
+        return self.intern(self.materials, {
+            'Name': f'{name} {thickness * 1000:.0f}mm',
+            'Roughness': 'MediumRough',
+            'Thickness': thickness,
+            'Conductivity': conductivity,
+            'Density': density,
+            'Specific_Heat': specific_heat,
+        })
+
+    def glazing(self, u_factor, g_value):
+        return self.intern(self.materials, {
+            'Name': f'Glazing U{u_factor:.2f} g{g_value:.2f}',
+            'Type': 'SimpleGlazingSystem',
+            'UFactor': u_factor,
+            'Solar_Heat_Gain_Coefficient': g_value,
+        })
+
+    def construction(self, name, layers):
+        """Construction of material dicts, outside layer first"""
+        return self.intern(self.constructions, {'Name': name, 'Layers': [layer['Name'] for layer in layers]})
+
+    def opaque(self, role, u_value, thermal_mass):
+        """(construction, materials) of an exterior wall, roof or floor meeting a U-value
+
+        Insulation is sized to the mm for the U-value left after the mass layer and the
+        surface resistances, so nearby U-values often share one construction.
+        """
+        try:
+            name, thickness, conductivity, density, specific_heat = MASS_LAYERS[thermal_mass]
+        except KeyError:
+            raise ValueError(f'Unknown thermal mass class: {thermal_mass!r}') from None
+        mass = self.material(name, thickness, conductivity, density, specific_heat)
+        inside, outside = SURFACE_RESISTANCES[role]
+        resistance = 1 / u_value - inside - outside - thickness / conductivity
+        insulation_thickness = round(INSULATION[1] * resistance, 3)
+        layers = [mass]
+        if insulation_thickness > 0:
+            layers.insert(0, self.material(INSULATION[0], insulation_thickness, *INSULATION[1:]))
+        construction = self.construction(f'Exterior {role} U{u_value:.2f} {thermal_mass}', layers)
+        return construction, layers
+
+    def metrics(self):
+        return dict(self.stats, materials=len(self.materials), constructions=len(self.constructions))
+
+
+class BuildingModel:
+    """One model: its parameters, its sections and the sections rebuilt for it"""
+
+    __slots__ = ('params', 'sections', 'construction_names', 'dirty')
+
+    def __init__(self, params, sections, construction_names, dirty):
+        self.params = params
+        self.sections = sections
+        self.construction_names = construction_names
+        self.dirty = dirty
+
+    def to_dict(self):
+        """The create_building_model layout, sections shared rather than copied"""
+        return dict(self.sections)
+
+
+class ModelBuilder:
+    def __init__(self, library=None):
+        self.library = library or MaterialLibrary()
+        self.stats = {'models': 0, 'sections_built': 0, 'sections_shared': 0}
+
+    def build(self, params):
+        """A model built from scratch, every section dirty"""
+        return self.assemble(model_parameters(params), {}, None, frozenset(SECTIONS))
+
+    def derive(self, parent, changes):
+        """A variant of parent with some parameters changed, rebuilding only the dependent sections"""
+        params = dict(parent.params)
+        changed = set()
+        for name, value in changes.items():
+            name = PARAMETER_ALIASES.get(name, name)
+            if params.get(name) != value:
+                changed.add(name)
+                params[name] = value
+        dirty = frozenset(section for section in SECTIONS if changed.intersection(SECTION_PARAMETERS[section]))
+        return self.assemble(params, parent.sections, parent.construction_names, dirty)
+
+    def assemble(self, params, sections, construction_names, dirty):
+        sections = dict(sections)
+        if 'Material' in dirty or 'Construction' in dirty:
+            sections['Material'], sections['Construction'], construction_names = self.envelope(params)
+        if 'Building' in dirty:
+            sections['Building'] = {
+                'Name': 'OptimizedBuilding',
+                # orientation is the azimuth of the south wall's outward normal, like rc_simulator
+                'North_Axis': (float(params['orientation']) - 180.0) % 360.0,
+                'Terrain': 'Urban',
+                'Solar_Distribution': 'FullExteriorWithReflections'
+            }
+        if 'Zone' in dirty:
+            length, width, height = (float(params[name]) for name in ('length', 'width', 'height'))
+            sections['Zone'] = {
+                'Name': ZONE_NAME,
+                'Volume': length * width * height,
+                'Floor_Area': length * width * max(1.0, round(height / STOREY_HEIGHT))
+            }
+        if 'BuildingSurface:Detailed' in dirty:
+            sections['BuildingSurface:Detailed'] = self.surfaces(params, construction_names)
+        if 'Window' in dirty:
+            sections['Window'] = self.windows(params, construction_names)
+
+        self.stats['models'] += 1
+        self.stats['sections_built'] += len(dirty)
+        self.stats['sections_shared'] += len(SECTIONS) - len(dirty)
+        return BuildingModel(params, sections, construction_names, dirty)
+
+    def envelope(self, params):
+        """(materials, constructions, {role: construction name}) from the library"""
+        mass = params['thermal_mass']
+        materials = []
+        constructions = []
+        names = {}
+        for role in ('wall', 'roof', 'floor'):
+            construction, layers = self.library.opaque(role, float(params[f'{role}_u']), mass)
+            names[role] = construction['Name']
+            constructions.append(construction)
+            materials.extend(layer for layer in layers if all(layer is not known for known in materials))
+        glazing = self.library.glazing(float(params['window_u']), float(params['window_g']))
+        window = self.library.construction(f'Window U{glazing["UFactor"]:.2f} g{glazing["Solar_Heat_Gain_Coefficient"]:.2f}', [glazing])
+        names['window'] = window['Name']
+        return materials + [glazing], constructions + [window], names
+
+    def surfaces(self, params, construction_names):
+        length, width, height = (float(params[name]) for name in ('length', 'width', 'height'))
+        surfaces = [
+            self.surface(name, 'Wall', construction_names['wall'], 'Outdoors', vertices)
+            for name, vertices in wall_corners(length, width, height)
+        ]
+        surfaces.append(self.surface('Roof', 'Roof', construction_names['roof'], 'Outdoors', (
+            (length, width, height), (0.0, width, height), (0.0, 0.0, height), (length, 0.0, height))))
+        surfaces.append(self.surface('Floor', 'Floor', construction_names['floor'], 'Ground', (
+            (0.0, 0.0, 0.0), (0.0, width, 0.0), (length, width, 0.0), (length, 0.0, 0.0))))
+        return surfaces
+
+    @staticmethod
+    def surface(name, surface_type, construction, boundary, vertices):
+        return {
+            'Name': name,
+            'Surface_Type': surface_type,
+            'Construction_Name': construction,
+            'Zone_Name': ZONE_NAME,
+            'Outside_Boundary_Condition': boundary,
+            'Vertices': [list(vertex) for vertex in vertices]
+        }
+
+    def windows(self, params, construction_names):
+        """One centred band per wall with the window-to-wall ratio's share of its area"""
+        length, width, height = (float(params[name]) for name in ('length', 'width', 'height'))
+        wwr = float(params['window_wall_ratio'])
+        windows = []
+        if wwr <= 0:
+            return windows
+        band = min(height, wwr * height / WINDOW_WIDTH_SHARE)
+        sill = (height - band) / 2
+        for name, ((x0, y0, _), _, (x1, y1, _), _) in wall_corners(length, width, height):
+            inset = (1 - WINDOW_WIDTH_SHARE) / 2
+            left = (x0 + (x1 - x0) * inset, y0 + (y1 - y0) * inset)
+            right = (x1 - (x1 - x0) * inset, y1 - (y1 - y0) * inset)
+            windows.append({
+                'Name': f'Window_{name[5:]}',
+                'Surface_Type': 'Window',
+                'Construction_Name': construction_names['window'],
+                'Building_Surface_Name': name,
+                'Vertices': [
+                    [round(left[0], 4), round(left[1], 4), round(sill + band, 4)],
+                    [round(left[0], 4), round(left[1], 4), round(sill, 4)],
+                    [round(right[0], 4), round(right[1], 4), round(sill, 4)],
+                    [round(right[0], 4), round(right[1], 4), round(sill + band, 4)],
+                ]
+            })
+        return windows
+
+    def sweep(self, grid, base=None):
+        """Models of every combination of grid values ({parameter: values}), last parameter varying fastest
+
+        Each model is derived from the previous one, so only the parameters that changed
+        between neighbouring combinations are applied.
+        """
+        names = list(grid)
+        model = None
+        previous = None
+        for values in itertools.product(*(grid[name] for name in names)):
+            if model is None:
+                model = self.build(dict(base or {}, **dict(zip(names, values))))
+            else:
+                model = self.derive(model, {
+                    name: value for name, value, old in zip(names, values, previous) if value != old
+                })
+            previous = values
+            yield model
+
+    def metrics(self):
+        return dict(self.stats, library=self.library.metrics())
@@ -0,0 +1,395 @@
+# Reduced-order hourly thermal simulator (ISO 13790 5R1C), vectorized over designs
+# File: rc_simulator.py
+#
+# Each design is one thermal zone: the rectangular box of ParametricBuildingGenerator
+# (length, width, height, orientation, window-to-wall ratio) with envelope U-values, a
+# thermal mass class, ventilation and internal gains. The zone is the ISO 13790 simple
+# hourly network of five resistances and one capacitance (air, surface and mass nodes),
+# with ideal heating and cooling holding the air temperature between set points.
+#
+# Every node temperature of the network is a linear function of the previous mass
+# temperature, the outdoor temperature, the internal and solar gains and the heating/
+# cooling power. Those linear coefficients are computed once per design by evaluating
+# the standard's equations on unit inputs, and the weather-driven terms are precomputed
+# a block of hours at a time (solar gains of all designs are one matrix product per
+# block). What remains per hour is a dozen vector operations across all designs in the
+# batch, so a year of 10,000 designs takes seconds instead of 10,000 EnergyPlus runs.
+#   python rc_simulator.py weather.epw --designs 10000
+
+import argparse
+import time
+
+import numpy as np
+
+from epw_reader import read_epw
+from solar_engine import solar_position
+
+# ISO 13790 constants
+H_IS = 3.45  # W/(m2 K), air to surface node
+H_MS = 9.1  # W/(m2 K), surface to mass node
+AREA_RATIO = 4.5  # area of all surfaces facing the zone per m2 of floor
+AIR_HEAT_CAPACITY = 1200.0  # J/(m3 K)
+
+# Table 12 of ISO 13790: internal heat capacity in J/(m2 K) and effective mass area per m2 of floor
+MASS_CLASSES = {
+    'very_light': (80000.0, 2.5),
+    'light': (110000.0, 2.5),
+    'medium': (165000.0, 2.5),
+    'heavy': (260000.0, 3.0),
+    'very_heavy': (370000.0, 3.5),
+}
+# Names used by BuildingDesignService.building_standards
+MASS_CLASSES['low'] = MASS_CLASSES['light']
+MASS_CLASSES['high'] = MASS_CLASSES['heavy']
+
+STOREY_HEIGHT = 3.0  # m, for the floor area of multi-storey boxes
+FRAME_FACTOR = 0.8  # glazed share of a window opening
+GROUND_FACTOR = 0.5  # temperature reduction factor of the ground floor's heat loss
+
+# Facade irradiance is tabulated for this many vertical orientations and interpolated per design
+FACADE_BINS = 72
+WARMUP_HOURS = 168
+BLOCK_HOURS = 168
+
+DEFAULT_DESIGN = {
+    'length': 30.0,
+    'width': 20.0,
+    'height': 9.0,
+    'orientation': 180.0,  # azimuth of the first long facade, clockwise from north
+    'window_wall_ratio': 0.3,
+    'wall_u': 0.35,  # W/(m2 K)
+    'roof_u': 0.25,
+    'floor_u': 0.3,
+    'window_u': 1.4,
+    'window_g': 0.6,  # total solar energy transmittance
+    'shading_factor': 1.0,  # share of solar gain left by shading, 1 = unshaded
+    'thermal_mass': 'medium',
+    'air_changes': 0.5,  # per hour, infiltration and ventilation together
+    'internal_gains': 5.0,  # W/m2 of floor while the gain schedule is 1
+    'heating_setpoint': 20.0,
+    'cooling_setpoint': 26.0,
+    'max_heating': np.inf,  # W, ideal plant by default
+    'max_cooling': np.inf,
+}
+
+
+def design_columns(designs):
+    """Design parameters as float64 columns of one length, filled in from DEFAULT_DESIGN
+
+    designs is a dict of per-design arrays or scalars, or a list of design dicts.
+    thermal_mass may be a MASS_CLASSES name or a heat capacity in J/(m2 K).
+    """
+    if not isinstance(designs, dict):
+        designs = {name: [design.get(name, default) for design in designs] for name, default in DEFAULT_DESIGN.items()}
+    columns = dict(DEFAULT_DESIGN, **designs)
+
+    mass = columns.pop('thermal_mass')
+    if isinstance(mass, str) or (np.ndim(mass) and np.asarray(mass).dtype.kind in 'US'):
+        names = np.atleast_1d(mass)
+        unknown = set(names.tolist()) - set(MASS_CLASSES)
+        if unknown:
+            raise ValueError(f'Unknown thermal mass class(es): {sorted(unknown)}')
+        columns['heat_capacity'] = np.array([MASS_CLASSES[name][0] for name in names.tolist()])
+        columns['mass_area_factor'] = np.array([MASS_CLASSES[name][1] for name in names.tolist()])
+    else:
+        columns['heat_capacity'] = mass
+        # Interpolated between the classes' effective mass areas
+        capacities, factors = zip(*sorted(set(MASS_CLASSES.values())))
+        columns['mass_area_factor'] = np.interp(mass, capacities, factors)
+
+    arrays = {name: np.asarray(value, dtype=np.float64) for name, value in columns.items()}
+    count = max(value.size for value in arrays.values())
+    return {name: np.broadcast_to(value.ravel() if value.size > 1 else value, (count,)) for name, value in arrays.items()}
+
+
+def facade_orientation_table(ghi, dni, dhi, zenith, azimuth, bins=FACADE_BINS, albedo=0.2):
+    """(bins x hours) irradiance in W/m2 on vertical planes facing bins evenly spaced azimuths
+
+    Beam on the plane plus isotropic sky diffuse and ground reflection, each vertical
+    plane seeing half the sky and half the ground.
+    """
+    plane = np.radians(np.arange(bins) * (360.0 / bins))
+    sun_azimuth = np.radians(azimuth)
+    sin_zenith = np.sin(np.radians(np.minimum(zenith, 90.0)))
+    horizontal = np.stack((sin_zenith * np.cos(sun_azimuth), sin_zenith * np.sin(sun_azimuth)))
+    cos_incidence = np.column_stack((np.cos(plane), np.sin(plane))) @ horizontal
+    beam = np.asarray(dni, dtype=np.float64) * np.maximum(cos_incidence, 0) * (np.asarray(zenith) < 90)
+    return beam + 0.5 * np.asarray(dhi, dtype=np.float64) + 0.5 * albedo * np.asarray(ghi, dtype=np.float64)
+
+
+def epw_times(columns, timezone=0.0):
+    """UTC timestamps at the middle of each EPW hour (EPW hours end at the stated local hour)"""
+    months = np.asarray(columns['month'], dtype=np.int64)
+    days = np.asarray(columns['day'], dtype=np.int64)
+    hours = np.asarray(columns['hour'], dtype=np.int64)
+    year = 2020 if np.any((months == 2) & (days == 29)) else 2023
+    month_starts = np.array([np.datetime64(f'{year}-{month:02d}-01', 'm') for month in range(1, 13)])
+    local = month_starts[months - 1] + ((days - 1) * 24 + hours - 1) * 60 + 30
+    return local - np.timedelta64(int(round(timezone * 60)), 'm')
+
+
+def weather_from_epw(path, bins=FACADE_BINS, albedo=0.2, cache_dir=None):
+    """Hourly outdoor temperature and facade irradiance table for simulate()"""
+    epw = read_epw(path, cache_dir=cache_dir)
+    columns, location = epw.columns, epw.location
+    times = epw_times(columns, location.get('timezone', 0.0))
+    position = solar_position([location['latitude']], [location['longitude']], times, location.get('elevation', 0.0))
+    return {
+        'temperature': np.asarray(columns['dry_bulb_temperature'], dtype=np.float64),
+        'facade_irradiance': facade_orientation_table(
+            columns['global_horizontal_radiation'], columns['direct_normal_radiation'],
+            columns['diffuse_horizontal_radiation'], position['zenith'][0], position['azimuth'][0], bins, albedo
+        ),
+    }
+
+
+def envelope(columns):
+    """Geometry, conductances and capacity of each design's zone (ISO 13790 section 12 and Annex C)"""
+    length, width, height = columns['length'], columns['width'], columns['height']
+    wwr = columns['window_wall_ratio']
+    footprint = length * width
+    floor_area = footprint * np.maximum(1.0, np.round(height / STOREY_HEIGHT))
+    long_facade = length * height
+    short_facade = width * height
+    window_area = 2 * (long_facade + short_facade) * wwr
+
+    h_window = columns['window_u'] * window_area
+    h_opaque = (columns['wall_u'] * 2 * (long_facade + short_facade) * (1 - wwr)
+                + columns['roof_u'] * footprint + GROUND_FACTOR * columns['floor_u'] * footprint)
+    total_area = AREA_RATIO * floor_area
+    mass_area = columns['mass_area_factor'] * floor_area
+    h_ms = H_MS * mass_area
+    return {
+        'floor_area': floor_area,
+        'window_area': window_area,
+        'h_ve': AIR_HEAT_CAPACITY / 3600 * columns['air_changes'] * length * width * height,
+        'h_tr_w': h_window,
+        # The opaque conductance is split at the mass node: 1/H_op = 1/H_em + 1/H_ms
+        'h_tr_em': 1 / (1 / h_opaque - 1 / np.maximum(h_ms, h_opaque * 1.0001)),
+        'h_tr_is': H_IS * total_area,
+        'h_tr_ms': h_ms,
+        'c_m': columns['heat_capacity'] * floor_area,
+        'mass_share': mass_area / total_area,
+        'surface_share': 1 - mass_area / total_area - h_window / (H_MS * total_area),
+    }
+
+
+def network_step(zone, theta_m_prev, theta_e, phi_int, phi_sol, phi_hc):
+    """One hour of the 5R1C network, ISO 13790 equations C.1 to C.11
+
+    Returns (mass temperature at the end of the hour, air temperature, surface temperature).
+    Supply air is outdoor air; phi_hc is the heating (+) or cooling (-) power at the air node.
+    """
+    h_ve, h_tr_is, h_tr_ms, h_tr_w, h_tr_em = zone['h_ve'], zone['h_tr_is'], zone['h_tr_ms'], zone['h_tr_w'], zone['h_tr_em']
+    h_tr_1 = 1 / (1 / h_ve + 1 / h_tr_is)
+    h_tr_2 = h_tr_1 + h_tr_w
+    h_tr_3 = 1 / (1 / h_tr_2 + 1 / h_tr_ms)
+
+    phi_ia = 0.5 * phi_int + phi_hc
+    phi_st = zone['surface_share'] * (0.5 * phi_int + phi_sol)
+    phi_m = zone['mass_share'] * (0.5 * phi_int + phi_sol)
+
+    supply = phi_st + h_tr_w * theta_e + h_tr_1 * (theta_e + phi_ia / h_ve)
+    phi_m_tot = phi_m + h_tr_em * theta_e + h_tr_3 * supply / h_tr_2
+    capacity = zone['c_m'] / 3600
+    theta_m_t = (theta_m_prev * (capacity - 0.5 * (h_tr_3 + h_tr_em)) + phi_m_tot) / (capacity + 0.5 * (h_tr_3 + h_tr_em))
+    theta_m = 0.5 * (theta_m_t + theta_m_prev)
+    theta_s = (h_tr_ms * theta_m + supply) / (h_tr_ms + h_tr_w + h_tr_1)
+    theta_air = (h_tr_is * theta_s + h_ve * theta_e + phi_ia) / (h_tr_is + h_ve)
+    return theta_m_t, theta_air, theta_s
+
+
+def network_coefficients(zone):
+    """Per-design coefficients of network_step's outputs in each of its five inputs
+
+    network_step is linear with no constant term, so evaluating it on unit inputs gives
+    {input: (d theta_m_t, d theta_air, d theta_s)} for the inputs
+    'mass', 'outdoor', 'internal', 'solar' and 'plant'.
+    """
+    zero = np.zeros_like(zone['c_m'])
+    one = np.ones_like(zero)
+    inputs = ('mass', 'outdoor', 'internal', 'solar', 'plant')
+    coefficients = {}
+    for index, name in enumerate(inputs):
+        unit = [one if position == index else zero for position in range(len(inputs))]
+        coefficients[name] = network_step(zone, *unit)
+    return coefficients
+
+
+def aperture_matrix(columns, window_area, bins=FACADE_BINS):
+    """(designs x bins) effective solar aperture in m2, each facade split between its two nearest bins"""
+    count = len(window_area)
+    height, wwr = columns['height'], columns['window_wall_ratio']
+    transmitted = columns['window_g'] * FRAME_FACTOR * columns['shading_factor'] * wwr * height
+    aperture = np.zeros(count * bins)
+    rows = np.arange(count) * bins
+    for offset, side in ((0, 'length'), (90, 'width'), (180, 'length'), (270, 'width')):
+        position = ((columns['orientation'] + offset) % 360) / (360.0 / bins)
+        lower = np.floor(position)
+        upper_weight = position - lower
+        area = transmitted * columns[side]
+        lower = lower.astype(np.intp) % bins
+        aperture += np.bincount(rows + lower, weights=area * (1 - upper_weight), minlength=count * bins)
+        aperture += np.bincount(rows + (lower + 1) % bins, weights=area * upper_weight, minlength=count * bins)
+    return aperture.reshape(count, bins)
+
+
+def simulate(designs, weather, gain_schedule=None, hourly=False, warmup_hours=WARMUP_HOURS,
+             block_hours=BLOCK_HOURS):
+    """Annual ideal heating and cooling of every design, all stepped together
+
+    weather is {'temperature': (hours,), 'facade_irradiance': (bins, hours)} as returned
+    by weather_from_epw. gain_schedule scales internal gains hour by hour (default 1).
+    The year is preceded by warmup_hours taken from its end, so the mass starts in
+    equilibrium. Returns per-design arrays: heating and cooling energy in kWh (both
+    positive), peak heating and cooling loads in W, and floor area with energy per m2.
+    With hourly=True also 'heating_load', 'cooling_load' and 'air_temperature' as
+    (hours x designs) float32 arrays.
+    """
+    columns = design_columns(designs)
+    zone = envelope(columns)
+    coefficients = network_coefficients(zone)
+    temperature = np.asarray(weather['temperature'], dtype=np.float64)
+    irradiance = np.asarray(weather['facade_irradiance'], dtype=np.float64)
+    hours = len(temperature)
+    schedule = np.ones(hours) if gain_schedule is None else np.asarray(gain_schedule, dtype=np.float64)
+    count = len(zone['floor_area'])
+
+    # Hourly inputs (facade irradiance bins, outdoor temperature, gain schedule) and the
+    # weights turning them into the weather-driven part of the mass and air temperatures:
+    # one matrix product per block of hours gives both, (hours x [mass designs, air designs])
+    inputs = np.vstack((irradiance, temperature, schedule)).T
+    aperture = aperture_matrix(columns, zone['window_area'], irradiance.shape[0])
+    internal = columns['internal_gains'] * zone['floor_area']
+    weights = np.hstack([
+        np.vstack((aperture.T * coefficients['solar'][node], coefficients['outdoor'][node],
+                   internal * coefficients['internal'][node]))
+        for node in (0, 1)
+    ])
+
+    mass_prev, air_prev = coefficients['mass'][:2]
+    mass_plant, air_plant = coefficients['plant'][:2]
+    # Power that moves the air temperature by 1 K, the ideal controller's gain
+    plant_gain = 1 / air_plant
+    heating_setpoint, cooling_setpoint = columns['heating_setpoint'], columns['cooling_setpoint']
+    max_heating, max_cooling = columns['max_heating'], columns['max_cooling']
+    limited = np.isfinite(max_heating).any() or np.isfinite(max_cooling).any()
+
+    theta_m = np.array(heating_setpoint, dtype=np.float64)
+    heating_total = np.zeros(count)
+    cooling_total = np.zeros(count)
+    peak_heating = np.zeros(count)
+    peak_cooling = np.zeros(count)
+    if hourly:
+        hourly_loads = {name: np.empty((hours, count), dtype=np.float32)
+                        for name in ('heating_load', 'cooling_load', 'air_temperature')}
+
+    air = np.empty(count)
+    change = np.empty(count)
+    # Plant power per hour of the block, heating positive and cooling negative
+    power = np.empty((block_hours, count))
+    air_temperature = np.empty((block_hours, count)) if hourly else None
+
+    # Hour indices: the warm-up wraps around from the end of the year
+    order = np.concatenate((np.arange(hours - min(warmup_hours, hours), hours), np.arange(hours)))
+    first_counted = len(order) - hours
+    for start in range(0, len(order), block_hours):
+        block = order[start:start + block_hours]
+        size = len(block)
+        drive = inputs[block] @ weights
+        mass_drive, air_drive = drive[:, :count], drive[:, count:]
+
+        for step in range(size):
+            np.multiply(air_prev, theta_m, out=air)
+            air += air_drive[step]
+
+            # Ideal plant: exactly the power that brings the air back to the nearest set point
+            load = power[step]
+            np.maximum(air, heating_setpoint, out=load)
+            np.minimum(load, cooling_setpoint, out=load)
+            load -= air
+            load *= plant_gain
+            if limited:
+                np.clip(load, -max_cooling, max_heating, out=load)
+            if hourly:
+                np.multiply(load, air_plant, out=air_temperature[step])
+                air_temperature[step] += air
+
+            theta_m *= mass_prev
+            theta_m += mass_drive[step]
+            np.multiply(load, mass_plant, out=change)
+            theta_m += change
+
+        counted = slice(max(0, first_counted - start), size)
+        if counted.start < size:
+            loads = power[counted]
+            heating = np.maximum(loads, 0)
+            cooling = np.maximum(-loads, 0)
+            heating_total += heating.sum(axis=0)
+            cooling_total += cooling.sum(axis=0)
+            np.maximum(peak_heating, heating.max(axis=0), out=peak_heating)
+            np.maximum(peak_cooling, cooling.max(axis=0), out=peak_cooling)
+            if hourly:
+                rows = block[counted]
+                hourly_loads['heating_load'][rows] = heating
+                hourly_loads['cooling_load'][rows] = cooling
+                hourly_loads['air_temperature'][rows] = air_temperature[counted]
+
+    heating_kwh = heating_total / 1000
+    cooling_kwh = cooling_total / 1000
+    results = {
+        'floor_area': zone['floor_area'],
+        'heating_demand': heating_kwh,
+        'cooling_demand': cooling_kwh,
+        'heating_intensity': heating_kwh / zone['floor_area'],
+        'cooling_intensity': cooling_kwh / zone['floor_area'],
+        'peak_heating_load': peak_heating,
+        'peak_cooling_load': peak_cooling,
+    }
+    if hourly:
+        results.update(hourly_loads)
+    return results
+
+
+def simulate_design(design, weather, gain_schedule=None):
+    """simulate() for one design dict, with plain float results"""
+    results = simulate({name: [value] for name, value in design.items()}, weather, gain_schedule)
+    return {name: float(values[0]) for name, values in results.items()}
+
+
+def random_designs(count, seed=0):
+    """Design columns spread over the ParametricBuildingGenerator parameter ranges"""
+    rng = np.random.default_rng(seed)
+    return {
+        'length': rng.uniform(20, 40, count),
+        'width': rng.uniform(15, 25, count),
+        'height': rng.choice([3.0, 6.0, 9.0, 12.0], count),
+        'orientation': rng.uniform(0, 360, count),
+        'window_wall_ratio': rng.uniform(0.1, 0.6, count),
+        'wall_u': rng.uniform(0.15, 0.8, count),
+        'window_u': rng.uniform(0.8, 2.8, count),
+        'thermal_mass': rng.choice(['light', 'medium', 'heavy'], count),
+        'air_changes': rng.uniform(0.3, 1.5, count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Annual 5R1C simulation of random designs on an EPW file')
+    parser.add_argument('path')
+    parser.add_argument('--designs', type=int, default=10000)
+    args = parser.parse_args()
+
+    weather = weather_from_epw(args.path)
+    designs = random_designs(args.designs)
+    start = time.perf_counter()
+    results = simulate(designs, weather)
+    seconds = time.perf_counter() - start
+
+    print(f'{args.designs} designs in {seconds:.2f} s ({args.designs / seconds:,.0f} designs/s)')
+    for name in ('heating_intensity', 'cooling_intensity', 'peak_heating_load', 'peak_cooling_load'):
+        values = results[name]
+        print(f'{name:18s} min {values.min():10.1f}  median {np.median(values):10.1f}  max {values.max():10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Response cache for the deterministic analyze endpoints
+# File: response_cache.py
+#
+# /api/climate-data and /api/analyze-site are pure functions of (lat, lng, building_type).
+# Coordinates are snapped to a grid of `precision` degrees, the response is computed for
+# the snapped point and its serialized bytes are kept in an LRU with a TTL, so repeated
+# nearby map clicks skip both the computation and the JSON encoding. Each entry carries a
+# strong ETag, letting clients revalidate with If-None-Match and get a bodiless 304.
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'expires_at')
+
+    def __init__(self, body, etag, expires_at):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(self, max_entries=4096, ttl=3600, precision=0.001):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision
+        # Decimal places of the grid, so snapped coordinates print as 40.713 not 40.713000000000001
+        self.decimals = max(0, -math.floor(math.log10(precision))) if precision > 0 else 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.precision > 0
+
+    def quantize(self, lat, lng):
+        """Snap coordinates to the cache grid, returns (cell key, snapped lat, snapped lng)"""
+        if not self.enabled:
+            return (lat, lng), lat, lng
+
+        i = round(lat / self.precision)
+        j = round(lng / self.precision)
+        return (i, j), round(i * self.precision, self.decimals), round(j * self.precision, self.decimals)
+
+    def get(self, key):
+        """Cached entry for a key, or None if missing or expired"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def put(self, key, body):
+        """Store serialized response bytes, returns the entry with its strong ETag"""
+        entry = CacheEntry(body, hashlib.sha256(body).hexdigest()[:32], time.monotonic() + self.ttl)
+        if not self.enabled:
+            return entry
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return entry
+
+    def clear(self):
+        """Drop every entry, e.g. after the climate model changes"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,385 @@
+# Content-addressed simulation result cache and process-pool runner
+# File: simulation_cache.py
+#
+# Optimizers ask for the same building model again and again, across generations and
+# across users. A simulation is a pure function of (model, weather, simulator version),
+# so each result is stored under the SHA-256 of exactly that:
+#   - the model dict (as built by BuildingPhysicsEngine.create_building_model) serialized
+#     canonically: sorted keys, numpy values as plain numbers, 3 and 3.0 alike
+#   - the weather identity, the content hash of the EPW file (or of the weather arrays)
+#   - a version string, changed whenever the simulator's results would change
+# ResultCache keeps results as JSON files under a directory, evicting the least recently
+# used once the total size passes max_bytes. SimulationRunner sits in front of it: hits
+# are answered immediately, misses are sent to a process pool of simulation workers with
+# a bounded number of pending jobs and a per-job timeout, and a request for a model that
+# is already running joins that run instead of starting another.
+#   python benchmarks/bench_simulation_cache.py
+
+import hashlib
+import json
+import os
+import queue
+import signal
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Weather file content hashes, {absolute path: (size, mtime_ns, digest)}
+_weather_digests = {}
+_weather_lock = threading.Lock()
+
+
+def canonical_value(value):
+    """Plain JSON-ready copy of a model value, equal inputs giving equal copies"""
+    if isinstance(value, dict):
+        return {str(key): canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_value(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return canonical_value(value.tolist())
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        number = float(value)
+        # 3.0 == 3 and -0.0 == 0.0 as simulation inputs
+        if number.is_integer() and abs(number) < 2 ** 53:
+            return int(number)
+        return number
+    return value
+
+
+def canonical_json(model):
+    """Canonical serialization of a model dict, the bytes that are hashed"""
+    return json.dumps(canonical_value(model), sort_keys=True, separators=(',', ':')).encode()
+
+
+def weather_identity(weather):
+    """Content hash of an EPW file path or of a dict of weather arrays
+
+    File hashes are remembered per path until the file's size or mtime changes, so
+    copies of one file share results and an edited file never reuses stale ones.
+    """
+    digest = hashlib.sha256()
+    if isinstance(weather, dict):
+        for name in sorted(weather):
+            array = np.ascontiguousarray(weather[name])
+            digest.update(f'{name}:{array.dtype.str}:{array.shape}'.encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    path = os.path.abspath(os.fspath(weather))
+    stat = os.stat(path)
+    with _weather_lock:
+        known = _weather_digests.get(path)
+    if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known[2]
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    with _weather_lock:
+        _weather_digests[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def model_key(model, weather, version=''):
+    """Cache key of one simulation: SHA-256 of version, weather identity and canonical model"""
+    digest = hashlib.sha256()
+    digest.update(f'{version}\0{weather_identity(weather)}\0'.encode())
+    digest.update(canonical_json(model))
+    return digest.hexdigest()
+
+
+def plain_json(value):
+    """json.dumps default for numpy values in simulation results"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class ResultCache:
+    def __init__(self, directory='simulation_cache', max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        # {key: size in bytes}, least recently used first
+        self._sizes = OrderedDict()
+        self.total_bytes = 0
+        self.scan()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def scan(self):
+        """Index the files already on disk, oldest access first"""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and len(entry.name) == 2:
+                for item in os.scandir(entry.path):
+                    if item.name.endswith('.json'):
+                        stat = item.stat()
+                        found.append((stat.st_mtime_ns, item.name[:-5], stat.st_size))
+        with self._lock:
+            self._sizes.clear()
+            for _, key, size in sorted(found):
+                self._sizes[key] = size
+            self.total_bytes = sum(self._sizes.values())
+
+    def get(self, key):
+        """Cached result for a key, or None"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            # mtime is the recency order the next scan() starts from
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.stats['misses'] += 1
+                self.total_bytes -= self._sizes.pop(key, 0)
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+            if key not in self._sizes:
+                # Written by another process sharing the directory
+                self._sizes[key] = len(body)
+                self.total_bytes += len(body)
+            self._sizes.move_to_end(key)
+        return json.loads(body)
+
+    def put(self, key, body):
+        """Store a result's JSON bytes, atomically, then evict down to max_bytes"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(body)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+
+        evicted = []
+        with self._lock:
+            self.stats['stores'] += 1
+            self.total_bytes += len(body) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(body)
+            while self.total_bytes > self.max_bytes and len(self._sizes) > 1:
+                old_key, size = self._sizes.popitem(last=False)
+                self.total_bytes -= size
+                self.stats['evictions'] += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """Delete every cached result, e.g. after the simulator changes"""
+        with self._lock:
+            keys = list(self._sizes)
+            self._sizes.clear()
+            self.total_bytes = 0
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['entries'] = len(self._sizes)
+            metrics['bytes'] = self.total_bytes
+        return metrics
+
+
+# Worker process side: each worker builds its simulate function once
+
+_worker_simulate = None
+
+
+def _init_worker(factory):
+    global _worker_simulate
+    _worker_simulate = factory()
+
+
+def _timed_out(timeout):
+    def handler(signum, frame):
+        raise TimeoutError(f'Simulation did not finish within {timeout} s')
+    return handler
+
+
+def _run_job(model, weather, timeout):
+    """Simulate one model in a worker, raising TimeoutError once timeout seconds pass"""
+    # SIGALRM is POSIX only; elsewhere jobs run without a limit
+    alarm = timeout and hasattr(signal, 'setitimer')
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _timed_out(timeout))
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = _worker_simulate(model, weather)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    # Serialized in the worker, so hits and fresh runs hand back identical JSON values
+    return json.dumps(result, default=plain_json).encode()
+
+
+class SimulationRunner:
+    def __init__(self, factory, cache=None, version='', workers=None, max_pending=64, timeout=600.0,
+                 mp_context=None):
+        """factory() runs once in every worker and returns simulate(model, weather)
+
+        With the spawn and forkserver start methods factory must be picklable, e.g. a
+        module-level function.
+        """
+        self.factory = factory
+        self.cache = cache
+        self.version = version
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.mp_context = mp_context
+
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'coalesced': 0, 'runs': 0, 'failures': 0, 'timeouts': 0,
+                      'cache_errors': 0, 'store_failures': 0}
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def pool(self):
+        """The worker pool, replaced if a worker died and broke the previous one"""
+        with self._lock:
+            if self._pool is None or getattr(self._pool, '_broken', False):
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=self.mp_context,
+                    initializer=_init_worker, initargs=(self.factory,)
+                )
+            return self._pool
+
+    def submit(self, model, weather, block=True, queue_timeout=None):
+        """Future of one simulation's result
+
+        Raises queue.Full when max_pending jobs are already waiting or running and no
+        slot frees up (immediately with block=False, after queue_timeout otherwise).
+        Results are decoded JSON shared between coalesced callers and must not be modified.
+        """
+        key = model_key(model, weather, self.version)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            future = self._in_flight[key] = Future()
+
+        cached = None
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(key)
+            except Exception:
+                # An unreadable entry is a miss; the fresh result overwrites it
+                self.count('cache_errors')
+        if cached is not None:
+            self.count('cache_hits')
+            self._settle(key, future, result=cached)
+            return future
+
+        if not self._slots.acquire(blocking=block, timeout=queue_timeout if block else None):
+            error = queue.Full(f'{self.max_pending} simulations are already pending')
+            self._settle(key, future, error=error)
+            raise error
+
+        try:
+            try:
+                job = self.pool().submit(_run_job, model, weather, self.timeout)
+            except BrokenProcessPool:
+                # A worker died since the last check, retry once on a fresh pool
+                job = self.pool().submit(_run_job, model, weather, self.timeout)
+        except BaseException as error:
+            self._slots.release()
+            self._settle(key, future, error=error)
+            raise
+        self.count('runs')
+        job.add_done_callback(lambda job: self._finish(key, future, job))
+        return future
+
+    def _finish(self, key, future, job):
+        """Settle a request's future from its job, whatever the cache does"""
+        self._slots.release()
+        try:
+            result = None
+            error = job.exception()
+            if error is None:
+                body = job.result()
+                result = json.loads(body)
+        except Exception as failure:
+            # Cancelled by shutdown, or a result that does not decode
+            error = failure
+        if error is not None:
+            self.count('timeouts' if isinstance(error, TimeoutError) else 'failures')
+            self._settle(key, future, error=error)
+            return
+        try:
+            if self.cache is not None:
+                self.cache.put(key, body)
+        except Exception:
+            # Disk full or unwritable: the caller still gets the result, only reuse is lost
+            self.count('store_failures')
+        finally:
+            self._settle(key, future, result=result)
+
+    def _settle(self, key, future, result=None, error=None):
+        """Complete a request's future and stop coalescing new requests onto it"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def map(self, models, weather):
+        """Results of many models, in order; duplicates are simulated once"""
+        futures = [self.submit(model, weather) for model in models]
+        return [future.result() for future in futures]
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['in_flight'] = len(self._in_flight)
+        if self.cache is not None:
+            metrics['cache'] = self.cache.metrics()
+        return metrics
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
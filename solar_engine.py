@@ -0,0 +1,355 @@
+# Vectorized solar position and clear-sky radiation
+# File: solar_engine.py
+#
+# Hourly sun position, extraterrestrial radiation and Ineichen-Perez clear-sky
+# irradiance for many sites at once, as (sites x hours) grids.
+#
+# Everything that depends only on time (declination, equation of time, sun-earth
+# distance) is computed once for the hour axis. The cosine of the zenith angle then
+# splits into a site factor times a time factor,
+#   cos z = sin(lat) sin(decl) + cos(lat) cos(decl) cos(H + lng)
+#         = [sin lat, cos lat cos lng, -cos lat sin lng] . [sin decl, cos decl cos H, cos decl sin H]
+# so a whole grid is one (sites x 3) @ (3 x hours) matrix product. The remaining
+# per-point work (refraction, airmass, clear-sky attenuation) is a fixed sequence of
+# in-place float32 ufuncs against per-site columns and per-hour rows: no gathers or
+# masks, night hours simply come out as zero. Sites are processed in chunks so memory
+# stays bounded however many sites are requested.
+#
+# Solar position follows the NOAA solar calculator, refraction and the clear-sky
+# model follow pvlib (SPA refraction, Kasten-Young airmass, Ineichen with the pvlib
+# defaults), so results agree with pvlib.location.Location.get_clearsky to a few W/m2.
+#   python solar_engine.py --lat 40.71 --lng -74.01
+
+import argparse
+from functools import lru_cache
+
+import numpy as np
+
+# Bump when results change, so rows cached by climate_cache.py are recomputed
+METHOD_VERSION = 1
+
+SOLAR_CONSTANT = 1366.1  # W/m2, the value pvlib uses with the Spencer model
+DEFAULT_LINKE_TURBIDITY = 3.0
+DEFAULT_CHUNK_SITES = 32
+REFRACTION_TEMPERATURE = 12.0  # C, pvlib's default for solar position
+SPA_ATMOS_REFRACT = 0.5667  # degrees
+
+DEFAULT_YEAR = 2023
+
+J2000 = np.datetime64('2000-01-01T12:00:00', 's')
+
+
+def hourly_times(year, offset_minutes=30):
+    """UTC timestamps for every hour of a year, at `offset_minutes` past the hour
+
+    The default samples the middle of each hour, so W/m2 values sum to Wh/m2.
+    """
+    start = np.datetime64(f'{year}-01-01T00:00', 'm')
+    end = np.datetime64(f'{year + 1}-01-01T00:00', 'm')
+    return np.arange(start, end, np.timedelta64(60, 'm')) + np.timedelta64(offset_minutes, 'm')
+
+
+def station_pressure(altitude):
+    """Standard-atmosphere pressure in Pa at an altitude in metres (pvlib alt2pres)"""
+    return 100 * ((44331.514 - np.asarray(altitude, dtype=np.float64)) / 11880.516) ** (1 / 0.1902632)
+
+
+def day_of_year(times):
+    times = np.asarray(times, dtype='datetime64[s]')
+    return (times - times.astype('datetime64[Y]')).astype('timedelta64[D]').astype(np.int64) + 1
+
+
+def extraterrestrial_radiation(times, solar_constant=SOLAR_CONSTANT):
+    """Normal-incidence radiation at the top of the atmosphere, W/m2 (Spencer 1971)"""
+    b = 2 * np.pi * (day_of_year(times) - 1) / 365
+    return solar_constant * (
+        1.00011 + 0.034221 * np.cos(b) + 0.00128 * np.sin(b) + 0.000719 * np.cos(2 * b) + 0.000077 * np.sin(2 * b)
+    )
+
+
+def time_terms(times):
+    """Site-independent solar terms for each timestamp (UTC)
+
+    Returns {'declination' (radians), 'equation_of_time' (minutes),
+    'hour_angle' (degrees at Greenwich), 'dni_extra' (W/m2), 'month' (0-11)}.
+    """
+    times = np.asarray(times, dtype='datetime64[s]')
+    seconds = (times - J2000).astype(np.float64)
+    century = seconds / (86400 * 36525)
+
+    mean_longitude = np.radians((280.46646 + century * (36000.76983 + century * 0.0003032)) % 360)
+    mean_anomaly = np.radians(357.52911 + century * (35999.05029 - 0.0001537 * century))
+    eccentricity = 0.016708634 - century * (0.000042037 + 0.0000001267 * century)
+    center = np.radians(
+        np.sin(mean_anomaly) * (1.914602 - century * (0.004817 + 0.000014 * century))
+        + np.sin(2 * mean_anomaly) * (0.019993 - 0.000101 * century)
+        + np.sin(3 * mean_anomaly) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * century)
+    apparent_longitude = mean_longitude + center - np.radians(0.00569 + 0.00478 * np.sin(omega))
+    mean_obliquity = 23 + (26 + (21.448 - century * (46.815 + century * (0.00059 - century * 0.001813))) / 60) / 60
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_longitude))
+
+    y = np.tan(obliquity / 2) ** 2
+    equation_of_time = 4 * np.degrees(
+        y * np.sin(2 * mean_longitude)
+        - 2 * eccentricity * np.sin(mean_anomaly)
+        + 4 * eccentricity * y * np.sin(mean_anomaly) * np.cos(2 * mean_longitude)
+        - 0.5 * y * y * np.sin(4 * mean_longitude)
+        - 1.25 * eccentricity * eccentricity * np.sin(2 * mean_anomaly)
+    )
+
+    minutes_of_day = (times - times.astype('datetime64[D]')).astype(np.float64) / 60
+    months = times.astype('datetime64[M]').astype(np.int64) % 12
+    return {
+        'declination': declination,
+        'equation_of_time': equation_of_time,
+        'hour_angle': (minutes_of_day + equation_of_time) / 4 - 180,
+        'dni_extra': extraterrestrial_radiation(times),
+        'month': months,
+    }
+
+
+@lru_cache(maxsize=8)
+def year_terms(year):
+    """time_terms for hourly_times(year), computed once per year"""
+    terms = time_terms(hourly_times(year))
+    for values in terms.values():
+        values.flags.writeable = False
+    return terms
+
+
+def resolve_terms(times):
+    """time_terms for an array of timestamps, or the memoized terms of a year's hours"""
+    if times is None:
+        return year_terms(DEFAULT_YEAR)
+    if isinstance(times, (int, np.integer)):
+        return year_terms(int(times))
+    return time_terms(times)
+
+
+def site_arrays(lats, lngs, altitude):
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lngs = np.atleast_1d(np.asarray(lngs, dtype=np.float64))
+    if lats.shape != lngs.shape or lats.ndim != 1:
+        raise ValueError('lats and lngs must be scalars or 1-D arrays of the same length')
+    altitude = np.broadcast_to(np.asarray(altitude, dtype=np.float64), lats.shape)
+    return lats, lngs, altitude
+
+
+def zenith_factors(lats, lngs, terms):
+    """(sites x 3) and (3 x hours) matrices whose product is cos(zenith)"""
+    lat, lng = np.radians(lats), np.radians(lngs)
+    site = np.column_stack((np.sin(lat), np.cos(lat) * np.cos(lng), -np.cos(lat) * np.sin(lng)))
+    hour_angle = np.radians(terms['hour_angle'])
+    cos_declination = np.cos(terms['declination'])
+    hours = np.vstack((
+        np.sin(terms['declination']), cos_declination * np.cos(hour_angle), cos_declination * np.sin(hour_angle)
+    ))
+    return site, hours
+
+
+def refraction(elevation, pressure, temperature=REFRACTION_TEMPERATURE):
+    """Atmospheric refraction in degrees for true elevations in degrees (NREL SPA)
+
+    `pressure` in Pa, broadcast against `elevation`.
+    """
+    scale = (283 / (273 + temperature)) * 1.02 / (60 * 101000)
+    correction = pressure * scale / np.tan(np.radians(elevation + 10.3 / (elevation + 5.11)))
+    return np.where(elevation >= -(0.26667 + SPA_ATMOS_REFRACT), correction, 0).astype(elevation.dtype)
+
+
+def solar_position(lats, lngs, times=None, altitude=0, temperature=REFRACTION_TEMPERATURE):
+    """Sun position for every site and time, each a (sites x hours) float64 array in degrees
+
+    `times` is an array of UTC timestamps or a year, meaning its hourly_times.
+    Returns {'zenith', 'apparent_zenith', 'azimuth'}; azimuth is clockwise from north.
+    """
+    lats, lngs, altitude = site_arrays(lats, lngs, altitude)
+    terms = resolve_terms(times)
+
+    site, hours = zenith_factors(lats, lngs, terms)
+    cos_zenith = np.clip(site @ hours, -1, 1)
+    elevation = np.degrees(np.arcsin(cos_zenith))
+    pressure = station_pressure(altitude)[:, None]
+
+    # Azimuth from the same site/time split: tan A = sin H' / (cos H' sin lat - tan decl cos lat)
+    lat, lng = np.radians(lats)[:, None], np.radians(lngs)[:, None]
+    hour_angle = np.radians(terms['hour_angle']) + lng
+    azimuth = np.degrees(np.arctan2(
+        np.sin(hour_angle), np.cos(hour_angle) * np.sin(lat) - np.tan(terms['declination']) * np.cos(lat)
+    )) + 180
+
+    return {
+        'zenith': 90 - elevation,
+        'apparent_zenith': 90 - elevation - refraction(elevation, pressure, temperature),
+        'azimuth': azimuth % 360,
+    }
+
+
+def turbidity_table(linke_turbidity, count):
+    """Linke turbidity as a (sites x 12 months) array from a scalar, per-site or per-site-month value"""
+    table = np.asarray(linke_turbidity, dtype=np.float64)
+    if table.ndim == 0:
+        return np.full((count, 12), float(table))
+    if table.ndim == 1 and len(table) == count:
+        return np.repeat(table[:, None], 12, axis=1)
+    if table.shape == (count, 12):
+        return table
+    raise ValueError(f'linke_turbidity must be a scalar, ({count},) or ({count}, 12), got {table.shape}')
+
+
+def iter_clear_sky(lats, lngs, times=None, altitude=0, linke_turbidity=DEFAULT_LINKE_TURBIDITY,
+                   chunk_sites=DEFAULT_CHUNK_SITES, temperature=REFRACTION_TEMPERATURE):
+    """Ineichen clear-sky irradiance one block of sites at a time
+
+    `times` is an array of UTC timestamps or a year, meaning its hourly_times.
+    Yields (start, stop, {'ghi', 'dni', 'dhi'}) with (stop - start) x hours float32
+    arrays in W/m2, zero while the sun is down. Only one block is held in memory.
+    """
+    lats, lngs, altitude = site_arrays(lats, lngs, altitude)
+    terms = resolve_terms(times)
+    site, hours = zenith_factors(lats, lngs, terms)
+    site, hours = site.astype(np.float32), hours.astype(np.float32)
+    dni_extra = terms['dni_extra'].astype(np.float32)[None, :]
+    month = terms['month']
+
+    # Per-site constants of the Ineichen model as (sites x 1) columns. Those that depend
+    # on the Linke turbidity become (sites x 12 months), or stay (sites x 1) when the
+    # turbidity does not change through the year.
+    pressure = station_pressure(altitude)[:, None]
+    altitude = altitude[:, None]
+    fh1 = np.exp(-altitude / 8000)
+    fh2 = np.exp(-altitude / 1250)
+    cg1 = 5.09e-05 * altitude + 0.868
+    cg2 = 3.92e-05 * altitude + 0.0387
+    tl = turbidity_table(linke_turbidity, len(lats))
+    if (tl == tl[:, :1]).all():
+        tl = tl[:, :1]
+    relative_pressure = pressure / 101325
+    columns = {
+        'refraction': pressure * ((283 / (273 + temperature)) * 1.02 / (60 * 101000)),
+        'ghi_scale': cg1,
+        'dni_scale': 0.664 + 0.163 / fh1,
+        # Kasten-Young airmass is relative, the pressure ratio makes it absolute
+        'ghi_decay': -cg2 * relative_pressure * (fh1 + fh2 * (tl - 1)),
+        'dni_decay': -0.09 * relative_pressure * (tl - 1),
+        'beam_ratio': 1 - (0.1 - 0.2 * np.exp(-tl)) / (0.1 + 0.882 / fh1),
+    }
+    columns = {name: value.astype(np.float32) for name, value in columns.items()}
+
+    f32 = np.float32
+    for start in range(0, len(lats), chunk_sites):
+        stop = min(start + chunk_sites, len(lats))
+        block = {
+            name: value[start:stop] if value.shape[1] == 1 else value[start:stop][:, month]
+            for name, value in columns.items()
+        }
+
+        # Apparent elevation in degrees, clipped to 0 below the horizon so every term
+        # below stays finite and night hours come out as zero irradiance
+        elevation = site[start:stop] @ hours
+        np.clip(elevation, -1, 1, out=elevation)
+        np.arcsin(elevation, out=elevation)
+        np.multiply(elevation, f32(180 / np.pi), out=elevation)
+        np.maximum(elevation, f32(-(0.26667 + SPA_ATMOS_REFRACT)), out=elevation)
+        bend = elevation + f32(5.11)
+        np.divide(f32(10.3), bend, out=bend)
+        bend += elevation
+        bend *= f32(np.pi / 180)
+        np.tan(bend, out=bend)
+        np.divide(block['refraction'], bend, out=bend)
+        elevation += bend
+        np.maximum(elevation, 0, out=elevation)
+
+        cos_zenith = elevation * f32(np.pi / 180)
+        np.sin(cos_zenith, out=cos_zenith)
+        airmass = elevation + f32(6.07995)
+        np.power(airmass, f32(-1.6364), out=airmass)
+        airmass *= f32(0.50572)
+        airmass += cos_zenith
+        np.divide(f32(1), airmass, out=airmass)
+
+        ghi = airmass * block['ghi_decay']
+        np.exp(ghi, out=ghi)
+        ghi *= cos_zenith
+        ghi *= block['ghi_scale'] * dni_extra
+        dni = airmass * block['dni_decay']
+        np.exp(dni, out=dni)
+        dni *= block['dni_scale'] * dni_extra
+
+        # Empirical beam correction, infinite at night where ghi is already zero
+        with np.errstate(divide='ignore'):
+            corrected = np.divide(block['beam_ratio'], cos_zenith)
+        np.clip(corrected, 0, f32(1e20), out=corrected)
+        corrected *= ghi
+        np.minimum(dni, corrected, out=dni)
+
+        dhi = np.multiply(dni, cos_zenith, out=corrected)
+        np.subtract(ghi, dhi, out=dhi)
+        yield start, stop, {'ghi': ghi, 'dni': dni, 'dhi': dhi}
+
+
+def clear_sky(lats, lngs, times=None, altitude=0, linke_turbidity=DEFAULT_LINKE_TURBIDITY,
+              chunk_sites=DEFAULT_CHUNK_SITES, out=None):
+    """Full (sites x hours) clear-sky grids {'ghi', 'dni', 'dhi'} in W/m2, float32
+
+    `out` may supply preallocated arrays (np.memmap for grids larger than memory).
+    """
+    count = len(np.atleast_1d(lats))
+    hour_count = len(resolve_terms(times)['month'])
+    if out is None:
+        out = {name: np.empty((count, hour_count), dtype=np.float32) for name in ('ghi', 'dni', 'dhi')}
+    for start, stop, block in iter_clear_sky(lats, lngs, times, altitude, linke_turbidity, chunk_sites):
+        for name, grid in block.items():
+            out[name][start:stop] = grid
+    return out
+
+
+def clear_sky_summary(lats, lngs, year=DEFAULT_YEAR, altitude=0, linke_turbidity=DEFAULT_LINKE_TURBIDITY,
+                      chunk_sites=DEFAULT_CHUNK_SITES):
+    """Per-site clear-sky totals for a year of hourly samples, without keeping the hourly grids
+
+    Returns (sites,) arrays 'annual_ghi' and 'annual_dni' in kWh/m2, 'peak_sun_hours'
+    per day, 'daylight_hours', and 'monthly_ghi' as (sites x 12) kWh/m2.
+    """
+    count = len(np.atleast_1d(lats))
+    hour_count = len(year_terms(year)['month'])
+    month_starts = np.flatnonzero(np.diff(year_terms(year)['month'], prepend=-1))
+
+    monthly_ghi = np.empty((count, 12))
+    annual_dni = np.empty(count)
+    daylight_hours = np.empty(count)
+    for start, stop, block in iter_clear_sky(lats, lngs, year, altitude, linke_turbidity, chunk_sites):
+        monthly_ghi[start:stop] = np.add.reduceat(block['ghi'], month_starts, axis=1, dtype=np.float64) / 1000
+        annual_dni[start:stop] = block['dni'].sum(axis=1, dtype=np.float64) / 1000
+        daylight_hours[start:stop] = np.count_nonzero(block['ghi'], axis=1)
+
+    annual_ghi = monthly_ghi.sum(axis=1)
+    return {
+        'annual_ghi': annual_ghi,
+        'annual_dni': annual_dni,
+        'peak_sun_hours': annual_ghi / (hour_count / 24),
+        'daylight_hours': daylight_hours,
+        'monthly_ghi': monthly_ghi,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clear-sky solar resource for one site')
+    parser.add_argument('--lat', type=float, required=True)
+    parser.add_argument('--lng', type=float, required=True)
+    parser.add_argument('--altitude', type=float, default=0)
+    parser.add_argument('--linke-turbidity', type=float, default=DEFAULT_LINKE_TURBIDITY)
+    parser.add_argument('--year', type=int, default=DEFAULT_YEAR)
+    args = parser.parse_args()
+
+    summary = clear_sky_summary(args.lat, args.lng, args.year, args.altitude, args.linke_turbidity)
+    print(f"annual GHI {summary['annual_ghi'][0]:.0f} kWh/m2, DNI {summary['annual_dni'][0]:.0f} kWh/m2, "
+          f"{summary['peak_sun_hours'][0]:.2f} peak sun hours/day, {summary['daylight_hours'][0]:.0f} daylight hours")
+    print('monthly GHI kWh/m2: ' + ' '.join(f'{value:.0f}' for value in summary['monthly_ghi'][0]))
+
+
+if __name__ == '__main__':
+    main()
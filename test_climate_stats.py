@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+from climate_stats import StationClimate
+
+HOURS = 8760
+
+
+def station_columns():
+    """A year of hourly records: 10 C nights, 20 C afternoons"""
+    hour = np.arange(HOURS)
+    return {
+        'month': np.minimum(hour // 730, 11) + 1,
+        'dry_bulb_temperature': np.where(hour % 24 >= 12, 20.0, 10.0),
+        'relative_humidity': np.full(HOURS, 60.0),
+        'wind_speed': np.full(HOURS, 3.0),
+        'global_horizontal_radiation': np.where(hour % 24 == 12, 500.0, 0.0),
+    }
+
+
+class TestMissingValues:
+    def test_sentinels_and_blanks_are_left_out(self):
+        clean = StationClimate(station_columns()).summary()
+
+        columns = station_columns()
+        # A blank field, ten hours at the 99.9 sentinel and gaps in the other fields
+        columns['dry_bulb_temperature'][100] = np.nan
+        columns['dry_bulb_temperature'][2000:2010] = 99.9
+        columns['relative_humidity'][:50] = 999
+        columns['wind_speed'][300] = 999
+        columns['global_horizontal_radiation'][12] = 9999
+        station = StationClimate(columns)
+        summary = station.summary()
+
+        assert station.filled_hours == 11
+        json.dumps(summary, allow_nan=False)
+        assert summary['cooling_degree_days'] == clean['cooling_degree_days'] == 0
+        assert summary['avg_temperature'] == pytest.approx(clean['avg_temperature'], abs=0.01)
+        assert summary['heating_degree_days'] == pytest.approx(clean['heating_degree_days'], rel=1e-3)
+        assert summary['design_temperatures'] == clean['design_temperatures']
+        assert summary['max_diurnal_range'] == clean['max_diurnal_range']
+        for name in ('relative_humidity', 'wind_speed'):
+            assert summary['monthly_means'][name] == clean['monthly_means'][name]
+        for name in ('dry_bulb_temperature', 'daily_global_horizontal_radiation'):
+            assert summary['monthly_means'][name] == pytest.approx(clean['monthly_means'][name], abs=0.05)
+
+    def test_month_without_valid_values_is_none(self):
+        columns = station_columns()
+        columns['relative_humidity'][columns['month'] == 2] = 999
+        means = StationClimate(columns).summary()['monthly_means']['relative_humidity']
+        assert means[1] is None
+        assert means[0] == 60.0
+
+    def test_record_without_valid_temperatures(self):
+        columns = station_columns()
+        columns['dry_bulb_temperature'][:] = 99.9
+        with pytest.raises(ValueError):
+            StationClimate(columns)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from daylight_metrics import annual_metrics, occupancy_schedule
+
+SENSORS = 1000
+HOURS = 8760
+
+
+def row_blocks(array, rows):
+    for start in range(0, len(array), rows):
+        yield array[start:start + rows]
+
+
+@pytest.fixture(scope='module')
+def illuminance():
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 3000, (SENSORS, HOURS)).astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def direct():
+    # Half the sensors get more than 250 occupied hours of direct sun, the other half none
+    sun = np.zeros((SENSORS, HOURS), dtype=np.float32)
+    sun[::2, 12:HOURS:24] = 5000
+    return sun
+
+
+class TestDirectBlocks:
+    @pytest.mark.parametrize('illuminance_rows, direct_rows', [
+        (None, 256),   # ndarray illuminance, differently chunked direct blocks
+        (256, None),   # illuminance blocks, ndarray direct
+        (300, 128),
+        (128, 300),
+    ])
+    def test_chunking_matches_whole_arrays(self, illuminance, direct, illuminance_rows, direct_rows):
+        occupancy = occupancy_schedule()
+        expected = annual_metrics(illuminance, occupancy, direct=direct, chunk_bytes=4 * HOURS * 100)
+        assert expected['annual_sunlight_exposure'] == 0.5
+
+        result = annual_metrics(
+            illuminance if illuminance_rows is None else row_blocks(illuminance, illuminance_rows),
+            occupancy,
+            direct=direct if direct_rows is None else row_blocks(direct, direct_rows),
+            chunk_bytes=4 * HOURS * 100,
+        )
+        assert result['annual_sunlight_exposure'] == expected['annual_sunlight_exposure']
+        assert result['mean_daylight_autonomy'] == expected['mean_daylight_autonomy']
+        np.testing.assert_array_equal(result['per_sensor']['sunlit_hours'], expected['per_sensor']['sunlit_hours'])
+
+    @pytest.mark.parametrize('rows', [SENSORS - 1, SENSORS + 1])
+    def test_direct_with_other_sensor_rows(self, illuminance, direct, rows):
+        shorter = np.resize(direct, (rows, HOURS))
+        for argument in (shorter, row_blocks(shorter, 256)):
+            with pytest.raises(ValueError):
+                annual_metrics(illuminance, direct=argument, chunk_bytes=4 * HOURS * 100)
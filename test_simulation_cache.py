@@ -0,0 +1,97 @@
+import queue
+import time
+
+import numpy as np
+import pytest
+
+from simulation_cache import ResultCache, SimulationRunner, model_key
+
+WEATHER = {'dry_bulb': np.arange(24.0)}
+
+
+def slow_simulate():
+    """Worker factory: a simulation that takes a moment, long enough to coalesce onto"""
+    def simulate(model, weather):
+        time.sleep(0.3)
+        return {'heating': model['size'] * float(weather['dry_bulb'].sum())}
+    return simulate
+
+
+def hanging_simulate():
+    def simulate(model, weather):
+        time.sleep(30)
+    return simulate
+
+
+class FullDiskCache(ResultCache):
+    def put(self, key, body):
+        raise OSError('disk full')
+
+
+class TestSimulationRunner:
+    def test_coalesces_requests_for_a_running_model(self, tmp_path):
+        with SimulationRunner(slow_simulate, ResultCache(str(tmp_path)), workers=1) as runner:
+            first = runner.submit({'size': 2}, WEATHER)
+            second = runner.submit({'size': 2.0}, WEATHER)
+            assert second is first
+            assert first.result(10) == {'heating': 552}
+            metrics = runner.metrics()
+        assert metrics['runs'] == 1
+        assert metrics['coalesced'] == 1
+        assert metrics['in_flight'] == 0
+        assert metrics['cache']['stores'] == 1
+
+    def test_cached_results_skip_the_pool(self, tmp_path):
+        with SimulationRunner(slow_simulate, ResultCache(str(tmp_path)), workers=1) as runner:
+            runner.map([{'size': 1}], WEATHER)
+        with SimulationRunner(slow_simulate, ResultCache(str(tmp_path)), workers=1) as runner:
+            assert runner.map([{'size': 1}, {'size': 1}], WEATHER) == [{'heating': 276}] * 2
+            assert runner.metrics()['runs'] == 0
+
+    def test_timeout_fails_the_request_and_frees_its_key(self, tmp_path):
+        with SimulationRunner(hanging_simulate, ResultCache(str(tmp_path)), workers=1, timeout=0.2) as runner:
+            future = runner.submit({'size': 1}, WEATHER)
+            with pytest.raises(TimeoutError):
+                future.result(10)
+            metrics = runner.metrics()
+        assert metrics['timeouts'] == 1
+        assert metrics['in_flight'] == 0
+
+    def test_failing_cache_write_still_delivers_the_result(self, tmp_path):
+        with SimulationRunner(slow_simulate, FullDiskCache(str(tmp_path)), workers=1) as runner:
+            future = runner.submit({'size': 1}, WEATHER)
+            assert future.result(10) == {'heating': 276}
+            assert runner.metrics()['store_failures'] == 1
+            assert runner.metrics()['in_flight'] == 0
+            # Not joined onto a dead future: a new request runs again
+            again = runner.submit({'size': 1}, WEATHER)
+            assert again is not future
+            assert again.result(10) == {'heating': 276}
+
+    def test_unreadable_cache_entry_is_a_miss(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        key = model_key({'size': 1}, WEATHER)
+        cache.put(key, b'{not json')
+        with SimulationRunner(slow_simulate, cache, workers=1) as runner:
+            assert runner.submit({'size': 1}, WEATHER).result(10) == {'heating': 276}
+            metrics = runner.metrics()
+        assert metrics['cache_errors'] == 1
+        assert metrics['runs'] == 1
+        assert cache.get(key) == {'heating': 276}
+
+    def test_pending_limit(self, tmp_path):
+        with SimulationRunner(slow_simulate, None, workers=1, max_pending=1) as runner:
+            running = runner.submit({'size': 1}, WEATHER)
+            with pytest.raises(queue.Full):
+                runner.submit({'size': 2}, WEATHER, block=False)
+            assert running.result(10) == {'heating': 276}
+            assert runner.metrics()['in_flight'] == 0
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=20)
+    cache.put('aa01', b'{"x": 1234567}')
+    cache.put('bb02', b'{"y": 1234567}')
+    assert cache.get('aa01') is None
+    assert cache.get('bb02') == {'y': 1234567}
+    assert cache.metrics()['evictions'] == 1
@@ -0,0 +1,96 @@
+# Vectorized thermal mass evaluation
+# File: thermal_mass.py
+#
+# BuildingPhysicsEngine.calculate_thermal_mass_effect rates how much a construction's
+# heat capacity helps in a climate: benefit = min(0.15, capacity [kJ/(m2 K)] x swing / 10),
+# the capacity summed over the material layers and the swing taken from the outdoor
+# temperature. Here the same model works on arrays:
+#   - layer properties as (designs x layers) matrices, designs with fewer layers padded
+#     with zero thickness, so a whole optimizer population is one multiply-and-sum
+#   - the swing of every day of the year (daily max - min) from one reshape of the
+#     hourly series, instead of the spread of the first 24 hours only
+#   - the benefit as a (designs x days) series, or its annual mean per design
+#   python benchmarks/bench_thermal_mass.py --designs 10000
+
+import numpy as np
+
+MAX_BENEFIT = 0.15
+# Benefit per kJ/(m2 K) of capacity and K of daily swing
+BENEFIT_SCALE = 1 / 10000
+
+# Layer fields, the original lowercase names first, then the EnergyPlus Material names
+LAYER_FIELDS = {
+    'density': ('density', 'Density'),
+    'specific_heat': ('specific_heat', 'Specific_Heat'),
+    'thickness': ('thickness', 'Thickness'),
+}
+
+
+def layer_field(layer, name):
+    for key in LAYER_FIELDS[name]:
+        if key in layer:
+            return layer[key]
+    raise KeyError(f'Material layer has no {name}: {layer}')
+
+
+def layer_matrix(designs):
+    """(designs x layers) density, specific heat and thickness from a list of layer lists
+
+    Each design is a list of material dicts; shorter lists are padded with empty layers.
+    """
+    depth = max((len(layers) for layers in designs), default=0)
+    padding = [[0.0] * pad for pad in range(depth + 1)]
+    matrices = []
+    for name in LAYER_FIELDS:
+        rows = [[layer_field(layer, name) for layer in layers] + padding[depth - len(layers)] for layers in designs]
+        matrices.append(np.array(rows, dtype=np.float64).reshape(len(designs), depth))
+    return tuple(matrices)
+
+
+def areal_heat_capacity(density, specific_heat, thickness, max_depth=None):
+    """Heat capacity per m2 of construction in J/(m2 K), summed over the last axis
+
+    Layers run outside to inside. With max_depth (m) only the innermost max_depth of
+    material counts, e.g. 0.1 for the ISO 13786 effective thickness.
+    """
+    density, specific_heat, thickness = np.broadcast_arrays(
+        np.asarray(density, dtype=np.float64), np.asarray(specific_heat, dtype=np.float64),
+        np.asarray(thickness, dtype=np.float64)
+    )
+    if max_depth is not None:
+        # Depth of each layer's inner face from the inside surface
+        inner = np.cumsum(thickness[..., ::-1], axis=-1)[..., ::-1] - thickness
+        thickness = np.clip(max_depth - inner, 0, thickness)
+    return np.einsum('...i,...i,...i->...', density, specific_heat, thickness)
+
+
+def diurnal_ranges(hourly_temperature):
+    """Daily max - min of an hourly series (..., hours) as (..., days); a trailing partial day is dropped"""
+    temperature = np.asarray(hourly_temperature)
+    days = temperature.shape[-1] // 24
+    daily = temperature[..., :days * 24].reshape(temperature.shape[:-1] + (days, 24))
+    return (daily.max(axis=-1) - daily.min(axis=-1)).astype(np.float64)
+
+
+def mass_benefit(capacity, ranges):
+    """Benefit series of each design, (designs x days)
+
+    capacity is (designs,) in J/(m2 K); ranges is one site's (days,) or each design's
+    (designs x days) diurnal ranges in K.
+    """
+    capacity = np.asarray(capacity, dtype=np.float64)[:, None]
+    benefit = capacity * (np.asarray(ranges, dtype=np.float64) * BENEFIT_SCALE)
+    return np.minimum(benefit, MAX_BENEFIT, out=benefit)
+
+
+def mass_benefit_summary(designs, hourly_temperature, max_depth=None):
+    """Capacity, diurnal ranges, daily benefit and annual mean benefit for a list of layer lists"""
+    capacity = areal_heat_capacity(*layer_matrix(designs), max_depth=max_depth)
+    ranges = diurnal_ranges(hourly_temperature)
+    benefit = mass_benefit(capacity, ranges)
+    return {
+        'heat_capacity': capacity,
+        'diurnal_range': ranges,
+        'daily_benefit': benefit,
+        'mean_benefit': benefit.mean(axis=1),
+    }
@@ -0,0 +1,296 @@
+# Wind resource statistics from EPW weather files
+# File: wind_engine.py
+#
+# Wind roses, Weibull fits and wind power density from a station's hourly wind columns,
+# for natural ventilation and facade design. Everything is computed on whole arrays:
+# the rose is one bincount over (sector, speed class) indices, the Weibull fit is a
+# maximum-likelihood Newton iteration over all hours at once, and both accept a leading
+# sites axis so a grid of series is handled in the same call.
+#
+# A rose is stored as hour counts in uint16 (a year has fewer than 65536 hours), so a
+# 16-sector, 6-class rose is 192 bytes. WindStatistics keeps StationWind objects and
+# their summaries in LRUs keyed on the file's size and mtime and the binning, and
+# remembers which station serves each site, so map views asking for roses of many
+# sites cost one tree query and a dict lookup per distinct station.
+#   python wind_engine.py weather.epw --sectors 16
+
+import argparse
+
+import numpy as np
+from scipy.special import gamma
+
+from climate_stats import StationCache, rounded
+from epw_reader import read_epw
+
+# Bump when summaries change, so rows cached by climate_cache.py are recomputed
+METHOD_VERSION = 2
+
+DEFAULT_SECTORS = 16
+
+# Lower edges of the speed classes in m/s; hours below the first edge are calms
+SPEED_BINS = (0.5, 2.0, 4.0, 6.0, 8.0, 10.0)
+
+# EPW marks missing wind speed and direction with 999, missing station pressure with 999999
+MAX_WIND_SPEED = 40.0
+PRESSURE_RANGE = (31000.0, 120000.0)
+
+GAS_CONSTANT_DRY_AIR = 287.05  # J/(kg K)
+STANDARD_AIR_DENSITY = 1.225  # kg/m3 at 15 C and sea level
+
+
+def valid_wind(direction, speed):
+    """Mask of hours with both a direction and a speed on record"""
+    direction = np.asarray(direction)
+    speed = np.asarray(speed)
+    return (speed >= 0) & (speed <= MAX_WIND_SPEED) & (direction >= 0) & (direction <= 360)
+
+
+def sector_centres(sectors=DEFAULT_SECTORS):
+    """Compass bearing in degrees at the centre of each sector, sector 0 centred on north"""
+    return np.arange(sectors) * (360.0 / sectors)
+
+
+def wind_rose(direction, speed, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS, valid=None):
+    """Hour counts per (sector, speed class) along the last axis, and the calm hours
+
+    Returns (counts, calm): counts has shape (..., sectors, len(speed_bins)) in uint16
+    (uint32 for series longer than 65535 hours), calm has the leading shape.
+    Hours outside valid, by default those with missing values, are not counted.
+    """
+    direction = np.asarray(direction, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    if valid is None:
+        valid = valid_wind(direction, speed)
+    classes = len(speed_bins)
+    leading = speed.shape[:-1]
+    sites = int(np.prod(leading))
+    cells = sectors * classes
+
+    sector = np.floor(direction * (sectors / 360.0) + 0.5).astype(np.intp) % sectors
+    speed_class = np.searchsorted(np.asarray(speed_bins, dtype=np.float64), speed, side='right') - 1
+    calm = speed_class < 0
+    # One extra cell per site collects calms, one past the end collects invalid hours
+    index = np.where(calm, cells, sector * classes + speed_class)
+    index = np.where(valid, index + np.arange(sites).reshape(leading + (1,)) * (cells + 1), sites * (cells + 1))
+
+    dtype = np.uint16 if speed.shape[-1] <= np.iinfo(np.uint16).max else np.uint32
+    histogram = np.bincount(index.ravel(), minlength=sites * (cells + 1) + 1)[:-1].reshape(leading + (cells + 1,))
+    counts = histogram[..., :cells].reshape(leading + (sectors, classes)).astype(dtype)
+    return counts, histogram[..., cells].astype(dtype)
+
+
+def weibull_fit(speed, tolerance=1e-6, max_iterations=50):
+    """Maximum-likelihood Weibull shape k and scale c (m/s) of the speeds along the last axis
+
+    Calm (zero) hours and NaN are left out, as is usual for wind resource fits; the calm
+    share is reported separately. Starts from the Justus moment estimate of k and
+    refines it by Newton's method on the likelihood equation. Returns (k, c), NaN
+    where fewer than two hours are usable.
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    used = speed > 0
+    count = used.sum(axis=-1)
+    log_speed = np.log(np.where(used, speed, 1.0))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_log = log_speed.sum(axis=-1) / count
+        mean = np.where(used, speed, 0).sum(axis=-1) / count
+        std = np.sqrt((np.where(used, speed - mean[..., None], 0) ** 2).sum(axis=-1) / count)
+        k = np.clip((std / mean) ** -1.086, 0.5, 10.0)
+        k = np.where(np.isfinite(k), k, 2.0)
+
+        for _ in range(max_iterations):
+            powered = np.where(used, np.exp(k[..., None] * log_speed), 0)
+            s0 = powered.sum(axis=-1)
+            s1 = (powered * log_speed).sum(axis=-1)
+            s2 = (powered * log_speed ** 2).sum(axis=-1)
+            ratio = s1 / s0
+            step = (ratio - 1 / k - mean_log) / (s2 / s0 - ratio ** 2 + 1 / k ** 2)
+            step = np.nan_to_num(step)
+            k = np.clip(k - step, 0.1, 50.0)
+            if np.abs(step).max(initial=0) < tolerance:
+                break
+
+        scale = (np.where(used, np.exp(k[..., None] * log_speed), 0).sum(axis=-1) / count) ** (1 / k)
+    missing = count < 2
+    return np.where(missing, np.nan, k), np.where(missing, np.nan, scale)
+
+
+def weibull_power_density(k, scale, air_density=STANDARD_AIR_DENSITY):
+    """Mean wind power density in W/m2 of a Weibull distribution, 0.5 rho c^3 Gamma(1 + 3/k)"""
+    return 0.5 * air_density * np.asarray(scale) ** 3 * gamma(1 + 3 / np.asarray(k))
+
+
+def air_density(temperature, pressure=None):
+    """Dry-air density in kg/m3 from dry-bulb temperature (C) and station pressure (Pa)
+
+    Hours without a plausible pressure use sea-level standard pressure.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    if pressure is None:
+        pressure = 101325.0
+    else:
+        pressure = np.asarray(pressure, dtype=np.float64)
+        pressure = np.where((pressure >= PRESSURE_RANGE[0]) & (pressure <= PRESSURE_RANGE[1]), pressure, 101325.0)
+    return pressure / (GAS_CONSTANT_DRY_AIR * (temperature + 273.15))
+
+
+def power_density(speed, density=STANDARD_AIR_DENSITY, valid=None):
+    """Mean wind power density 0.5 rho v^3 in W/m2 along the last axis, from the hourly values"""
+    speed = np.asarray(speed, dtype=np.float64)
+    if valid is None:
+        valid = np.isfinite(speed)
+    power = np.where(valid, 0.5 * np.asarray(density) * np.where(valid, speed, 0) ** 3, 0)
+    return power.sum(axis=-1) / valid.sum(axis=-1)
+
+
+class StationWind:
+    """Wind rose, Weibull fit and power density of one station's hourly record"""
+
+    def __init__(self, columns, location=None, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS):
+        self.location = location or {}
+        self.sectors = sectors
+        self.speed_bins = tuple(float(edge) for edge in speed_bins)
+
+        direction = np.asarray(columns['wind_direction'], dtype=np.float64)
+        speed = np.asarray(columns['wind_speed'], dtype=np.float64)
+        valid = valid_wind(direction, speed)
+        self.hours = int(valid.sum())
+        if self.hours == 0:
+            raise ValueError('The weather record has no valid wind observations')
+
+        self.rose, self.calm_hours = wind_rose(direction, speed, sectors, self.speed_bins, valid)
+        self.calm_hours = int(self.calm_hours)
+        self.mean_speed = float(speed[valid].mean())
+        self.weibull_k, self.weibull_c = (float(value) for value in weibull_fit(np.where(valid, speed, np.nan)))
+
+        density = air_density(columns['dry_bulb_temperature'], columns.get('atmospheric_pressure'))
+        self.mean_air_density = float(density[valid].mean())
+        self.power_density = float(power_density(speed, density, valid))
+
+        months = np.asarray(columns['month'], dtype=np.intp) - 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.monthly_mean_speed = np.bincount(months[valid], weights=speed[valid], minlength=12) / np.bincount(
+                months[valid], minlength=12
+            )
+
+    @classmethod
+    def from_epw(cls, path, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS, cache_dir=None):
+        epw = read_epw(path, cache_dir=cache_dir)
+        return cls(epw.columns, epw.location, sectors, speed_bins)
+
+    def prevailing_direction(self):
+        """Centre bearing of the sector with the most non-calm hours"""
+        return float(sector_centres(self.sectors)[int(self.rose.sum(axis=1).argmax())])
+
+    def summary(self):
+        """Rose and fitted statistics as plain Python values
+
+        The Weibull values are None when fewer than two non-calm hours leave nothing to
+        fit, as are the mean speeds of months without valid wind.
+        """
+        return {
+            'hours': self.hours,
+            'mean_speed': round(self.mean_speed, 2),
+            'prevailing_direction': self.prevailing_direction(),
+            'calm_fraction': round(self.calm_hours / self.hours, 4),
+            'weibull_k': rounded(self.weibull_k, 3),
+            'weibull_c': rounded(self.weibull_c, 3),
+            'air_density': round(self.mean_air_density, 4),
+            'power_density': round(self.power_density, 1),  # W/m2 from hourly speeds
+            # The fit leaves calms out, they add no power
+            'weibull_power_density': rounded(weibull_power_density(
+                self.weibull_k, self.weibull_c, self.mean_air_density
+            ) * (1 - self.calm_hours / self.hours), 1),
+            'monthly_mean_speed': [rounded(value, 2) for value in self.monthly_mean_speed],
+            'rose': {
+                'sectors': sector_centres(self.sectors).tolist(),
+                'speed_bins': list(self.speed_bins),
+                'counts': self.rose.tolist(),  # hours per [sector][speed class]
+                'calm_hours': self.calm_hours
+            }
+        }
+
+
+class WindStatistics(StationCache):
+    """Memoized StationWind summaries for EPW files"""
+
+    method_version = METHOD_VERSION
+
+    def station(self, path, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS):
+        """StationWind for an EPW file and binning, rebuilt when the file changes"""
+        key = self.signature(path) + (sectors, tuple(speed_bins))
+        station = self.lookup(self._stations, key)
+        if station is None:
+            station = StationWind.from_epw(path, sectors, speed_bins, self.cache_dir)
+            self.remember(self._stations, key, station, self.max_stations)
+        return station
+
+    def summary(self, path, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS):
+        """StationWind.summary for a file, memoized per file version and binning
+
+        The returned dict is shared between callers and must not be modified.
+        """
+        key = self.signature(path) + (sectors, tuple(speed_bins))
+        summary = self.lookup(self._summaries, key, counted=True)
+        if summary is not None:
+            return summary
+
+        summary = self.station(path, sectors, speed_bins).summary()
+        self.remember(self._summaries, key, summary, self.max_summaries)
+        return summary
+
+    def site_summary(self, lat, lng, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS):
+        """Summary of the nearest catalogued station, or None when none is close enough"""
+        path = self.site_path(lat, lng)
+        if path is None:
+            return None
+        return self.summary(path, sectors, speed_bins)
+
+    def site_summaries(self, lats, lngs, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS):
+        """site_summary for coordinate columns, one summary per distinct station"""
+        found, rows_by_path = self.site_paths(lats, lngs)
+        summaries = [None] * len(found)
+        for path, rows in rows_by_path.items():
+            summary = self.summary(path, sectors, speed_bins)
+            for row in rows:
+                summaries[row] = summary
+        return summaries
+
+    def site_roses(self, lats, lngs, sectors=DEFAULT_SECTORS, speed_bins=SPEED_BINS):
+        """Rose counts of the nearest station for coordinate columns
+
+        Returns (found, counts, calm): counts is (sites, sectors, speed classes) uint16,
+        zero where 'found' is False.
+        """
+        found, rows_by_path = self.site_paths(lats, lngs)
+        counts = np.zeros((len(found), sectors, len(speed_bins)), dtype=np.uint16)
+        calm = np.zeros(len(found), dtype=np.uint16)
+        for path, rows in rows_by_path.items():
+            station = self.station(path, sectors, speed_bins)
+            counts[rows] = station.rose
+            calm[rows] = station.calm_hours
+        return found, counts, calm
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wind rose, Weibull fit and power density of an EPW file')
+    parser.add_argument('path')
+    parser.add_argument('--sectors', type=int, default=DEFAULT_SECTORS)
+    args = parser.parse_args()
+
+    summary = StationWind.from_epw(args.path, args.sectors).summary()
+    print(f"mean {summary['mean_speed']} m/s from {summary['prevailing_direction']:g} deg, "
+          f"calm {summary['calm_fraction']:.1%}")
+    print(f"Weibull k {summary['weibull_k']}, c {summary['weibull_c']} m/s")
+    print(f"power density {summary['power_density']} W/m2 (Weibull {summary['weibull_power_density']} W/m2), "
+          f"air density {summary['air_density']} kg/m3")
+    rose = summary['rose']
+    print('sector ' + ' '.join(f'>={edge:<5g}' for edge in rose['speed_bins']))
+    for centre, row in zip(rose['sectors'], rose['counts']):
+        print(f'{centre:6.1f} ' + ' '.join(f'{count:7d}' for count in row))
+    print(f"calm   {rose['calm_hours']}")
+
+
+if __name__ == '__main__':
+    main()
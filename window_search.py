@@ -0,0 +1,164 @@
+# Pruned, parallel window layout search
+# File: window_search.py
+#
+# optimize_window_placement used to score every candidate layout with a full annual
+# daylight evaluation. search_layouts spends those evaluations only where they can matter:
+#   1. duplicates: the same windows listed in another order are one layout; mirror images
+#      (flipped across the facade centre) are one layout too when the facade faces due
+#      north or south, where the sun path is close to symmetric about the facade normal
+#   2. dominated: a layout another beats on both proxies below, more estimated daylight
+#      and no more estimated sun, or as much daylight and less sun, is dropped (Pareto
+#      front); scores trade sDA against ASE, so glass that adds daylight is not enough
+#   3. screened: layouts whose average daylight factor is below min_daylight_factor (BRE
+#      guidance: under 2% a room looks gloomy) are dropped
+#   4. the rest are evaluated in parallel batches, most daylight first, and ranked
+# The daylight proxy is the BRE average daylight factor, T x A_glazing x theta /
+# (A_room x (1 - R^2)), scaled by how much of the room's depth (2 x window head height)
+# and width the windows reach. The sun proxy is the glazing area times the head height
+# above the workplane, which sets how deep direct sun falls. Both are a few array
+# operations for all layouts together.
+#   python benchmarks/bench_window_search.py
+
+import heapq
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from daylight_coefficients import ROOM_DEFAULTS
+
+# Candidate grid of generate_layouts
+WINDOW_COUNTS = (1, 2, 3, 4)
+GLAZED_WIDTH_SHARES = (0.2, 0.35, 0.5, 0.65, 0.8)  # of the facade width, split between the windows
+WINDOW_HEIGHTS = (0.9, 1.2, 1.5, 1.8, 2.1)
+SILL_HEIGHTS = (0.3, 0.6, 0.9, 1.2)
+# Sideways shift of the whole layout, as a share of one window's bay
+OFFSETS = (-0.25, 0.0, 0.25)
+
+# Clear margin kept between windows and the facade edges, m
+EDGE_MARGIN = 0.1
+SKY_ANGLE = 90.0  # degrees of sky seen from an unobstructed vertical window
+DAYLIT_DEPTH = 2.0  # daylit zone depth per m of window head height
+MIN_DAYLIGHT_FACTOR = 2.0  # %
+
+
+def window_tuple(window):
+    return tuple(round(float(window[name]), 4) for name in ('x', 'z', 'width', 'height'))
+
+
+def layout_key(layout, facade_width=None):
+    """Identity of a layout regardless of window order; with facade_width, also of its mirror image"""
+    windows = sorted(window_tuple(window) for window in layout)
+    if facade_width is None:
+        return tuple(windows)
+    mirrored = sorted((round(facade_width - x - width, 4), z, width, height) for x, z, width, height in windows)
+    return min(tuple(windows), tuple(mirrored))
+
+
+def generate_layouts(room, counts=WINDOW_COUNTS, shares=GLAZED_WIDTH_SHARES, heights=WINDOW_HEIGHTS,
+                     sills=SILL_HEIGHTS, offsets=OFFSETS):
+    """Evenly spaced window rows on the facade of a room dict, those that fit within EDGE_MARGIN"""
+    facade_width, facade_height = float(room['width']), float(room['height'])
+    layouts = []
+    for count, share, height, sill, offset in itertools.product(counts, shares, heights, sills, offsets):
+        bay = facade_width / count
+        width = share * bay
+        if sill + height > facade_height - EDGE_MARGIN or (count > 1 and bay - width < EDGE_MARGIN):
+            continue
+        layout = [{'x': round((i + 0.5 + offset) * bay - width / 2, 4), 'z': sill, 'width': round(width, 4),
+                   'height': height} for i in range(count)]
+        if layout[0]['x'] < EDGE_MARGIN or layout[-1]['x'] + width > facade_width - EDGE_MARGIN:
+            continue
+        layouts.append(layout)
+    return layouts
+
+
+def layout_proxies(layouts, room):
+    """Arrays of each layout's estimated daylight and sun (higher is more) and average daylight factor, %"""
+    room = dict(ROOM_DEFAULTS, **room)
+    width, depth, height = float(room['width']), float(room['depth']), float(room['height'])
+    workplane_height = float(room['workplane_height'])
+    transmittance, reflectance = float(room['transmittance']), float(room['reflectance'])
+    windows = [np.array([window_tuple(window) for window in layout]).reshape(-1, 4) for layout in layouts]
+
+    area = np.array([(w[:, 2] * w[:, 3]).sum() for w in windows])
+    head = np.array([(w[:, 1] + w[:, 3]).max(initial=0.0) for w in windows])
+    span = np.array([(w[:, 0] + w[:, 2]).max(initial=0.0) - w[:, 0].min(initial=0.0) for w in windows])
+
+    room_area = 2 * (width * depth + width * height + depth * height)
+    average_daylight_factor = transmittance * area * SKY_ANGLE / (room_area * (1 - reflectance ** 2))
+    depth_reach = np.minimum(1.0, DAYLIT_DEPTH * head / depth)
+    width_reach = np.minimum(1.0, (span + head) / width)
+    return {
+        'daylight': average_daylight_factor * depth_reach * width_reach,
+        'sun': area * np.maximum(0.0, head - workplane_height),
+        'daylight_factor': average_daylight_factor,
+    }
+
+
+def pareto_mask(daylight, sun):
+    """True for layouts no other layout beats on daylight (higher) and sun (lower)
+
+    Layouts tied on both, such as mirror images, are kept together.
+    """
+    points, inverse = np.unique(np.column_stack((sun, -daylight)), axis=0, return_inverse=True)
+    # Sorted by sun, then most daylight first: a point is dominated by any earlier one with as much daylight
+    best_before = np.maximum.accumulate(np.concatenate(([-np.inf], -points[:-1, 1])))
+    return (-points[:, 1] > best_before)[inverse.ravel()]
+
+
+def search_layouts(layouts, evaluate, room, top_k=5, min_daylight_factor=MIN_DAYLIGHT_FACTOR, mirror=None,
+                   workers=None, batch_size=None, max_evaluations=None):
+    """Ranked top_k of layouts by evaluate(layout) (higher is better), evaluating as few as possible
+
+    mirror treats mirror images as the same layout; by default it does for facades facing
+    due north or south (room['orientation'] a multiple of 180). Returns {'ranked': [{'layout',
+    'score', 'proxy'}], 'stats'} with counts of each pruning stage and the evaluations avoided.
+    """
+    room = dict(ROOM_DEFAULTS, **room)
+    if mirror is None:
+        mirror = float(room['orientation']) % 180 == 0
+    stats = {'candidates': len(layouts)}
+
+    unique = {}
+    for layout in layouts:
+        unique.setdefault(layout_key(layout, float(room['width']) if mirror else None), layout)
+    candidates = list(unique.values())
+    stats['duplicates'] = len(layouts) - len(candidates)
+
+    proxies = layout_proxies(candidates, room)
+    proxy = proxies['daylight']
+    front = pareto_mask(proxy, proxies['sun'])
+    stats['dominated'] = int((~front).sum())
+    screened = front & (proxies['daylight_factor'] >= min_daylight_factor)
+    stats['screened'] = int((front & ~screened).sum())
+
+    order = [i for i in np.argsort(-proxy, kind='stable') if screened[i]]
+    if max_evaluations is not None:
+        stats['capped'] = max(0, len(order) - max_evaluations)
+        order = order[:max_evaluations]
+
+    # Batches bound how many evaluations (each holding a year of illuminance) are in flight
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or 2 * workers
+    scored = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for i, score in zip(batch, executor.map(evaluate, [candidates[i] for i in batch])):
+                scored.append((score, -i))
+
+    stats['evaluated'] = len(scored)
+    stats['evaluations_avoided'] = len(layouts) - len(scored)
+    ranked = [{'layout': candidates[-negative], 'score': score, 'proxy': float(proxy[-negative])}
+              for score, negative in heapq.nlargest(top_k, scored)]
+    return {'ranked': ranked, 'stats': stats}
+
+
+def daylight_score(metrics):
+    """Layout score from daylight_metrics.annual_metrics: spatial daylight autonomy less sunlight exposure
+
+    Sunlight exposure counts as 0 where it is unknown (None).
+    """
+    return metrics['spatial_daylight_autonomy'] - (metrics['annual_sunlight_exposure'] or 0.0)